@@ -0,0 +1,102 @@
+import numpy as np
+import metrics
+from rng import deal_batch, make_rng
+from poker import CARD_SUIT
+from evaluator import (CARD_PRIME, CARD_RANK_BIT, CARD_SUIT_WEIGHT, CATEGORIES, CATEGORY_SHIFT,
+                       FLUSH_SUIT, FLUSH_STRENGTH, RANK_STRENGTH)
+
+"""
+Vectorized batch engine
+-----------------------
+Works on whole batches of deals at once: a batch is an (N, k) integer array of
+card ids where each row is one deal. Deals are drawn with the partial shuffle of
+rng.deal_batch() and evaluated with the same tables as evaluator.evaluate(), so no Python
+objects are created per hand.
+"""
+
+DEFAULT_CHUNK_SIZE = 100000  # Deals per batch, keeps the (N, 52) deck array around 5MB
+
+_CARD_PRIME = np.array(CARD_PRIME, dtype=np.int64)
+_CARD_RANK_BIT = np.array(CARD_RANK_BIT, dtype=np.int64)
+_CARD_SUIT_WEIGHT = np.array(CARD_SUIT_WEIGHT, dtype=np.int64)
+_CARD_SUIT = np.array(CARD_SUIT, dtype=np.int8)
+_FLUSH_SUIT = np.array(FLUSH_SUIT, dtype=np.int8)
+_FLUSH_STRENGTH = np.array(FLUSH_STRENGTH, dtype=np.int64)
+_RANK_KEYS = np.array(sorted(RANK_STRENGTH), dtype=np.int64)
+_RANK_VALUES = np.array([RANK_STRENGTH[key] for key in _RANK_KEYS.tolist()], dtype=np.int64)
+
+def draw_deals(num_deals, cards_per_deal, rng=None):
+    """Draws 'num_deals' independent deals of 'cards_per_deal' cards each from a full deck.
+
+    Args:
+        num_deals (int): The number of deals (rows) to draw.
+        cards_per_deal (int): The number of cards in each deal.
+        rng (numpy.random.Generator): The random generator to use. Defaults to an
+            unseeded one from rng.make_rng().
+
+    Returns:
+        numpy.ndarray: An (num_deals, cards_per_deal) int8 array of card ids.
+    """
+    return deal_batch(num_deals, cards_per_deal, rng or make_rng())
+
+def evaluate_batch(deals):
+    """Evaluates every row of a batch of deals. Same result as evaluator.evaluate() per row.
+
+    Args:
+        deals (numpy.ndarray): An (N, k) array of card ids with k <= 7.
+
+    Returns:
+        numpy.ndarray: An int64 array of N hand strengths.
+    """
+    if metrics.ENABLED:
+        metrics.add_count("evaluations", len(deals))
+    products = _CARD_PRIME[deals].prod(axis=1)
+    strengths = _RANK_VALUES[np.searchsorted(_RANK_KEYS, products)]
+    flush_suits = _FLUSH_SUIT[_CARD_SUIT_WEIGHT[deals].sum(axis=1)]
+    flushed = flush_suits >= 0
+    if flushed.any():
+        flush_deals = deals[flushed]
+        in_suit = _CARD_SUIT[flush_deals] == flush_suits[flushed][:, None]
+        # Ranks within one suit are distinct, so summing the bits is the same as or-ing them
+        masks = np.where(in_suit, _CARD_RANK_BIT[flush_deals], 0).sum(axis=1)
+        strengths[flushed] = _FLUSH_STRENGTH[masks]
+    return strengths
+
+def compare_batch(strengths_a, strengths_b):
+    """Vectorized evaluator.compare() on strengths: 1 where a wins, -1 where b wins, 0 on ties."""
+    return np.sign(np.asarray(strengths_a) - np.asarray(strengths_b))
+
+def showdown_batch(strengths):
+    """Vectorized evaluator.showdown() over a batch of pots.
+
+    Args:
+        strengths (numpy.ndarray): An (N, players) array of hand strengths, one row per pot.
+
+    Returns:
+        tuple: (winners, shares), (N, players) arrays: True for every player holding the
+        best hand of the row, and each player's fraction of the pot.
+    """
+    winners = strengths == strengths.max(axis=1, keepdims=True)
+    shares = winners / winners.sum(axis=1, keepdims=True)
+    return winners, shares
+
+def category_counts(strengths):
+    """Counts how many hands fall in each category.
+
+    Args:
+        strengths (numpy.ndarray): Hand strengths from evaluate_batch().
+
+    Returns:
+        dict: Category name (see evaluator.CATEGORIES) to number of hands.
+    """
+    counts = np.bincount(strengths >> CATEGORY_SHIFT, minlength=len(CATEGORIES))
+    return {name: int(count) for name, count in zip(CATEGORIES, counts)}
+
+def suit_counts_batch(deals, suit):
+    """Returns the number of cards of 'suit' (a suit index) in every row of a batch."""
+    return (_CARD_SUIT[deals] == suit).sum(axis=1)
+
+def chunk_sizes(total, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Splits 'total' into chunk sizes of at most 'chunk_size'."""
+    full_chunks, remainder = divmod(total, chunk_size)
+    return [chunk_size] * full_chunks + ([remainder] if remainder else [])
@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from poker import Deck, Hand, CARDS, is_flush, is_straight
+from evaluator import evaluate
+from batch import draw_deals, evaluate_batch
+from golden_nugget_ultimate import (simulate_diamonds, simulate_diamonds_batch, simulate_trips,
+                                    simulate_trips_batch)
+
+"""
+Benchmarks
+----------
+Repeatable throughput numbers for the evaluator, dealing and the simulators.
+Each benchmark is timed a few times and the best run is kept, as operations
+(hands, evaluations or decks) per second. Results are written to JSON and can
+be compared against a stored baseline: any benchmark slower than the baseline
+by more than the tolerance is reported and the script exits with status 1.
+
+    python benchmark.py --save-baseline      # store this machine's baseline
+    python benchmark.py                      # compare against it
+"""
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+RESULTS_PATH = os.path.join(BENCHMARK_DIR, "results.json")
+
+def _seven_card_hands(count, seed=0):
+    rng = random.Random(seed)
+    return [rng.sample(range(52), 7) for _ in range(count)]
+
+def bench_evaluate_hand(size):
+    hands = [Hand([CARDS[card] for card in ids]) for ids in _seven_card_hands(size)]
+    def run():
+        for hand in hands:
+            hand.evaluate_hand()
+    return run
+
+def bench_is_straight(size):
+    hands = [[CARDS[card] for card in ids] for ids in _seven_card_hands(size)]
+    def run():
+        for cards in hands:
+            is_straight(cards)
+    return run
+
+def bench_is_flush(size):
+    hands = [[CARDS[card] for card in ids] for ids in _seven_card_hands(size)]
+    def run():
+        for cards in hands:
+            is_flush(cards)
+    return run
+
+def bench_evaluate(size):
+    hands = _seven_card_hands(size)
+    def run():
+        for hand in hands:
+            evaluate(hand)
+    return run
+
+def bench_evaluate_batch(size):
+    deals = draw_deals(size, 7)
+    return lambda: evaluate_batch(deals)
+
+def bench_deck_construction(size):
+    rng = random.Random(0)
+    def run():
+        for _ in range(size):
+            Deck(rng)
+    return run
+
+def bench_deck_deal(size):
+    deck = Deck(random.Random(0))
+    def run():
+        for _ in range(size):
+            deck.reset()
+            deck.deal(2)
+            deck.deal(5)
+    return run
+
+def bench_simulation(simulation):
+    return lambda size: lambda: simulation(size, seed=0)
+
+# name: (setup(size) returning the function to time, operations per run)
+BENCHMARKS = {
+    "Hand.evaluate_hand": (bench_evaluate_hand, 5000),
+    "is_straight": (bench_is_straight, 20000),
+    "is_flush": (bench_is_flush, 20000),
+    "evaluator.evaluate": (bench_evaluate, 100000),
+    "batch.evaluate_batch": (bench_evaluate_batch, 1000000),
+    "Deck construction": (bench_deck_construction, 20000),
+    "Deck reset and deal": (bench_deck_deal, 20000),
+    "simulate_trips": (bench_simulation(simulate_trips), 20000),
+    "simulate_diamonds": (bench_simulation(simulate_diamonds), 20000),
+    "simulate_trips_batch": (bench_simulation(simulate_trips_batch), 1000000),
+    "simulate_diamonds_batch": (bench_simulation(simulate_diamonds_batch), 1000000),
+}
+
+def run_benchmarks(names=None, repeat=3, scale=1.0):
+    """Runs the benchmarks and returns their results.
+
+    Args:
+        names (list): The benchmarks to run. Defaults to all of BENCHMARKS.
+        repeat (int): Timed runs per benchmark, the best one is kept. Defaults to 3.
+        scale (float): Multiplies the operations per run, e.g. 0.1 for a quick run.
+
+    Returns:
+        dict: Benchmark name to {'ops_per_sec', 'seconds', 'operations'}.
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        setup, operations = BENCHMARKS[name]
+        operations = max(1, int(operations * scale))
+        run = setup(operations)
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - started)
+        results[name] = {"ops_per_sec": operations / best, "seconds": best, "operations": operations}
+    return results
+
+def compare(results, baseline, tolerance=0.2):
+    """Returns the benchmarks that got slower than the baseline by more than 'tolerance'.
+
+    Returns:
+        list: (name, ops_per_sec, baseline_ops_per_sec) for every regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name in baseline and result["ops_per_sec"] < baseline[name]["ops_per_sec"] * (1 - tolerance):
+            regressions.append((name, result["ops_per_sec"], baseline[name]["ops_per_sec"]))
+    return regressions
+
+def _write_json(path, results):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump({
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }, file, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the evaluator, dealing and the simulators.")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--output", default=RESULTS_PATH, help="where to write the JSON results")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before failing (0.2 = 20%%)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--quick", action="store_true", help="run a tenth of the operations")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    results = run_benchmarks(args.names, args.repeat, 0.1 if args.quick else 1.0)
+    for name, result in results.items():
+        print(f"{name:<26}{result['ops_per_sec']:>16,.0f} /s")
+    _write_json(args.output, results)
+
+    if args.save_baseline:
+        _write_json(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline to store one")
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    for name, ops_per_sec, baseline_ops_per_sec in regressions:
+        print(f"REGRESSION {name}: {ops_per_sec:,.0f} /s vs baseline {baseline_ops_per_sec:,.0f} /s "
+              f"({ops_per_sec / baseline_ops_per_sec - 1:+.0%})")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+from itertools import permutations
+import metrics
+
+"""
+Suit isomorphism and shared result cache
+----------------------------------------
+Poker results don't change when the suits are permuted: Ace-King of Spades on a
+rainbow flop has the same equity as Ace-King of Hearts on the same flop with its
+suits swapped. canonicalize() maps a set of card groups to one representative of
+its suit-isomorphism class, so up to 4! = 24 equivalent situations share one
+cache entry.
+
+Evaluating a single hand with evaluator.evaluate() is already one table lookup,
+cheaper than canonicalizing it, so the cache is meant for the expensive results
+built on top of it: exact equities and strategy EVs.
+"""
+
+SUIT_PERMUTATIONS = list(permutations(range(4)))
+
+def canonicalize(*groups):
+    """Returns the suit-canonical form of one or more groups of card ids.
+
+    The order of cards within a group doesn't matter, the order of the groups does
+    (e.g. hole cards then board). Two inputs have the same canonical form exactly
+    when one is a suit permutation of the other, and the canonical form is itself a
+    valid set of groups with the same results as the input.
+
+    Args:
+        *groups (list): Groups of card ids.
+
+    Returns:
+        tuple: One sorted tuple of card ids per group.
+    """
+    best = None
+    for permutation in SUIT_PERMUTATIONS:
+        key = tuple(tuple(sorted((card & ~3) | permutation[card & 3] for card in group)) for group in groups)
+        if best is None or key < best:
+            best = key
+    return best
+
+class EvaluationCache:
+    def __init__(self, maxsize=100000):
+        """A bounded, thread-safe least-recently-used cache with hit, miss and eviction counters.
+
+        Args:
+            maxsize (int): The most entries to keep. Defaults to 100,000.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Returns the cached value for 'key', or 'default' if there is none."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """Caches 'value' under 'key', evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for 'key', calling compute() and caching its result on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        """Empties the cache and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Returns a snapshot of the counters as a dict."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return f"EvaluationCache({len(self._entries)}/{self.maxsize} entries, {self.hits} hits, {self.misses} misses)"
+
+# Shared by the strategy solver and the odds calculator
+shared_cache = EvaluationCache()
+metrics.register_cache("shared", shared_cache)
@@ -0,0 +1,240 @@
+import time
+from itertools import combinations
+from math import comb
+import numpy as np
+from poker import Card
+from evaluator import evaluate
+from batch import evaluate_batch
+from rng import deal_batch, make_rng
+from canonical import canonicalize, shared_cache
+
+"""
+Equity calculator
+-----------------
+Win/tie/lose odds of a hero hand against N opponents, given an optional partial
+board and optionally some of the opponents' hands.
+
+When few cards are unknown (turn or river heads-up) every outcome is enumerated
+and the result is exact. Exact results are cached in canonical.shared_cache on the
+suit-canonical form of the known cards. Otherwise deals are sampled in numpy batches and
+iter_equity() yields a refined estimate after every batch, so a caller like the
+Streamlit app can show a first answer quickly and keep updating it.
+"""
+
+MAX_EXACT_OUTCOMES = 150000  # Enumerate when there are at most this many outcomes
+FIRST_BATCH_SIZE = 2000
+MAX_BATCH_SIZE = 50000
+
+class EquityResult:
+    def __init__(self, wins=0, ties=0, losses=0, share=0.0, exact=False):
+        """Counts of outcomes for the hero hand.
+
+        Args:
+            wins (int): Outcomes where the hero beats every opponent.
+            ties (int): Outcomes where the hero splits the pot.
+            losses (int): Outcomes where an opponent has a better hand.
+            share (float): Sum of the hero's share of the pot over all outcomes.
+            exact (bool): True if every outcome was enumerated.
+        """
+        self.wins = wins
+        self.ties = ties
+        self.losses = losses
+        self.share = share
+        self.exact = exact
+
+    @property
+    def trials(self):
+        return self.wins + self.ties + self.losses
+
+    @property
+    def win(self):
+        """Probability of winning outright."""
+        return self.wins / self.trials if self.trials else 0.0
+
+    @property
+    def tie(self):
+        """Probability of splitting the pot."""
+        return self.ties / self.trials if self.trials else 0.0
+
+    @property
+    def lose(self):
+        """Probability of losing."""
+        return self.losses / self.trials if self.trials else 0.0
+
+    @property
+    def equity(self):
+        """Expected share of the pot, counting a split between k players as 1/k."""
+        return self.share / self.trials if self.trials else 0.0
+
+    def __repr__(self):
+        kind = "exact" if self.exact else f"{self.trials} trials"
+        return f"Win {self.win:.2%}, Tie {self.tie:.2%}, Lose {self.lose:.2%} ({kind})"
+
+def card_ids(cards):
+    """Converts a list of Card objects and/or integer card ids to card ids."""
+    return [card.id if isinstance(card, Card) else card for card in cards]
+
+def _check_cards(hero, board, opponent_hands):
+    known = hero + board + [card for hand in opponent_hands if hand for card in hand]
+    if len(hero) != 2:
+        raise ValueError("The hero hand must have exactly 2 cards")
+    if len(board) > 5:
+        raise ValueError("The board can have at most 5 cards")
+    if any(hand and len(hand) != 2 for hand in opponent_hands):
+        raise ValueError("Opponent hands must have exactly 2 cards")
+    if len(set(known)) != len(known):
+        raise ValueError("The same card is used more than once")
+    return [card for card in range(52) if card not in set(known)]
+
+def count_outcomes(num_remaining, board_missing, random_opponents):
+    """Returns the number of equally likely outcomes to enumerate: the ways to fill
+    the board times the ways to deal each random opponent a hand, in order.
+    """
+    outcomes = comb(num_remaining, board_missing)
+    num_remaining -= board_missing
+    for _ in range(random_opponents):
+        outcomes *= comb(num_remaining, 2)
+        num_remaining -= 2
+    return outcomes
+
+def _settle(result, hero_strength, opponent_strengths, weight=1):
+    best = max(opponent_strengths)
+    if hero_strength > best:
+        result.wins += weight
+        result.share += weight
+    elif hero_strength == best:
+        result.ties += weight
+        result.share += weight / (1 + opponent_strengths.count(best))
+    else:
+        result.losses += weight
+
+def _enumerate(hero, board, opponent_hands, remaining):
+    result = EquityResult(exact=True)
+    random_opponents = sum(1 for hand in opponent_hands if not hand)
+    known_opponents = [hand for hand in opponent_hands if hand]
+
+    for board_fill in combinations(remaining, 5 - len(board)):
+        full_board = board + list(board_fill)
+        hero_strength = evaluate(hero + full_board)
+        known_strengths = [evaluate(hand + full_board) for hand in known_opponents]
+        left = [card for card in remaining if card not in board_fill]
+        if not random_opponents:
+            _settle(result, hero_strength, known_strengths)
+            continue
+        # Every random opponent's hand is evaluated once per board
+        pair_strengths = {pair: evaluate(list(pair) + full_board) for pair in combinations(left, 2)}
+        _deal_random(result, hero_strength, known_strengths, pair_strengths, random_opponents, set())
+    return result
+
+def _deal_random(result, hero_strength, strengths, pair_strengths, opponents_left, used):
+    for pair, strength in pair_strengths.items():
+        if pair[0] in used or pair[1] in used:
+            continue
+        if opponents_left == 1:
+            _settle(result, hero_strength, strengths + [strength])
+        else:
+            _deal_random(result, hero_strength, strengths + [strength], pair_strengths,
+                         opponents_left - 1, used | set(pair))
+
+def sample_outcomes(hero, board, opponent_hands, remaining, size, rng):
+    """Samples 'size' deals of the unknown cards and settles them in one numpy batch.
+
+    Args:
+        hero (list): The hero's 2 hole card ids.
+        board (list): The known community card ids.
+        opponent_hands (list): One entry per opponent, a list of 2 card ids or None for a random hand.
+        remaining (list): The card ids that are not known.
+        size (int): The number of deals to sample.
+        rng (numpy.random.Generator): The random generator to use.
+
+    Returns:
+        tuple: (wins, ties, losses, share) summed over the sampled deals.
+    """
+    board_missing = 5 - len(board)
+    random_opponents = sum(1 for hand in opponent_hands if not hand)
+    drawn = deal_batch(size, board_missing + 2 * random_opponents, rng, remaining)
+
+    full_board = np.hstack([np.tile(np.array(board, dtype=np.int8), (size, 1)), drawn[:, :board_missing]])
+    hero_strengths = evaluate_batch(np.hstack([np.tile(np.array(hero, dtype=np.int8), (size, 1)), full_board]))
+    opponent_strengths = []
+    next_card = board_missing
+    for hand in opponent_hands:
+        if hand:
+            hole = np.tile(np.array(hand, dtype=np.int8), (size, 1))
+        else:
+            hole = drawn[:, next_card:next_card + 2]
+            next_card += 2
+        opponent_strengths.append(evaluate_batch(np.hstack([hole, full_board])))
+    opponent_strengths = np.vstack(opponent_strengths)
+
+    best = opponent_strengths.max(axis=0)
+    tied = (opponent_strengths == best).sum(axis=0)
+    wins = hero_strengths > best
+    ties = hero_strengths == best
+    share = wins.sum() + (1 / (1 + tied[ties])).sum()
+    return int(wins.sum()), int(ties.sum()), size - int(wins.sum()) - int(ties.sum()), float(share)
+
+def iter_equity(hero, board=(), opponents=1, opponent_hands=None, time_limit=2.0,
+                max_trials=None, seed=None):
+    """Computes the hero's equity and yields a refined EquityResult after every batch.
+
+    Args:
+        hero (list): The hero's 2 hole cards, as Card objects or card ids.
+        board (list): 0 to 5 known community cards. Defaults to none.
+        opponents (int): The number of opponents. Defaults to 1.
+        opponent_hands (list): Known hands of the opponents, one entry per opponent,
+            None for a random hand. Defaults to all random.
+        time_limit (float): Seconds to keep refining a sampled estimate. Defaults to 2.
+        max_trials (int): Stop sampling after this many deals. Defaults to no limit.
+        seed (int): Seed for the sampler. Defaults to None (unseeded).
+
+    Yields:
+        EquityResult: The running result. When few cards are unknown, a single exact
+        result is yielded instead.
+    """
+    hero = card_ids(hero)
+    board = card_ids(board)
+    opponent_hands = list(opponent_hands or [])
+    opponent_hands = [card_ids(hand) if hand else None for hand in opponent_hands]
+    opponent_hands += [None] * (opponents - len(opponent_hands))
+    if not opponent_hands:
+        raise ValueError("There must be at least one opponent")
+    remaining = _check_cards(hero, board, opponent_hands)
+
+    random_opponents = sum(1 for hand in opponent_hands if not hand)
+    if count_outcomes(len(remaining), 5 - len(board), random_opponents) <= MAX_EXACT_OUTCOMES:
+        known_hands = [hand for hand in opponent_hands if hand]
+        key = ("equity",) + canonicalize(hero, board, *known_hands) + (random_opponents,)
+        yield shared_cache.get_or_compute(key, lambda: _enumerate(hero, board, opponent_hands, remaining))
+        return
+
+    rng = make_rng(seed)
+    result = EquityResult()
+    size = FIRST_BATCH_SIZE
+    started = time.perf_counter()
+    while True:
+        if max_trials is not None:
+            size = min(size, max_trials - result.trials)
+        wins, ties, losses, share = sample_outcomes(hero, board, opponent_hands, remaining, size, rng)
+        result.wins += wins
+        result.ties += ties
+        result.losses += losses
+        result.share += share
+        yield result
+        if time.perf_counter() - started >= time_limit:
+            break
+        if max_trials is not None and result.trials >= max_trials:
+            break
+        size = min(size * 2, MAX_BATCH_SIZE)
+
+def calculate_equity(hero, board=(), opponents=1, opponent_hands=None, time_limit=2.0,
+                     max_trials=None, seed=None):
+    """Returns the final EquityResult of iter_equity(). Takes the same arguments."""
+    for result in iter_equity(hero, board, opponents, opponent_hands, time_limit, max_trials, seed):
+        pass
+    return result
+
+if __name__ == "__main__":
+    hero = [Card('Ace', 'Spades'), Card('King', 'Spades')]
+    print(calculate_equity(hero, opponents=1, time_limit=1.0))
+    print(calculate_equity(hero, [Card('Queen', 'Spades'), Card('7', 'Hearts'), Card('2', 'Clubs'), Card('9', 'Diamonds')]))
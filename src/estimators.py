@@ -0,0 +1,397 @@
+import math
+from functools import lru_cache
+from itertools import combinations, combinations_with_replacement
+from math import comb, prod
+from statistics import NormalDist
+import numpy as np
+from batch import chunk_sizes, draw_deals, suit_counts_batch
+from evaluator import CATEGORIES, CATEGORY_SHIFT, _straight_high
+from exact import diamonds_count_distribution, exact_diamonds, exact_trips, seven_card_category_counts
+from paytable import BAD_BEAT, DIAMONDS, TRIPS, RoundBatch
+from rng import deal_batch, make_rng
+
+"""
+Variance-reduced estimators
+---------------------------
+The expected payout of a side bet is dominated by rare outcomes (8 and 9
+diamonds, straight flushes), so plain Monte Carlo needs a lot of hands before it
+settles. These estimators get the same confidence interval from fewer hands:
+
+- stratified_estimate(): splits the deals into strata whose probabilities are
+  known exactly (the suit count for a suit bet; the rank pattern, flush and
+  straight draws of the player's 7 cards for a hand bet), samples every stratum on
+  its own and gives the high-variance strata (the flush, full house and
+  many-diamond ones) more hands.
+- importance_estimate(): deals one suit more often than it comes out of a fair
+  deck and weights every deal by how much likelier it was under the tilted deal.
+- control_estimate(): corrects the plain average with the difference between the
+  observed and the exact frequencies of the player's hand categories and of the
+  suit counts (see exact.py), scaled by a regression on the same deals.
+
+Every estimator returns the same dict as streaming.summarize() plus
+'variance_reduction': how many times more hands plain Monte Carlo would need for
+the same confidence interval, estimated from the same deals.
+"""
+
+MIN_STRATUM_HANDS = 50  # Fewest hands per stratum in each run, so a rare payout is seen often enough
+DEFAULT_TILT = 3.5  # Best for Diamonds, about 50x fewer hands than plain Monte Carlo
+
+_SUIT_CARDS = [np.arange(suit, 52, 4, dtype=np.int8) for suit in range(4)]
+_OTHER_CARDS = [np.array([card for card in range(52) if card & 3 != suit], dtype=np.int8) for suit in range(4)]
+
+def _summary(mean, variance_of_mean, hands, plain_variance, confidence, bound=0.0):
+    # 'bound' widens the interval by a bias the standard error doesn't cover
+    std_error = math.sqrt(max(variance_of_mean, 0.0))
+    half_width = NormalDist().inv_cdf(0.5 + confidence / 2) * std_error + bound
+    return {
+        "hands": int(hands),
+        "expected_payout": float(mean),
+        "std_error": std_error,
+        "half_width": half_width,
+        "ci_low": float(mean) - half_width,
+        "ci_high": float(mean) + half_width,
+        "variance_reduction": _variance_reduction(plain_variance, hands, half_width, confidence),
+    }
+
+def _variance_reduction(plain_variance, hands, half_width, confidence):
+    # Hands plain Monte Carlo would need for the same half width, over the hands used
+    if half_width <= 0:
+        return math.inf
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return float(plain_variance * z * z / (hands * half_width * half_width))
+
+def _shuffle_columns(cards, rng):
+    order = np.argsort(rng.random(cards.shape), axis=1)
+    return np.take_along_axis(cards, order, axis=1)
+
+def plain_estimate(bet, num_simulations=100000, seed=None, confidence=0.95):
+    """Plain Monte Carlo estimate of a side bet's expected payout, for comparison."""
+    rng = make_rng(seed)
+    total = total_squares = 0.0
+    for size in chunk_sizes(num_simulations):
+        payouts = bet.round_payouts(RoundBatch(draw_deals(size, 9, rng)))
+        total += payouts.sum()
+        total_squares += (payouts ** 2).sum()
+    mean = total / num_simulations
+    variance = max(total_squares / num_simulations - mean * mean, 0.0)
+    return _summary(mean, variance / num_simulations, num_simulations, variance, confidence)
+
+@lru_cache(maxsize=None)
+def _hand_strata():
+    """Splits the 7-card boards by rank pattern, by whether 5+ cards share a suit and
+    by whether the ranks hold a straight, with the exact number of boards in each.
+
+    Every (rank multiset, flush ranks) pair is an item of a stratum, counted like in
+    exact.seven_card_category_counts(); sampling picks an item by its number of boards
+    and then its suits uniformly, see _deal_hand_stratum().
+
+    Returns:
+        list: One (key, boards, items) tuple per stratum, sorted by key. items is a
+        dict of numpy arrays: 'ranks' (7 ranks per item, sorted), 'occurrence' (which
+        copy of its rank each card is), 'flush_ranks' (13 flags, all False when no
+        suit has 5 cards) and 'cumulative' (the cumulative share of the boards).
+    """
+    strata = {}
+    for ranks in combinations_with_replacement(range(13), 7):
+        rank_counts = [0] * 13
+        for rank in ranks:
+            rank_counts[rank] += 1
+        if max(rank_counts) > 4:
+            continue
+        distinct = [rank for rank in range(13) if rank_counts[rank]]
+        pattern = tuple(sorted((count for count in rank_counts if count), reverse=True))
+        straight = _straight_high(sum(1 << rank for rank in distinct)) >= 0
+        occurrence = [index - ranks.index(rank) for index, rank in enumerate(ranks)]
+        suit_ways = prod(comb(4, rank_counts[rank]) for rank in distinct)
+        flush_ways = 0
+        for size in range(5, len(distinct) + 1):
+            for flush_ranks in combinations(distinct, size):
+                ways = 4 * prod(comb(3, rank_counts[rank] - (rank in flush_ranks)) for rank in distinct)
+                if ways:
+                    flags = [rank in flush_ranks for rank in range(13)]
+                    strata.setdefault((pattern, True, straight), []).append((ranks, occurrence, flags, ways))
+                    flush_ways += ways
+        strata.setdefault((pattern, False, straight), []).append((ranks, occurrence, [False] * 13,
+                                                                  suit_ways - flush_ways))
+    result = []
+    for key in sorted(strata):
+        ranks, occurrence, flags, ways = zip(*strata[key])
+        boards = sum(ways)
+        result.append((key, boards, {
+            "ranks": np.array(ranks, dtype=np.int8),
+            "occurrence": np.array(occurrence, dtype=np.intp),
+            "flush_ranks": np.array(flags, dtype=bool),
+            "cumulative": np.cumsum(ways) / boards,
+        }))
+    return result
+
+def _deal_hand_stratum(key, items, size, rng):
+    # The player's 7 cards from one stratum of _hand_strata(), then 2 dealer cards from the rest of the deck
+    picked = np.minimum(np.searchsorted(items["cumulative"], rng.random(size), side="right"),
+                        len(items["cumulative"]) - 1)
+    ranks = items["ranks"][picked]
+    occurrence = items["occurrence"][picked]
+    rows = np.arange(size)[:, None]
+    if key[1]:
+        # The first card of each flush rank takes the flush suit, the other cards
+        # distinct suits out of the other 3
+        flush_suit = rng.integers(0, 4, (size, 1))
+        in_flush = items["flush_ranks"][picked][rows, ranks]
+        slots = np.argsort(rng.random((size, 13, 3)), axis=2)
+        other = slots[rows, ranks, np.maximum(occurrence - in_flush, 0)]
+        suits = np.where(in_flush & (occurrence == 0), flush_suit, (flush_suit + 1 + other) % 4)
+    else:
+        # Distinct suits per rank, dealt again while 5 cards share a suit
+        suits = np.empty((size, 7), dtype=np.intp)
+        redo = np.arange(size)
+        while len(redo):
+            slots = np.argsort(rng.random((len(redo), 13, 4)), axis=2)
+            suits[redo] = slots[np.arange(len(redo))[:, None], ranks[redo], occurrence[redo]]
+            flush = (suits[redo, :, None] == np.arange(4)).sum(axis=1).max(axis=1) >= 5
+            redo = redo[flush]
+    hands = _shuffle_columns((ranks * 4 + suits).astype(np.int8), rng)
+    dealer = rng.integers(0, 52, (size, 2), dtype=np.int8)
+    while True:
+        clash = (dealer[:, :, None] == hands[:, None, :]).any(axis=2)
+        clash[:, 1] |= dealer[:, 0] == dealer[:, 1]
+        if not clash.any():
+            break
+        dealer[clash] = rng.integers(0, 52, int(clash.sum()), dtype=np.int8)
+    return np.hstack([hands[:, :2], dealer, hands[:, 2:]])
+
+def _deal_suit_count(suit, count, size, rng):
+    cards = np.hstack([deal_batch(size, count, rng, _SUIT_CARDS[suit]),
+                       deal_batch(size, 9 - count, rng, _OTHER_CARDS[suit])])
+    return _shuffle_columns(cards, rng)
+
+def _strata(bet):
+    # (probabilities, deal(stratum, size, rng)) of the strata of a bet
+    if bet.kind == "suit_count":
+        ways = diamonds_count_distribution(9)
+        probabilities = np.array([ways[count] for count in range(10)]) / comb(52, 9)
+        return probabilities, lambda stratum, size, rng: _deal_suit_count(bet.suit, stratum, size, rng)
+    if bet.kind in ("player_hand", "bad_beat"):
+        strata = _hand_strata()
+        probabilities = np.array([boards for _, boards, _ in strata]) / comb(52, 7)
+        return probabilities, lambda stratum, size, rng: _deal_hand_stratum(strata[stratum][0], strata[stratum][2],
+                                                                          size, rng)
+    raise ValueError(f"Stratified sampling is not supported for {bet.kind} bets")
+
+def stratified_estimate(bet, num_simulations=100000, seed=None, pilot_fraction=0.1, confidence=0.95):
+    """Estimates a side bet's expected payout from deals stratified on the outcomes it pays on.
+
+    A 'suit_count' bet is stratified on the number of cards of its suit out of 9.
+    'player_hand' and 'bad_beat' bets are stratified on the player's 7 cards: their
+    rank pattern (e.g. 3-2-1-1), whether 5 of them share a suit and whether their
+    ranks hold a straight, 23 strata in all. Within a stratum the player's best
+    hand is fixed except for flush against straight flush, so most of the Trips
+    variance is gone; a Bad Beat bet keeps the variance of the dealer's hand.
+    A pilot run, proportional to the stratum probabilities with at least
+    MIN_STRATUM_HANDS per stratum, estimates the spread of the payout in each
+    stratum, and the rest of the hands go where p * std_dev is largest (Neyman
+    allocation). The estimate only uses the hands after the pilot.
+
+    Args:
+        bet (SideBet): A 'suit_count', 'player_hand' or 'bad_beat' bet.
+        num_simulations (int): The number of hands to deal, pilot included.
+        seed (int): Seed for the random generator. Defaults to None (unseeded).
+        pilot_fraction (float): Share of the hands used by the pilot run. Defaults to 0.1.
+        confidence (float): Level of the confidence interval. Defaults to 0.95.
+
+    Returns:
+        dict: See the module docstring, with the 'strata' count.
+
+    Raises:
+        ValueError: For the other kinds of bets.
+    """
+    probabilities, deal = _strata(bet)
+    rng = make_rng(seed)
+
+    def run(allocation):
+        hands = np.zeros(len(probabilities), dtype=np.int64)
+        totals = np.zeros(len(probabilities))
+        squares = np.zeros(len(probabilities))
+        for stratum, count in enumerate(allocation):
+            for size in chunk_sizes(int(count)):
+                payouts = bet.round_payouts(RoundBatch(deal(stratum, size, rng)))
+                hands[stratum] += size
+                totals[stratum] += payouts.sum()
+                squares[stratum] += (payouts ** 2).sum()
+        means = totals / hands
+        return hands, means, np.maximum(squares / hands - means ** 2, 0.0) * hands / (hands - 1)
+
+    pilot_hands, _, pilot_variances = run(np.maximum(np.round(probabilities * num_simulations * pilot_fraction),
+                                                     MIN_STRATUM_HANDS))
+    # The pilot only sets the allocation: reusing its hands would bias the strata it undersampled
+    weights = probabilities * np.sqrt(pilot_variances)
+    remaining = max(num_simulations - pilot_hands.sum(), 0)
+    allocation = np.floor(remaining * weights / weights.sum()) if weights.sum() > 0 else np.zeros(len(weights))
+    hands, means, variances = run(np.maximum(allocation, MIN_STRATUM_HANDS))
+
+    mean = (probabilities * means).sum()
+    plain_variance = (probabilities * (variances + means ** 2)).sum() - mean ** 2
+    result = _summary(mean, (probabilities ** 2 * variances / hands).sum(), pilot_hands.sum() + hands.sum(),
+                      plain_variance, confidence)
+    result["strata"] = len(probabilities)
+    return result
+
+def tilted_deals(num_deals, suit, tilt, rng):
+    """Deals 9 cards per row with every card of 'suit' 'tilt' times as likely to be drawn
+    as a card of another suit, and the likelihood ratio of each deal.
+
+    Returns:
+        tuple: (deals, weights), an (num_deals, 9) int8 array of card ids and the
+        probability of each deal from a fair deck divided by its tilted probability.
+    """
+    suited_left = np.full(num_deals, 13)
+    others_left = np.full(num_deals, 39)
+    suited = np.empty((num_deals, 9), dtype=bool)
+    weights = np.ones(num_deals)
+    uniforms = rng.random((num_deals, 9))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for position in range(9):
+            fair = suited_left / (suited_left + others_left)
+            tilted = suited_left * tilt / (suited_left * tilt + others_left)
+            picked = uniforms[:, position] < tilted
+            weights *= np.where(picked, fair / tilted, (1 - fair) / (1 - tilted))
+            suited[:, position] = picked
+            suited_left -= picked
+            others_left -= ~picked
+    # Which cards of each group come out doesn't change the weights, so they're uniform
+    suited_cards = deal_batch(num_deals, 9, rng, _SUIT_CARDS[suit])
+    other_cards = deal_batch(num_deals, 9, rng, _OTHER_CARDS[suit])
+    suited_index = np.maximum(np.cumsum(suited, axis=1) - 1, 0)
+    other_index = np.maximum(np.cumsum(~suited, axis=1) - 1, 0)
+    deals = np.where(suited, np.take_along_axis(suited_cards, suited_index, axis=1),
+                     np.take_along_axis(other_cards, other_index, axis=1))
+    return deals, weights
+
+def importance_estimate(bet, num_simulations=100000, seed=None, tilt=None, suit=None, confidence=0.95):
+    """Estimates a side bet's expected payout from deals tilted towards one suit.
+
+    Args:
+        bet (SideBet): The side bet.
+        num_simulations (int): The number of hands to deal.
+        seed (int): Seed for the random generator. Defaults to None (unseeded).
+        tilt (float): How much likelier a card of the tilted suit is. Defaults to
+            DEFAULT_TILT. Tilting one suit only pays off for bets on a suit: a
+            flush bet gains in one suit what it loses in the other three.
+        suit (int): The suit index to tilt towards. Defaults to the bet's suit.
+        confidence (float): Level of the confidence interval. Defaults to 0.95.
+
+    Returns:
+        dict: See the module docstring, with the 'effective_hands' (the effective
+        sample size of the weights) and the 'tilt'.
+    """
+    tilt = tilt or DEFAULT_TILT
+    suit = bet.suit if suit is None else suit
+    rng = make_rng(seed)
+    total = total_squares = plain_squares = weight_sum = weight_squares = 0.0
+    for size in chunk_sizes(num_simulations):
+        deals, weights = tilted_deals(size, suit, tilt, rng)
+        payouts = bet.round_payouts(RoundBatch(deals))
+        weighted = weights * payouts
+        total += weighted.sum()
+        total_squares += (weighted ** 2).sum()
+        plain_squares += (weighted * payouts).sum()
+        weight_sum += weights.sum()
+        weight_squares += (weights ** 2).sum()
+    mean = total / num_simulations
+    variance = max(total_squares / num_simulations - mean * mean, 0.0)
+    plain_variance = max(plain_squares / num_simulations - mean * mean, 0.0)
+    result = _summary(mean, variance / num_simulations, num_simulations, plain_variance, confidence)
+    result["effective_hands"] = float(weight_sum ** 2 / weight_squares)
+    result["tilt"] = tilt
+    return result
+
+def control_means(suit):
+    """Returns the exact means of the control variates used by control_estimate():
+    the player's 7-card category indicators, then the indicators of 0 to 9 cards of
+    'suit' out of 9, each set without its first entry.
+    """
+    categories = seven_card_category_counts()
+    suit_counts = diamonds_count_distribution(9)  # Every suit has the same distribution
+    return np.array([categories[name] / comb(52, 7) for name in CATEGORIES[1:]] +
+                    [suit_counts[count] / comb(52, 9) for count in range(1, 10)])
+
+def _controls(round_data, suit):
+    categories = round_data.player_strengths() >> CATEGORY_SHIFT
+    suit_counts = suit_counts_batch(round_data.deals, suit)
+    return np.hstack([np.eye(len(CATEGORIES))[categories][:, 1:], np.eye(10)[suit_counts][:, 1:]])
+
+def control_estimate(bet, num_simulations=100000, seed=None, confidence=0.95):
+    """Estimates a side bet's expected payout with control variates of known mean.
+
+    The controls are the player's hand category and the number of cards of the
+    bet's suit, whose exact probabilities come from exact.py. The payout is
+    regressed on them and the plain average is corrected by the regression times
+    the gap between their observed and exact frequencies. A bet that only depends
+    on one of them (Trips, Diamonds) comes out exact, with a standard error of 0,
+    once every outcome it pays on has come up.
+
+    Args:
+        bet (SideBet): The side bet.
+        num_simulations (int): The number of hands to deal.
+        seed (int): Seed for the random generator. Defaults to None (unseeded).
+        confidence (float): Level of the confidence interval. Defaults to 0.95.
+
+    Returns:
+        dict: See the module docstring, with the number of 'controls' used and the
+        'unobserved' exact probability of the control outcomes that never came up
+        (9 diamonds in a short run). Their payouts can't be estimated, so the
+        interval is widened by the largest payout times that probability.
+    """
+    rng = make_rng(seed)
+    means = control_means(bet.suit)
+    # Raw moments, accumulated per chunk so no per-hand data is kept
+    x_sum = np.zeros(len(means))
+    xx_sum = np.zeros((len(means), len(means)))
+    xy_sum = np.zeros(len(means))
+    y_sum = y_squares = 0.0
+    for size in chunk_sizes(num_simulations):
+        round_data = RoundBatch(draw_deals(size, 9, rng))
+        payouts = bet.round_payouts(round_data)
+        controls = _controls(round_data, bet.suit)
+        x_sum += controls.sum(axis=0)
+        xx_sum += controls.T @ controls
+        xy_sum += controls.T @ payouts
+        y_sum += payouts.sum()
+        y_squares += (payouts ** 2).sum()
+
+    n = num_simulations
+    x_mean = x_sum / n
+    y_mean = y_sum / n
+    sxx = xx_sum - n * np.outer(x_mean, x_mean)
+    sxy = xy_sum - n * x_mean * y_mean
+    syy = y_squares - n * y_mean * y_mean
+    # Outcomes that never came up carry no information about the payout
+    used = np.diag(sxx) > 1e-9
+    beta = np.linalg.lstsq(sxx[np.ix_(used, used)], sxy[used], rcond=None)[0]
+    mean = y_mean - beta @ (x_mean[used] - means[used])
+    residual_variance = max(syy - beta @ sxy[used], 0.0) / max(n - used.sum() - 1, 1)
+    if residual_variance < 1e-12 * max(syy / n, 1e-300):
+        residual_variance = 0.0  # Rounding error of an exact fit
+    unobserved = float(means[~used].sum())
+    bound = max((abs(payout) for payout in bet.payouts.values()), default=0.0) * unobserved
+    result = _summary(mean, residual_variance / n, n, syy / (n - 1), confidence, bound)
+    result["controls"] = int(used.sum())
+    result["unobserved"] = unobserved
+    return result
+
+ESTIMATORS = {
+    "plain": plain_estimate,
+    "stratified": stratified_estimate,
+    "importance": importance_estimate,
+    "control": control_estimate,
+}
+
+if __name__ == "__main__":
+    exact = {"Trips": float(exact_trips(TRIPS.payouts)[0]), "Diamonds": float(exact_diamonds(DIAMONDS.payouts)[0])}
+    for bet in (TRIPS, DIAMONDS, BAD_BEAT):
+        print(f"{bet.name} (exact {exact[bet.name]:.5f})" if bet.name in exact else bet.name)
+        for name, estimator in ESTIMATORS.items():
+            if name == "importance" and bet.kind != "suit_count":
+                continue
+            result = estimator(bet, 200000, seed=0)
+            print(f"  {name:<10} {result['expected_payout']:.5f} +/- {result['half_width']:.5f}"
+                  f"  variance reduction {result['variance_reduction']:.1f}x")
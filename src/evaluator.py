@@ -0,0 +1,226 @@
+from itertools import combinations_with_replacement
+from numbers import Integral
+from poker import CARDS, CARD_RANK, CARD_SUIT, Hand
+
+"""
+Table-driven hand evaluator
+---------------------------
+Maps any set of up to 7 cards (as integer card ids, see poker.CARDS) to a single
+integer strength where a bigger number is a better hand. All of the work is done
+by three precomputed tables:
+
+- FLUSH_SUIT: the suits of the hand are packed into base-8 digits, one per suit,
+  and the table gives the suit with 5 or more cards (or -1).
+- FLUSH_STRENGTH: indexed by the 13-bit rank mask of the flush suit.
+- RANK_STRENGTH: indexed by the product of one prime per rank, which is unique
+  for every multiset of ranks.
+
+With 7 cards or fewer a flush can never be beaten by a full house or quads, so
+a hand is a single table lookup once the flush check is done.
+
+A strength is laid out as category << 20 followed by up to five 4-bit rank
+indexes (most significant first), so hands of the same category compare on
+their kickers.
+"""
+
+CATEGORIES = [
+    "High Card",
+    "One Pair",
+    "Two Pair",
+    "Three of a Kind",
+    "Straight",
+    "Flush",
+    "Full House",
+    "Four of a Kind",
+    "Straight Flush",
+]
+(HIGH_CARD, ONE_PAIR, TWO_PAIR, THREE_OF_A_KIND, STRAIGHT,
+ FLUSH, FULL_HOUSE, FOUR_OF_A_KIND, STRAIGHT_FLUSH) = range(9)
+CATEGORY_SHIFT = 20
+
+PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+CARD_PRIME = tuple(PRIMES[CARD_RANK[card]] for card in range(52))
+CARD_RANK_BIT = tuple(1 << CARD_RANK[card] for card in range(52))
+CARD_SUIT_WEIGHT = tuple(1 << (3 * CARD_SUIT[card]) for card in range(52))
+
+def make_strength(category, ranks):
+    """Packs a hand category and its ranks (most significant first) into a strength.
+
+    Args:
+        category (int): Index of the category in CATEGORIES.
+        ranks (list): Up to five rank indexes that break ties within the category.
+    """
+    strength = category
+    for position in range(5):
+        strength = (strength << 4) | (ranks[position] if position < len(ranks) else 0)
+    return strength
+
+def _straight_high(mask):
+    """Returns the rank index of the highest straight in a rank mask, or -1."""
+    for high in range(12, 3, -1):
+        if (mask >> (high - 4)) & 0b11111 == 0b11111:
+            return high
+    if mask & 0b1000000001111 == 0b1000000001111:  # Ace to 5, the wheel
+        return 3
+    return -1
+
+def _top_ranks(mask, count):
+    """Returns the 'count' highest rank indexes set in a rank mask."""
+    return [rank for rank in range(12, -1, -1) if mask >> rank & 1][:count]
+
+def _rank_strength(counts):
+    """Returns the strength of the best hand made from a multiset of ranks, ignoring suits.
+
+    Args:
+        counts (list): Number of cards of each of the 13 ranks.
+    """
+    groups = sorted(((count, rank) for rank, count in enumerate(counts) if count), reverse=True)
+    mask = sum(1 << rank for count, rank in groups)
+    straight_high = _straight_high(mask)
+    top_count, top_rank = groups[0]
+    second_count = groups[1][0] if len(groups) > 1 else 0
+
+    if top_count == 4:
+        return make_strength(FOUR_OF_A_KIND, [top_rank] + _top_ranks(mask & ~(1 << top_rank), 1))
+    if top_count == 3 and second_count >= 2:
+        return make_strength(FULL_HOUSE, [top_rank, groups[1][1]])
+    if straight_high >= 0:
+        return make_strength(STRAIGHT, [straight_high])
+    if top_count == 3:
+        return make_strength(THREE_OF_A_KIND, [top_rank] + _top_ranks(mask & ~(1 << top_rank), 2))
+    if top_count == 2 and second_count == 2:
+        second_rank = groups[1][1]
+        kickers = _top_ranks(mask & ~(1 << top_rank) & ~(1 << second_rank), 1)
+        return make_strength(TWO_PAIR, [top_rank, second_rank] + kickers)
+    if top_count == 2:
+        return make_strength(ONE_PAIR, [top_rank] + _top_ranks(mask & ~(1 << top_rank), 3))
+    return make_strength(HIGH_CARD, _top_ranks(mask, 5))
+
+def _build_tables():
+    flush_suit = [-1] * 4096
+    for key in range(4096):
+        for suit in range(4):
+            if (key >> (3 * suit)) & 7 >= 5:
+                flush_suit[key] = suit
+
+    flush_strength = [0] * 8192
+    for mask in range(8192):
+        if bin(mask).count("1") >= 5:
+            straight_high = _straight_high(mask)
+            if straight_high >= 0:
+                flush_strength[mask] = make_strength(STRAIGHT_FLUSH, [straight_high])
+            else:
+                flush_strength[mask] = make_strength(FLUSH, _top_ranks(mask, 5))
+
+    rank_strength = {}
+    for size in range(1, 8):
+        for ranks in combinations_with_replacement(range(13), size):
+            counts = [0] * 13
+            product = 1
+            for rank in ranks:
+                counts[rank] += 1
+                product *= PRIMES[rank]
+            if max(counts) <= 4:
+                rank_strength[product] = _rank_strength(counts)
+    return flush_suit, flush_strength, rank_strength
+
+FLUSH_SUIT, FLUSH_STRENGTH, RANK_STRENGTH = _build_tables()
+STRAIGHT_HIGH = tuple(_straight_high(mask) for mask in range(8192))  # Rank mask to its highest straight, or -1
+
+def evaluate(card_ids):
+    """Evaluates up to 7 cards and returns the strength of the best hand. Bigger is better.
+
+    Args:
+        card_ids (list): Integer card ids (see poker.CARDS).
+
+    Returns:
+        int: The strength of the best hand. Use hand_category() to get its category.
+    """
+    suit_key = 0
+    product = 1
+    for card in card_ids:
+        suit_key += CARD_SUIT_WEIGHT[card]
+        product *= CARD_PRIME[card]
+    suit = FLUSH_SUIT[suit_key]
+    if suit >= 0:
+        mask = 0
+        for card in card_ids:
+            if CARD_SUIT[card] == suit:
+                mask |= CARD_RANK_BIT[card]
+        return FLUSH_STRENGTH[mask]
+    return RANK_STRENGTH[product]
+
+def evaluate_cards(cards):
+    """Evaluates a list of Card objects. See evaluate()."""
+    return evaluate([card.id for card in cards])
+
+def hand_category(strength):
+    """Returns the category index (see CATEGORIES) of a hand strength."""
+    return strength >> CATEGORY_SHIFT
+
+def category_name(strength):
+    """Returns the category name of a hand strength, e.g. 'Full House'."""
+    return CATEGORIES[strength >> CATEGORY_SHIFT]
+
+def _strength(hand, board):
+    if isinstance(hand, Integral):
+        return hand
+    if isinstance(hand, Hand):
+        return hand.strength()
+    return evaluate(list(hand) + list(board))
+
+def compare(hand_a, hand_b, board=()):
+    """Compares two hands, kickers included.
+
+    Args:
+        hand_a: A strength from evaluate(), a Hand, or a list of card ids.
+        hand_b: The other hand, in any of the same forms.
+        board (list): Community card ids added to hands given as card ids. Defaults to none.
+
+    Returns:
+        int: 1 if hand_a wins, -1 if hand_b wins and 0 if they tie.
+    """
+    strength_a = _strength(hand_a, board)
+    strength_b = _strength(hand_b, board)
+    return (strength_a > strength_b) - (strength_a < strength_b)
+
+def showdown(players, board=()):
+    """Finds the winners of a pot in one pass, splitting it evenly between tied hands.
+
+    Args:
+        players (list): One hand per player: strengths, Hands or lists of hole card ids.
+        board (list): Community card ids added to hands given as card ids. Defaults to none.
+
+    Returns:
+        tuple: (winners, shares) where winners are the indexes of the winning players
+        and shares is each player's fraction of the pot.
+    """
+    best = -1
+    winners = []
+    for index, hand in enumerate(players):
+        strength = _strength(hand, board)
+        if strength > best:
+            best = strength
+            winners = [index]
+        elif strength == best:
+            winners.append(index)
+    shares = [0.0] * len(players)
+    for index in winners:
+        shares[index] = 1 / len(winners)
+    return winners, shares
+
+def legacy_strengths(card_ids):
+    """Compatibility adapter for callers working on card ids that need the
+    (strengths_list, strengths_dict) shape returned by Hand.evaluate_hand().
+
+    Args:
+        card_ids (list): Integer card ids (see poker.CARDS).
+    """
+    return Hand([CARDS[card] for card in card_ids]).evaluate_hand()
+
+def test_evaluate():
+    hands = [[48, 44, 40, 36, 32], [51, 2, 6, 10, 14], [0, 1, 2, 3, 51, 47, 43], [8, 9, 10, 20, 21, 30, 40]]
+    for hand in hands:
+        strength = evaluate(hand)
+        print([CARDS[card] for card in hand], category_name(strength), hex(strength))
+#test_evaluate()
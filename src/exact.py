@@ -0,0 +1,109 @@
+from fractions import Fraction
+from functools import lru_cache
+from itertools import combinations, combinations_with_replacement
+from math import comb, prod
+from evaluator import CATEGORIES, FLUSH, STRAIGHT_FLUSH, _rank_strength, _straight_high, hand_category
+from rewards import diamonds_rewards, trips_rewards
+
+"""
+Exact side-bet odds
+-------------------
+Exact category probabilities and expected payouts for the Trips and Diamonds side
+bets, to use instead of the sampled estimates from simulate_trips() and
+simulate_diamonds().
+
+Diamonds has a closed form: the number of diamonds in the 9 dealt cards follows a
+hypergeometric distribution.
+
+Trips is enumerated over all C(52, 7) seven-card boards without visiting them one
+by one. Boards are grouped by their multiset of ranks (50,388 groups) and the
+suits are counted rather than enumerated: a rank dealt c times can take its suits
+in C(4, c) ways, and the only suit assignments that change the hand are the ones
+with 5 or more cards of one suit, which are counted per flush suit and per set of
+flush ranks. Everything is exact integer arithmetic and takes a couple of seconds.
+"""
+
+@lru_cache(maxsize=None)
+def diamonds_count_distribution(num_cards=9):
+    """Returns the number of ways to deal 'num_cards' cards with each possible number of diamonds.
+
+    Args:
+        num_cards (int): The number of cards dealt. Defaults to 9 (player, dealer and board).
+
+    Returns:
+        dict: Number of diamonds to number of deals. The values sum to C(52, num_cards).
+    """
+    return {k: comb(13, k) * comb(39, num_cards - k) for k in range(min(13, num_cards) + 1)}
+
+@lru_cache(maxsize=None)
+def seven_card_category_counts():
+    """Returns the number of 7-card boards whose best hand falls in each category.
+
+    Returns:
+        dict: Category name (see evaluator.CATEGORIES) to number of boards. The values
+        sum to C(52, 7) = 133,784,560.
+    """
+    counts = [0] * len(CATEGORIES)
+    for ranks in combinations_with_replacement(range(13), 7):
+        rank_counts = [0] * 13
+        for rank in ranks:
+            rank_counts[rank] += 1
+        if max(rank_counts) > 4:
+            continue
+        distinct = [rank for rank in range(13) if rank_counts[rank]]
+        suit_ways = prod(comb(4, rank_counts[rank]) for rank in distinct)
+
+        # Suit assignments with 5+ cards of one suit. 'flush_ranks' are the ranks that
+        # have a card of the flush suit; the other cards go to the 3 remaining suits.
+        flush_ways = 0
+        for size in range(5, len(distinct) + 1):
+            for flush_ranks in combinations(distinct, size):
+                ways = 4 * prod(comb(3, rank_counts[rank] - (rank in flush_ranks)) for rank in distinct)
+                if ways:
+                    mask = sum(1 << rank for rank in flush_ranks)
+                    category = STRAIGHT_FLUSH if _straight_high(mask) >= 0 else FLUSH
+                    counts[category] += ways
+                    flush_ways += ways
+
+        counts[hand_category(_rank_strength(rank_counts))] += suit_ways - flush_ways
+    return dict(zip(CATEGORIES, counts))
+
+def exact_diamonds(rewards=diamonds_rewards):
+    """Returns the exact expected payout and paying probabilities of the Diamonds side bet.
+
+    Args:
+        rewards (dict): Number of diamonds to payout. Defaults to diamonds_rewards.
+
+    Returns:
+        tuple: (expected_payout, probabilities) as Fractions, with probabilities keyed
+        like the counts returned by simulate_diamonds().
+    """
+    distribution = diamonds_count_distribution(9)
+    total = comb(52, 9)
+    probabilities = {k: Fraction(distribution[k], total) for k in rewards}
+    expected_payout = sum(rewards[k] * probabilities[k] for k in rewards)
+    return expected_payout, probabilities
+
+def exact_trips(rewards=trips_rewards):
+    """Returns the exact expected payout and paying probabilities of the Trips side bet.
+
+    Args:
+        rewards (dict): Hand category name to payout. Defaults to trips_rewards.
+
+    Returns:
+        tuple: (expected_payout, probabilities) as Fractions, with probabilities keyed
+        like the counts returned by simulate_trips().
+    """
+    counts = seven_card_category_counts()
+    total = comb(52, 7)
+    probabilities = {hand: Fraction(counts[hand], total) for hand in rewards}
+    expected_payout = sum(rewards[hand] * probabilities[hand] for hand in rewards)
+    return expected_payout, probabilities
+
+if __name__ == "__main__":
+    trips_payout, trips_probabilities = exact_trips()
+    print("Exact Expected Payout for Trips Side Bet:\n", float(trips_payout))
+    print("Exact Probability of Each Hand Type for Trips:\n", {k: float(v) for k, v in trips_probabilities.items()})
+    diamonds_payout, diamonds_probabilities = exact_diamonds()
+    print("Exact Expected Payout for Diamonds Side Bet:\n", float(diamonds_payout))
+    print("Exact Probability of Each Number of Diamonds:\n", {k: float(v) for k, v in diamonds_probabilities.items()})
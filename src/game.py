@@ -1,4 +1,11 @@
+from functools import partial
+import numpy as np
+import metrics
 from poker import Deck, Hand
+from evaluator import CATEGORIES, CATEGORY_SHIFT, showdown
+from batch import chunk_sizes, draw_deals, evaluate_batch, showdown_batch
+from parallel import run_parallel
+from rng import make_rng
 
 class Player:
     def __init__(self, name):
@@ -26,6 +33,16 @@ class Game:
         self.players = players
         self.deck = deck
         self.community_cards = []
+
+    def reset(self):
+        """Starts a new round with the same players and deck: the dealt cards go back
+        into the deck, which is reshuffled, and the hands are cleared.
+        """
+        self.deck.reset()
+        self.community_cards.clear()
+        for player in self.players:
+            player.hand_cards = []
+            player.full_hand = None
     
     def deal_hands(self):
         """Deals two cards to each player
@@ -46,6 +63,11 @@ class Game:
         for player in self.players:
             results[player.name] = player.combine_with_community(self.community_cards)
         return results
+
+    def showdown(self):
+        """Returns the players holding the best hand, more than one on a split pot."""
+        winners, _ = showdown([Hand(player.hand_cards + self.community_cards) for player in self.players])
+        return [self.players[index] for index in winners]
         
 
 # Simulate the round and format the output:
@@ -63,6 +85,86 @@ def print_results(game):
                 print(f"  {key}: {', '.join(str(card) for card in hand_result[1][key])}")
         print()
 
+MIN_PLAYERS = 2
+MAX_PLAYERS = 10
+
+def simulate_tables(num_tables, num_players=7, seed=None):
+    """Deals and shows down many independent tables at once with the batch evaluator.
+
+    Every table deals 2 cards to each seat and a 5 card board, and the pot goes to the
+    best hand or is split evenly between the tied best hands.
+
+    Args:
+        num_tables (int): The number of tables to simulate.
+        num_players (int): Players at every table, from 2 to 10. Defaults to 7.
+        seed (int): Seed for the random generator. Defaults to None (unseeded).
+
+    Returns:
+        tuple: (pot_shares, counts). pot_shares is the average share of the pot won by
+        each seat, 1 / num_players per seat on a fair deck. counts holds, per seat, the
+        pots won outright ('wins') and split ('splits') and the hands made by category
+        ('categories'), plus the number of tables split N ways ('split_pots') and the
+        category of the winning hand ('winning_hands'). Works with run_parallel()
+        through functools.partial(simulate_tables, num_players=...).
+    """
+    if not MIN_PLAYERS <= num_players <= MAX_PLAYERS:
+        raise ValueError(f"A table seats {MIN_PLAYERS} to {MAX_PLAYERS} players")
+    rng = make_rng(seed)
+    seats = range(num_players)
+    shares = np.zeros(num_players)
+    wins = np.zeros(num_players, dtype=np.int64)
+    splits = np.zeros(num_players, dtype=np.int64)
+    categories = np.zeros(num_players * len(CATEGORIES), dtype=np.int64)
+    split_pots = np.zeros(num_players + 1, dtype=np.int64)
+    winning_hands = np.zeros(len(CATEGORIES), dtype=np.int64)
+
+    for size in chunk_sizes(num_tables):
+        watch = metrics.stopwatch()
+        deals = draw_deals(size, 2 * num_players + 5, rng)
+        board = deals[:, -5:]
+        watch.lap("deal")
+        strengths = np.stack([evaluate_batch(np.hstack([deals[:, 2 * seat:2 * seat + 2], board])) for seat in seats],
+                             axis=1)
+        watch.lap("evaluate")
+        winners, pot_shares = showdown_batch(strengths)
+        ways = winners.sum(axis=1)
+        best = strengths.max(axis=1)
+
+        shares += pot_shares.sum(axis=0)
+        wins += (winners & (ways == 1)[:, None]).sum(axis=0)
+        splits += (winners & (ways > 1)[:, None]).sum(axis=0)
+        seat_categories = np.arange(num_players) * len(CATEGORIES) + (strengths >> CATEGORY_SHIFT)
+        categories += np.bincount(seat_categories.ravel(), minlength=len(categories))
+        split_pots += np.bincount(ways, minlength=len(split_pots))
+        winning_hands += np.bincount(best >> CATEGORY_SHIFT, minlength=len(CATEGORIES))
+        watch.lap("settle")
+        if metrics.ENABLED:
+            metrics.add_hands(size)
+
+    counts = {
+        "wins": {seat: int(wins[seat]) for seat in seats},
+        "splits": {seat: int(splits[seat]) for seat in seats},
+        "categories": {seat: {name: int(categories[seat * len(CATEGORIES) + code]) for code, name in enumerate(CATEGORIES)}
+                       for seat in seats},
+        "split_pots": {way: int(split_pots[way]) for way in range(1, num_players + 1)},
+        "winning_hands": {name: int(count) for name, count in zip(CATEGORIES, winning_hands)},
+    }
+    pot_shares = {seat: float(shares[seat] / num_tables) for seat in seats}
+    return pot_shares, counts
+
+def run_tables(num_tables, num_players=7, seed=None, workers=None, chunk_size=None):
+    """Runs simulate_tables() split into chunks over a pool of workers, see parallel.run_parallel()."""
+    return run_parallel(partial(simulate_tables, num_players=num_players), num_tables, seed=seed,
+                        workers=workers, chunk_size=chunk_size)
+
+def print_table_stats(pot_shares, counts, num_tables):
+    print(f"{num_tables:,} tables of {len(pot_shares)} players")
+    print("Seat  Pot share  Wins      Splits")
+    for seat, share in pot_shares.items():
+        print(f"{seat:>4}  {share:>9.4f}  {counts['wins'][seat]:<9,} {counts['splits'][seat]:,}")
+    print("Split pots:", {ways: count for ways, count in counts["split_pots"].items() if count})
+    print("Winning hands:", {name: count / num_tables for name, count in counts["winning_hands"].items()})
+
 if __name__ == "__main__":
     player_names = ["Alice", "Bob", "Charlie", "David", "Eve", "Frank", "Grace"]
     players = [Player(name) for name in player_names]  # Create Player objects from names
@@ -71,4 +173,7 @@ if __name__ == "__main__":
     game.deal_hands()
     game.simulate_phases(['flop', 'turn', 'river'])
     results = game.evaluate_hands()
-    print_results(game)
\ No newline at end of file
+    print_results(game)
+
+    pot_shares, counts = run_tables(1000000, len(player_names), seed=0)
+    print_table_stats(pot_shares, counts, 1000000)
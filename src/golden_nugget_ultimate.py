@@ -1,6 +1,16 @@
-from poker import Deck, Hand
+from poker import Deck, Hand, CARD_SUIT, DIAMONDS
 from game import Player, Game, print_results
-import concurrent.futures
+from evaluator import (evaluate, evaluate_cards, category_name, hand_category, compare, CATEGORY_SHIFT,
+                       ONE_PAIR, STRAIGHT, FLUSH, FULL_HOUSE, FOUR_OF_A_KIND, STRAIGHT_FLUSH)
+from batch import draw_deals, evaluate_batch, category_counts, suit_counts_batch, chunk_sizes, compare_batch
+from parallel import run_parallel
+from rewards import ROYAL_FLUSH, diamonds_rewards, trips_rewards
+from rng import make_rng
+from functools import partial
+import metrics
+import paytable
+import numpy as np
+import random
 
 """
 Golden Nugget Ultimate Texas Hold'em
@@ -17,107 +27,301 @@ Diamonds and Trips. The payouts are as follows (multiplied by the bet):
 - Trips: Straight Flush: 40, Four of a Kind: 30, Full House: 8, 
 Flush: 7, Straight: 4, Three of a Kind: 3
 
-The players aren't playing against each other, but against the dealer. The dealer
-must have a pair or better to qualify. If the dealer doesn't qualify, the player
-wins the Ante bet and the Play bet is returned. If the dealer qualifies, the player
-wins if their hand is better than the dealer's.
+The players aren't playing against each other, but against the dealer. The player
+puts up equal Ante and Blind bets and can make one Play bet: 3x or 4x the Ante
+before the flop, 2x after the flop, or 1x after the river (or fold, losing the Ante
+and Blind). The dealer must have a pair or better to qualify. If the dealer doesn't
+qualify, the Ante bet is returned. The Play bet, and the Ante if the dealer
+qualifies, win even money if the player's hand is better than the dealer's. The
+Blind only pays when the player wins with a Straight or better (see blind_rewards)
+and is returned on any other win.
 
 Diamonds: The player wins if they have a certain number of diamonds in their 
 personal hand, the community cards, and the dealer's cards (out of 9 total cards).
 """
 
 
-diamonds_rewards = {
-    4:3,
-    5:10,
-    6:30,
-    7:100,
-    8:300,
-    9:1000,
+blind_rewards = {
+    "Royal Flush": 500,
+    "Straight Flush": 50,
+    "Four of a Kind": 10,
+    "Full House": 3,
+    "Flush": 1.5,
+    "Straight": 1,
 }
 
-trips_rewards = {
-    "Straight Flush": 40,
-    "Four of a Kind": 30,
-    "Full House": 8,
-    "Flush": 7,
-    "Straight": 4,
-    "Three of a Kind": 3,
-}
-
-def simulate_trips(num_simulations=10000):
+def simulate_trips(num_simulations=10000, seed=None):
     # Initialize payout counts
     payouts = {key: 0 for key in trips_rewards.keys()}
 
+    # Per-hand loops are timed as a whole, see metrics.py
+    watch = metrics.stopwatch()
+
+    # One deck, player and game are reused for every round
+    player = Player("Simulated Player")
+    game = Game([player], Deck(random.Random(seed)))
+
     # Start the simulation loop
     for _ in range(num_simulations):
-        # Initialize a new deck and shuffle it
-        deck = Deck()
-        
-        # Create a player
-        player = Player("Simulated Player")
-        
-        # Initialize the game with one player
-        game = Game([player], deck)
+        # Put the cards back and shuffle
+        game.reset()
         
         # Deal hands and simulate all game phases
         game.deal_hands()
         game.simulate_phases(['flop', 'turn', 'river'])
         
-        # Combine player's hand with community cards
-        player.combine_with_community(game.community_cards)
-        
-        # Evaluate the player's hand
-        _, strengths_dict = player.full_hand.evaluate_hand()
+        # Evaluate the player's hand combined with the community cards
+        hand_type = category_name(evaluate_cards(player.hand_cards + game.community_cards))
+
+        # Record the hand if it pays
+        if hand_type in payouts:
+            payouts[hand_type] += 1
 
-        # Record the highest payout hand
-        for hand_type in trips_rewards.keys():  # Ensures checking from highest to lowest
-            if strengths_dict[hand_type]:  # Check if hand type is not empty
-                payouts[hand_type] += 1
-                break  # Stop after recording the highest hand type
+    watch.lap("simulate")
+    if metrics.ENABLED:
+        metrics.add_hands(num_simulations)
 
     # Calculate expected payouts
     expected_payout = sum(trips_rewards[hand] * (count / num_simulations) for hand, count in payouts.items())
     return expected_payout, payouts
 
-def simulate_diamonds(num_simulations=100000):
+def simulate_diamonds(num_simulations=100000, seed=None):
     counts = {k: 0 for k in range(4, 10)}  # Initialize counts for each diamond count starting from 4 to 9
+    watch = metrics.stopwatch()
+    player = Player("Player")
+    dealer = Player("Dealer")
+    game = Game([player, dealer], Deck(random.Random(seed)))
     
     for _ in range(num_simulations):
-        deck = Deck()  # Reset the deck for each simulation
-        player = Player("Player")
-        dealer = Player("Dealer")
-        game = Game([player, dealer], deck)
+        game.reset()  # Reset the deck for each simulation
         
         game.deal_hands()  # Deal hands to both player and dealer
         game.simulate_phases(['flop', 'turn', 'river'])
         
         # Combine all cards to count diamonds
         all_cards = player.hand_cards + dealer.hand_cards + game.community_cards
-        diamond_count = sum(1 for card in all_cards if card.suit == 'Diamonds')
+        diamond_count = sum(1 for card in all_cards if CARD_SUIT[card.id] == DIAMONDS)
         
         if diamond_count >= 4:
             counts[diamond_count] += 1
+    watch.lap("simulate")
+    if metrics.ENABLED:
+        metrics.add_hands(num_simulations)
 
     # Calculate expected payouts
     expected_payout = sum(diamonds_rewards.get(d, 0) * (count / num_simulations) for d, count in counts.items())
     return expected_payout, counts
 
-def main():
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        trips_future = executor.submit(simulate_trips, 100000)  # 10,000 simulations
-        diamonds_future = executor.submit(simulate_diamonds, 100000)  # 10,000 simulations
-
-        # Wait for both futures to complete
-        trips_result = trips_future.result()
-        diamonds_result = diamonds_future.result()
-
-        print("Expected Payout for Trips Side Bet:\n", trips_result[0])
-        print("Counts of Each Hand Type for Trips:\n", trips_result[1])
-        print("Percentage of Each Hand Type for Trips:\n", {k: v / 100000 for k, v in trips_result[1].items()})
-        print("Expected Payout for Diamonds Side Bet:\n", diamonds_result[0])
-        print("Diamond Counts Distribution:\n", diamonds_result[1])
-        print("Percentage of Each Number of Diamonds:\n", {k: v / 100000 for k, v in diamonds_result[1].items()})
+def simulate_trips_batch(num_simulations=1000000, seed=None):
+    """Vectorized version of simulate_trips(). Deals and evaluates the hands in
+    numpy batches instead of building a Deck, Player and Game per hand.
+
+    Args:
+        num_simulations (int): The number of hands to simulate.
+        seed (int): Seed for the random generator. Defaults to None (unseeded).
+    """
+    rng = make_rng(seed)
+    payouts = {key: 0 for key in trips_rewards.keys()}
+    for size in chunk_sizes(num_simulations):
+        watch = metrics.stopwatch()
+        # 2 hole cards and 5 community cards
+        deals = draw_deals(size, 7, rng)
+        watch.lap("deal")
+        strengths = evaluate_batch(deals)
+        watch.lap("evaluate")
+        counts = category_counts(strengths)
+        for hand_type in payouts:
+            payouts[hand_type] += counts[hand_type]
+        watch.lap("settle")
+        if metrics.ENABLED:
+            metrics.add_hands(size)
+
+    expected_payout = sum(trips_rewards[hand] * (count / num_simulations) for hand, count in payouts.items())
+    return expected_payout, payouts
+
+def simulate_diamonds_batch(num_simulations=1000000, seed=None):
+    """Vectorized version of simulate_diamonds(). Counts diamonds with array
+    reductions over numpy batches of deals.
+
+    Args:
+        num_simulations (int): The number of hands to simulate.
+        seed (int): Seed for the random generator. Defaults to None (unseeded).
+    """
+    rng = make_rng(seed)
+    counts = {k: 0 for k in range(4, 10)}
+    for size in chunk_sizes(num_simulations):
+        watch = metrics.stopwatch()
+        # 2 player cards, 2 dealer cards and 5 community cards
+        deals = draw_deals(size, 9, rng)
+        watch.lap("deal")
+        diamond_counts = np.bincount(suit_counts_batch(deals, DIAMONDS), minlength=10)
+        for d in counts:
+            counts[d] += int(diamond_counts[d])
+        watch.lap("settle")
+        if metrics.ENABLED:
+            metrics.add_hands(size)
+
+    expected_payout = sum(diamonds_rewards.get(d, 0) * (count / num_simulations) for d, count in counts.items())
+    return expected_payout, counts
+
+BLIND_CATEGORIES = {STRAIGHT_FLUSH: "Straight Flush", FOUR_OF_A_KIND: "Four of a Kind",
+                    FULL_HOUSE: "Full House", FLUSH: "Flush", STRAIGHT: "Straight"}
+
+def basic_strategy(hole, board, street):
+    """A simple Ultimate Texas Hold'em strategy, close to the usual published basic strategy.
+
+    - Preflop: raise 4x with any pair but 2s, any Ace, K5+ (K2+ suited),
+      Q8+ (Q6+ suited), JT (J8+ suited).
+    - Flop: raise 2x with a pair or better that uses a hole card (except pocket 2s),
+      or four to a flush holding a 10 or better of that suit.
+    - River: raise 1x with a pair or better that uses a hole card, or when fewer than
+      21 of the unseen cards would give the dealer a better hand, else fold.
+
+    Args:
+        hole (list): The player's 2 hole card ids.
+        board (list): The community card ids seen so far (0, 3 or 5 cards).
+        street (str): 'preflop', 'flop' or 'river'.
+
+    Returns:
+        int: The Play bet as a multiple of the Ante, 0 to check (or fold on the river).
+    """
+    high, low = max(hole[0] >> 2, hole[1] >> 2), min(hole[0] >> 2, hole[1] >> 2)
+    if street == 'preflop':
+        suited = (hole[0] & 3) == (hole[1] & 3)
+        if high == low:
+            return 4 if high > 0 else 0
+        # Lowest second card to raise with, by high card (King, Queen, Jack), as rank indexes
+        lowest = {12: 0, 11: 0 if suited else 3, 10: 4 if suited else 6, 9: 6 if suited else 8}
+        return 4 if high in lowest and low >= lowest[high] else 0
+
+    # A pair or better made with a hole card: a pocket pair, a hole card pairing the
+    # board, or a better category than the board alone (straights and flushes)
+    board_ranks = set(card >> 2 for card in board)
+    uses_hole_card = (high == low or high in board_ranks or low in board_ranks
+                      or hand_category(evaluate(hole + board)) > max(hand_category(evaluate(board)), 0))
+    if street == 'flop':
+        if uses_hole_card and not (high == low == 0):
+            return 2
+        for card in hole:
+            same_suit = sum(1 for other in hole + board if (other & 3) == (card & 3))
+            if same_suit >= 4 and card >> 2 >= 8:
+                return 2
+        return 0
+    if uses_hole_card:
+        return 1
+    strength = evaluate(hole + board)
+    dealer_outs = sum(1 for card in range(52) if card not in hole and card not in board
+                      and evaluate(board + [card]) > strength)
+    return 1 if dealer_outs < 21 else 0
+
+def settle_ultimate(player_strength, dealer_strength, play):
+    """Returns the player's net win of one round in units of the Ante.
+
+    Args:
+        player_strength (int): Strength of the player's best hand.
+        dealer_strength (int): Strength of the dealer's best hand.
+        play (int): The Play bet as a multiple of the Ante, 0 if the player folded.
+    """
+    if play == 0:
+        return -2  # Folded: Ante and Blind are lost
+    ante = 1 if hand_category(dealer_strength) >= ONE_PAIR else 0  # Returned if the dealer doesn't qualify
+    result = compare(player_strength, dealer_strength)
+    if result > 0:
+        category = hand_category(player_strength)
+        if player_strength >= ROYAL_FLUSH:
+            blind = blind_rewards["Royal Flush"]
+        else:
+            blind = blind_rewards[BLIND_CATEGORIES[category]] if category in BLIND_CATEGORIES else 0
+        return ante + blind + play
+    if result < 0:
+        return -ante - 1 - play
+    return 0
+
+def settle_ultimate_batch(player_strengths, dealer_strengths, play):
+    """Vectorized settle_ultimate() over arrays of strengths with the same Play bet.
+
+    Returns:
+        numpy.ndarray: The player's net win of each round in units of the Ante.
+    """
+    player_strengths, dealer_strengths = np.broadcast_arrays(player_strengths, dealer_strengths)
+    if play == 0:
+        return np.full(player_strengths.shape, -2.0)
+    ante = (dealer_strengths >> CATEGORY_SHIFT >= ONE_PAIR).astype(float)
+    blind_table = np.zeros(STRAIGHT_FLUSH + 1)
+    for category, name in BLIND_CATEGORIES.items():
+        blind_table[category] = blind_rewards[name]
+    blind = np.where(player_strengths >= ROYAL_FLUSH, blind_rewards["Royal Flush"],
+                     blind_table[player_strengths >> CATEGORY_SHIFT])
+    result = compare_batch(player_strengths, dealer_strengths)
+    return np.where(result > 0, ante + blind + play, np.where(result < 0, -ante - 1 - play, 0.0))
+
+def simulate_ultimate(num_simulations=100000, policy=basic_strategy, seed=None):
+    """Simulates the base game (Ante, Blind and Play bets) against the dealer.
+
+    Args:
+        num_simulations (int): The number of rounds to simulate.
+        policy (callable): Decides the Play bet, see basic_strategy(). Must be a
+            top-level function to be used with run_parallel().
+        seed (int): Seed for the random generator. Defaults to None (unseeded).
+
+    Returns:
+        tuple: (expected_payout, counts) where expected_payout is the player's average
+        net win per round in units of the Ante (the house edge is its negative), and
+        counts has the number of rounds per decision ('4x', '3x', '2x', '1x', 'fold'),
+        the number of 'wins', 'losses' and 'ties', and the 'sum_squares' of the net
+        wins, which gives the variance.
+    """
+    rng = make_rng(seed)
+    counts = {'4x': 0, '3x': 0, '2x': 0, '1x': 0, 'fold': 0, 'wins': 0, 'losses': 0, 'ties': 0, 'sum_squares': 0}
+    total = 0
+    watch = metrics.stopwatch()
+    # Same layout as paytable.RoundBatch: player, dealer, then the board
+    deals = (cards for size in chunk_sizes(num_simulations) for cards in draw_deals(size, 9, rng).tolist())
+    for cards in deals:
+        hole, dealer, board = cards[:2], cards[2:4], cards[4:]
+
+        play = policy(hole, [], 'preflop')
+        if not play:
+            play = policy(hole, board[:3], 'flop')
+        if not play:
+            play = policy(hole, board, 'river')
+        counts[f'{play}x' if play else 'fold'] += 1
+
+        net = settle_ultimate(evaluate(hole + board), evaluate(dealer + board), play)
+        if net > 0:
+            counts['wins'] += 1
+        elif net < 0:
+            counts['losses'] += 1
+        else:
+            counts['ties'] += 1
+        total += net
+        counts['sum_squares'] += net * net
+    watch.lap("simulate")
+    if metrics.ENABLED:
+        metrics.add_hands(num_simulations)
+
+    return total / num_simulations, counts
+
+def ultimate_house_edge(expected_payout, counts):
+    """Returns (house_edge, variance) per round in units of the Ante from the
+    result of simulate_ultimate() (or of run_parallel() over it).
+    """
+    rounds = sum(counts[key] for key in ('wins', 'losses', 'ties'))
+    variance = counts['sum_squares'] / rounds - expected_payout ** 2
+    return -expected_payout, variance
+
+def main(seed=None):
+    # Both side bets are settled against the same deals, split over a process pool
+    expected_payouts, counts = run_parallel(partial(paytable.simulate_side_bets, [paytable.TRIPS, paytable.DIAMONDS]), 100000, seed=seed)  # 100,000 simulations
+
+    print("Expected Payout for Trips Side Bet:\n", expected_payouts["Trips"])
+    print("Counts of Each Hand Type for Trips:\n", counts["Trips"])
+    print("Percentage of Each Hand Type for Trips:\n", {k: v / 100000 for k, v in counts["Trips"].items()})
+    print("Expected Payout for Diamonds Side Bet:\n", expected_payouts["Diamonds"])
+    print("Diamond Counts Distribution:\n", counts["Diamonds"])
+    print("Percentage of Each Number of Diamonds:\n", {k: v / 100000 for k, v in counts["Diamonds"].items()})
+    if metrics.ENABLED:
+        print("Metrics:\n", metrics.snapshot_json())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,247 @@
+import json
+import os
+import struct
+import numpy as np
+import pandas as pd
+from batch import chunk_sizes, draw_deals
+from rng import make_rng
+from evaluator import CATEGORIES, CATEGORY_SHIFT
+from paytable import RoundBatch, SideBet
+
+"""
+Hand history store
+------------------
+Keeps every simulated round on disk instead of only the counters, so 10^8 hands
+can be re-analyzed (new paytables, new statistics) without simulating them again
+and without loading them all into memory.
+
+A history file is a small JSON header followed by fixed-width records, one per
+round, appended as the simulation runs:
+- 'cards': the 9 card ids dealt (player 2, dealer 2, board 5), int8
+- 'player_strength', 'dealer_strength': evaluator strengths of the 7-card hands, int32
+- 'outcomes': one outcome code per side bet (see SideBet.outcomes()), -1 when the
+  bet has no outcome, int8
+
+HistoryReader memory-maps the records, so its arrays are views of the file that
+the OS pages in on demand. A record only partly written (e.g. by an interrupted
+run) is ignored.
+
+    with HistoryWriter("hands.pkh", [TRIPS, DIAMONDS]) as writer:
+        record_simulation(writer, 10000000, seed=0)
+    history = HistoryReader("hands.pkh")
+    history.to_dataframe(0, 1000)
+"""
+
+MAGIC = b"PKHIST1\n"
+HEADER_ALIGNMENT = 64
+NUM_CARDS = 9
+
+def record_dtype(num_bets):
+    """Returns the numpy structured dtype of one record with 'num_bets' side bet outcomes."""
+    return np.dtype([
+        ("cards", np.int8, (NUM_CARDS,)),
+        ("player_strength", np.int32),
+        ("dealer_strength", np.int32),
+        ("outcomes", np.int8, (num_bets,)),
+    ])
+
+def _read_header(file):
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"{file.name} is not a hand history file")
+    (length,) = struct.unpack("<Q", file.read(8))
+    header = json.loads(file.read(length))
+    header["offset"] = len(MAGIC) + 8 + length
+    return header
+
+def _header_bytes(header):
+    data = json.dumps(header).encode()
+    # Pad with spaces so the records start on an aligned offset
+    padding = -(len(MAGIC) + 8 + len(data)) % HEADER_ALIGNMENT
+    data += b" " * padding
+    return MAGIC + struct.pack("<Q", len(data)) + data
+
+class HistoryWriter:
+    def __init__(self, path, bets=(), buffer_size=100000):
+        """Opens a hand history file for appending, creating it if needed.
+
+        Args:
+            path (str): The history file.
+            bets (list): The SideBet objects whose outcomes are recorded. Must match the
+                file's bets when appending to an existing file.
+            buffer_size (int): Records kept in memory before they're written out.
+
+        Raises:
+            ValueError: If the file exists and records different bets.
+        """
+        self.path = path
+        self.bets = list(bets)
+        self.dtype = record_dtype(len(self.bets))
+        header = {"version": 1, "record_size": self.dtype.itemsize, "bets": [bet.to_dict() for bet in self.bets]}
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as file:
+                existing = _read_header(file)
+            if existing["bets"] != json.loads(json.dumps(header["bets"])):
+                raise ValueError(f"{path} records different side bets")
+            self._trim(existing["offset"])
+            self._file = open(path, "ab")
+        else:
+            self._file = open(path, "wb")
+            self._file.write(_header_bytes(header))
+        self._buffer = np.empty(buffer_size, dtype=self.dtype)
+        self._buffered = 0
+
+    def _trim(self, offset):
+        # Drop a partly written last record so new records stay aligned
+        size = os.path.getsize(self.path)
+        whole = offset + (size - offset) // self.dtype.itemsize * self.dtype.itemsize
+        if whole != size:
+            os.truncate(self.path, whole)
+
+    def append(self, cards, player_strengths, dealer_strengths, outcomes=None):
+        """Appends a batch of rounds.
+
+        Args:
+            cards (numpy.ndarray): (N, 9) card ids.
+            player_strengths (numpy.ndarray): N player hand strengths.
+            dealer_strengths (numpy.ndarray): N dealer hand strengths.
+            outcomes (numpy.ndarray): (N, number of bets) outcome codes. Defaults to None
+                (no bets).
+        """
+        records = np.empty(len(cards), dtype=self.dtype)
+        records["cards"] = cards
+        records["player_strength"] = player_strengths
+        records["dealer_strength"] = dealer_strengths
+        if outcomes is not None:
+            records["outcomes"] = outcomes
+        self.append_records(records)
+
+    def append_records(self, records):
+        """Appends records that already have this file's dtype."""
+        if self._buffered + len(records) > len(self._buffer):
+            self.flush()
+        if len(records) >= len(self._buffer):
+            self._file.write(records.tobytes())
+            return
+        self._buffer[self._buffered:self._buffered + len(records)] = records
+        self._buffered += len(records)
+
+    def append_rounds(self, round_data):
+        """Appends a paytable.RoundBatch with the outcomes of this writer's bets."""
+        outcomes = np.stack([bet.outcomes(round_data) for bet in self.bets], axis=1) if self.bets else None
+        self.append(round_data.deals, round_data.player_strengths(), round_data.dealer_strengths(), outcomes)
+
+    def flush(self):
+        if self._buffered:
+            self._file.write(self._buffer[:self._buffered].tobytes())
+            self._buffered = 0
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def record_simulation(writer, num_simulations, seed=None):
+    """Simulates rounds and appends them, with the writer's bet outcomes, to a history file.
+
+    Args:
+        writer (HistoryWriter): Where to record the rounds.
+        num_simulations (int): The number of rounds to simulate.
+        seed (int): Seed for the random generator. Defaults to None (unseeded).
+    """
+    rng = make_rng(seed)
+    for size in chunk_sizes(num_simulations):
+        writer.append_rounds(RoundBatch(draw_deals(size, NUM_CARDS, rng)))
+
+class HistoryReader:
+    def __init__(self, path):
+        """Memory-maps a hand history file for reading.
+
+        Args:
+            path (str): The history file.
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            header = _read_header(file)
+        self.bets = [SideBet(**bet) for bet in header["bets"]]
+        self.dtype = record_dtype(len(self.bets))
+        if header["record_size"] != self.dtype.itemsize:
+            raise ValueError(f"{path} has records of {header['record_size']} bytes, expected {self.dtype.itemsize}")
+        count = (os.path.getsize(path) - header["offset"]) // self.dtype.itemsize
+        if count:
+            self.records = np.memmap(path, dtype=self.dtype, mode="r", offset=header["offset"], shape=(count,))
+        else:
+            self.records = np.empty(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, key):
+        """Returns a field ('cards', 'player_strength', ...) or a slice of records, without copying."""
+        return self.records[key]
+
+    def outcomes(self, bet_name):
+        """Returns the outcome codes of one side bet, without copying."""
+        names = [bet.name for bet in self.bets]
+        return self.records["outcomes"][:, names.index(bet_name)]
+
+    def distribution(self, bet_name, chunk_size=1000000):
+        """Returns the outcome distribution of one side bet over the recorded rounds, in
+        the format of sweep.outcome_distribution(), to price new paytables against it.
+
+        Royal flushes are only recorded apart from other straight flushes when the
+        recorded bet pays one, so 'Royal Flush' is only listed for such bets.
+
+        Raises:
+            ValueError: If the file has no records.
+        """
+        if not len(self.records):
+            raise ValueError(f"{self.path} has no recorded rounds")
+        bet = self.bets[[bet.name for bet in self.bets].index(bet_name)]
+        codes = bet.outcome_codes()
+        if "Royal Flush" not in bet.payouts:
+            codes.pop("Royal Flush", None)
+        counts = np.zeros(max(codes.values()) + 2, dtype=np.int64)
+        for start in range(0, len(self.records), chunk_size):
+            chunk = self.outcomes(bet_name)[start:start + chunk_size]
+            counts += np.bincount(chunk.astype(np.int64) + 1, minlength=len(counts))
+        outcomes = list(codes)
+        return {
+            "outcomes": outcomes,
+            "probabilities": [int(counts[codes[key] + 1]) / len(self.records) for key in outcomes],
+            "rounds": len(self.records),
+            "exact": False,
+        }
+
+    def iter_chunks(self, chunk_size=1000000):
+        """Yields the records in consecutive slices of at most 'chunk_size'."""
+        for start in range(0, len(self.records), chunk_size):
+            yield self.records[start:start + chunk_size]
+
+    def to_dataframe(self, start=0, stop=None):
+        """Returns records [start, stop) as a pandas DataFrame.
+
+        Cards get one column each, strengths are kept and their categories added, and
+        each side bet gets a column with the name of its outcome (None when it has none).
+        """
+        records = self.records[start:stop]
+        table = pd.DataFrame({f"card_{index}": records["cards"][:, index] for index in range(NUM_CARDS)})
+        for hand in ("player", "dealer"):
+            strengths = np.asarray(records[f"{hand}_strength"])
+            table[f"{hand}_strength"] = strengths
+            table[f"{hand}_category"] = pd.Categorical.from_codes(strengths >> CATEGORY_SHIFT, CATEGORIES)
+        for column, bet in enumerate(self.bets):
+            names = np.array([None] * (max(bet.outcome_codes().values()) + 2), dtype=object)
+            for name, code in bet.outcome_codes().items():
+                names[code + 1] = name
+            table[bet.name] = names[np.asarray(records["outcomes"][:, column]) + 1]
+        return table
+
+    def __repr__(self):
+        return f"HistoryReader({self.path!r}, {len(self):,} rounds, bets={[bet.name for bet in self.bets]})"
@@ -0,0 +1,60 @@
+import threading
+
+"""
+Background jobs
+---------------
+Runs a long computation that yields intermediate results (like equity.iter_equity())
+on an executor thread and keeps the latest result, so a UI can poll it instead of
+blocking on it. A job can be cancelled between two results.
+"""
+
+class BackgroundJob:
+    def __init__(self, key, make_iterator, executor):
+        """Starts a job on an executor.
+
+        Args:
+            key: Identifies what the job computes, e.g. its inputs, to tell whether a
+                running job is still the one wanted.
+            make_iterator (callable): Called on the worker thread, returns an iterator
+                over the intermediate results.
+            executor (concurrent.futures.Executor): Where to run the job.
+        """
+        self.key = key
+        self.latest = None
+        self.updates = 0
+        self.error = None
+        self.done = False
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self.future = executor.submit(self._run, make_iterator)
+
+    def _run(self, make_iterator):
+        try:
+            for result in make_iterator():
+                with self._lock:
+                    self.latest = result
+                    self.updates += 1
+                if self._cancelled.is_set():
+                    break
+        except Exception as error:
+            self.error = error
+        finally:
+            self.done = True
+
+    def cancel(self):
+        """Asks the job to stop after its next result. A job still queued never starts."""
+        self._cancelled.set()
+        self.future.cancel()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def snapshot(self):
+        """Returns (latest result, done, error) as of now."""
+        with self._lock:
+            return self.latest, self.done or self.future.cancelled(), self.error
+
+    def __repr__(self):
+        state = "cancelled" if self.cancelled else "done" if self.done else "running"
+        return f"BackgroundJob({self.key!r}, {state}, {self.updates} updates)"
@@ -1,19 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-from poker import Card, Deck, Hand
+from poker import Card, Deck, Hand, CARDS
 from game import Player, Game
+from equity import iter_equity
+from jobs import BackgroundJob
+from preflop import hand_index, load_table, EQUITY, TIE, WIN
 
-# Initialize the deck
-deck = Deck()
+# Odds are computed on a pool shared by all sessions, so the number of threads
+# doesn't grow with the number of users
+MAX_WORKERS = 4
+POLL_INTERVAL = 0.5  # Seconds between refreshes of a running computation
+TIME_LIMIT = 5.0  # Seconds spent refining a sampled estimate
+
+# No TTL: an expired executor would be replaced without being shut down, orphaning its running jobs
+@st.cache_resource
+def get_executor():
+    return ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="odds")
+
+@st.cache_resource(ttl=24 * 3600, max_entries=1)
+def get_preflop_table():
+    """The precomputed preflop table, memory-mapped once and shared by all sessions."""
+    try:
+        return load_table()
+    except FileNotFoundError:
+        return None
 
 # Helper function to get available ranks and suits
 def get_available_ranks_suits(deck):
-    available_ranks = sorted(set(card.rank for card in deck.cards), key=lambda x: Card.RANKS.index(x))
-    available_suits = sorted(set(card.suit for card in deck.cards), key=lambda x: Card.SUITS.index(x))
+    available_ranks = sorted(set(card.rank for card in deck.cards), key=lambda x: Card.RANK_INDEX[x])
+    available_suits = sorted(set(card.suit for card in deck.cards), key=lambda x: Card.SUIT_INDEX[x])
     return available_ranks, available_suits
 
+def start_job(key, hero, board, opponents):
+    """Starts computing the odds for 'key' in the background, replacing this session's previous job."""
+    job = st.session_state.get("job")
+    if job is not None and job.key == key and not job.cancelled:
+        return job
+    if job is not None:
+        job.cancel()
+    job = BackgroundJob(key, lambda: iter_equity(hero, board, opponents, time_limit=TIME_LIMIT), get_executor())
+    st.session_state["job"] = job
+    return job
+
+def show_result(job):
+    result, done, error = job.snapshot()
+    if error is not None:
+        st.error(f"Could not compute the odds: {error}")
+        return
+    if result is None:
+        st.caption("Waiting for a worker...")
+        return
+    col5, col6, col7 = st.columns(3)
+    col5.metric('Win', f"{result.win:.2%}")
+    col6.metric('Tie', f"{result.tie:.2%}")
+    col7.metric('Lose', f"{result.lose:.2%}")
+    if result.exact:
+        st.caption('Exact')
+    else:
+        st.caption(f"Estimated from {result.trials:,} deals" + ("" if done else ", refining..."))
+
+def poll_job(polling):
+    # Reruns on its own every POLL_INTERVAL seconds while 'polling'
+    job = st.session_state.get("job")
+    if job is None:
+        return
+    show_result(job)
+    if polling and job.snapshot()[1]:
+        st.rerun()  # Rerun the whole page once to stop polling
+
 def main():
     st.title('Poker Odds Calculator')
 
+    # A fresh deck on every rerun: the cards removed for one selection never leak
+    # into the next rerun or another session
+    deck = Deck()
     available_ranks, available_suits = get_available_ranks_suits(deck)
 
     # Select the first card
@@ -39,6 +99,39 @@ def main():
 
     # Display selected cards
     st.write(f"You have selected: {selected_rank1} of {selected_suit1} and {selected_rank2} of {selected_suit2}")
+    hero = [Card(selected_rank1, selected_suit1), Card(selected_rank2, selected_suit2)]
+    if hero[0].id == hero[1].id:
+        st.error("Both hole cards are the same card")
+        return
+
+    # Optional flop, turn and river
+    # Options are card ids, since Card equality only compares ranks
+    board_options = [card.id for card in deck.cards if card.id != hero[1].id]
+    board = st.multiselect('Select community cards (optional):', options=board_options, max_selections=5,
+                           format_func=lambda card_id: str(CARDS[card_id]))
+    if len(board) in (1, 2):
+        st.warning("Select at least 3 community cards for the flop")
+        return
+    opponents = st.slider('Number of opponents:', min_value=1, max_value=9, value=1)
+
+    # Preflop odds against random hands come straight from the precomputed table
+    table = get_preflop_table()
+    if not board and table is not None:
+        odds = table[hand_index(hero), opponents - 1]
+        st.info(f"Preflop table: Win {odds[WIN]:.2%}, Tie {odds[TIE]:.2%}, Equity {odds[EQUITY]:.2%}")
+
+    # The odds are computed on a worker thread and the page polls for the running estimate
+    key = (tuple(card.id for card in hero), tuple(board), opponents)
+    job = st.session_state.get("job")
+    if job is not None and job.key != key:
+        job.cancel()  # The inputs changed, the running job is stale
+        del st.session_state["job"]
+    if st.button('Calculate odds'):
+        start_job(key, hero, board, opponents)
+    job = st.session_state.get("job")
+    if job is not None:
+        running = not job.snapshot()[1]
+        st.fragment(poll_job, run_every=POLL_INTERVAL if running else None)(running)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
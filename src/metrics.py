@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import threading
+import time
+
+"""
+Simulation metrics
+------------------
+Opt-in counters for the hot paths: hands simulated, time spent dealing,
+evaluating and settling, hands evaluated by the batch evaluator, cache hit rates
+and throughput per worker. Turn them on with enable() or by setting the
+POKER_METRICS environment variable to 1.
+
+Instrumented code times whole batches, never single hands. Each timed section
+starts with stopwatch(), which returns a shared object whose methods do
+nothing while metrics are disabled, and a one-off counter is guarded with
+'if metrics.ENABLED:'. Either way the cost when disabled is one attribute check
+per batch of 100,000 hands, so the instrumentation can stay in production runs.
+
+    metrics.enable()
+    run_parallel(simulate_trips_batch, 10000000)
+    print(metrics.snapshot_json())
+"""
+
+ENABLED = os.environ.get("POKER_METRICS", "") not in ("", "0")
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_started = time.perf_counter()
+_hands = 0
+_phases = {}
+_counters = {}
+_workers = {}
+_caches = {}
+_log_thread = None
+_log_stop = threading.Event()
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+def reset():
+    """Clears every metric and restarts the clock used for the rates."""
+    global _started, _hands
+    with _lock:
+        _started = time.perf_counter()
+        _hands = 0
+        _phases.clear()
+        _counters.clear()
+        _workers.clear()
+
+def register_cache(name, cache):
+    """Adds a cache with a stats() method (see canonical.EvaluationCache) to the snapshots."""
+    _caches[name] = cache
+
+def add_hands(count):
+    global _hands
+    with _lock:
+        _hands += count
+
+def add_time(phase, seconds):
+    with _lock:
+        _phases[phase] = _phases.get(phase, 0.0) + seconds
+
+def add_count(name, count=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + count
+
+def worker_done(hands, seconds, worker=None):
+    """Records a chunk of work done by one worker, identified by process id and thread name."""
+    worker = worker or f"{os.getpid()}/{threading.current_thread().name}"
+    with _lock:
+        totals = _workers.setdefault(worker, {"hands": 0, "seconds": 0.0, "chunks": 0})
+        totals["hands"] += hands
+        totals["seconds"] += seconds
+        totals["chunks"] += 1
+
+class Stopwatch:
+    def __init__(self):
+        self._last = time.perf_counter()
+
+    def lap(self, phase):
+        """Adds the time since the previous lap (or the start) to 'phase'."""
+        now = time.perf_counter()
+        add_time(phase, now - self._last)
+        self._last = now
+
+class _DisabledStopwatch:
+    def lap(self, phase):
+        pass
+
+_DISABLED_STOPWATCH = _DisabledStopwatch()
+
+def stopwatch():
+    """Returns a Stopwatch, or one that records nothing while metrics are disabled."""
+    return Stopwatch() if ENABLED else _DISABLED_STOPWATCH
+
+def collect():
+    """Returns the raw metrics recorded so far and clears them. Used by worker
+    processes to send their metrics back with their results, see merge().
+    """
+    global _hands
+    with _lock:
+        raw = {"hands": _hands, "phases": dict(_phases), "counters": dict(_counters),
+               "workers": {worker: dict(totals) for worker, totals in _workers.items()}}
+        _hands = 0
+        _phases.clear()
+        _counters.clear()
+        _workers.clear()
+    return raw
+
+def merge(raw):
+    """Adds raw metrics from collect() (e.g. from a worker process) to this process's metrics."""
+    global _hands
+    with _lock:
+        _hands += raw["hands"]
+        for phase, seconds in raw["phases"].items():
+            _phases[phase] = _phases.get(phase, 0.0) + seconds
+        for name, count in raw["counters"].items():
+            _counters[name] = _counters.get(name, 0) + count
+        for worker, chunk_totals in raw["workers"].items():
+            totals = _workers.setdefault(worker, {"hands": 0, "seconds": 0.0, "chunks": 0})
+            for key, value in chunk_totals.items():
+                totals[key] += value
+
+def snapshot():
+    """Returns the current metrics as a JSON-serializable dict.
+
+    Returns:
+        dict: 'enabled', 'elapsed' (seconds since the last reset), 'hands',
+        'hands_per_sec', 'phases' (seconds and share of the timed total per phase),
+        'counters', 'workers' (hands, seconds, chunks and hands_per_sec per worker)
+        and 'caches' (stats of the registered caches).
+    """
+    with _lock:
+        elapsed = time.perf_counter() - _started
+        timed = sum(_phases.values())
+        phases = {phase: {"seconds": seconds, "share": seconds / timed if timed else 0.0}
+                  for phase, seconds in _phases.items()}
+        workers = {worker: dict(totals, hands_per_sec=totals["hands"] / totals["seconds"] if totals["seconds"] else 0.0)
+                   for worker, totals in _workers.items()}
+        result = {
+            "enabled": ENABLED,
+            "elapsed": elapsed,
+            "hands": _hands,
+            "hands_per_sec": _hands / elapsed if elapsed else 0.0,
+            "phases": phases,
+            "counters": dict(_counters),
+            "workers": workers,
+        }
+    result["caches"] = {name: cache.stats() for name, cache in _caches.items()}
+    return result
+
+def snapshot_json(indent=2):
+    return json.dumps(snapshot(), indent=indent)
+
+def format_line(data=None):
+    """Returns a one-line summary of a snapshot, for logs."""
+    data = data or snapshot()
+    parts = [f"hands={data['hands']:,}", f"hands/s={data['hands_per_sec']:,.0f}"]
+    parts += [f"{phase}={values['share']:.0%}" for phase, values in data["phases"].items()]
+    parts += [f"{name}_hit_rate={stats['hit_rate']:.0%}" for name, stats in data["caches"].items()]
+    parts.append(f"workers={len(data['workers'])}")
+    return " ".join(parts)
+
+def _log_loop(interval, log):
+    while not _log_stop.wait(interval):
+        log.info("metrics %s", format_line())
+
+def start_logging(interval=10.0, log=None):
+    """Logs a summary line every 'interval' seconds on a background thread until stop_logging()."""
+    global _log_thread
+    stop_logging()
+    _log_stop.clear()
+    _log_thread = threading.Thread(target=_log_loop, args=(interval, log or logger), name="metrics-log", daemon=True)
+    _log_thread.start()
+
+def stop_logging():
+    global _log_thread
+    if _log_thread is not None:
+        _log_stop.set()
+        _log_thread.join()
+        _log_thread = None
@@ -0,0 +1,157 @@
+from itertools import combinations
+from poker import Card, CARD_RANK, CARD_SUIT, CARDS
+from evaluator import (CARD_PRIME, CARD_RANK_BIT, CARD_SUIT_WEIGHT, CATEGORIES, CATEGORY_SHIFT,
+                       FLUSH_STRENGTH, FLUSH_SUIT, RANK_STRENGTH, STRAIGHT_HIGH)
+from equity import card_ids
+
+"""
+Outs and improvement odds
+-------------------------
+IncrementalHand keeps the running state the evaluator tables are indexed by:
+the product of the rank primes, the packed suit counts, the rank counts and one
+rank mask per suit (OR-ed together they're the straight mask). Adding or
+removing a card updates it in O(1), and the strength of the hand with one more
+card can be read without changing it, so scanning the 46 or 47 unseen cards is
+a few table lookups per card instead of a full evaluation.
+"""
+
+class IncrementalHand:
+    def __init__(self, cards=()):
+        """A partial hand of up to 7 cards that can be grown and shrunk one card at a time.
+
+        Args:
+            cards (list): The starting cards, as Card objects or card ids.
+        """
+        self.cards = []
+        self.product = 1
+        self.suit_key = 0
+        self.rank_counts = [0] * 13
+        self.suit_masks = [0] * 4
+        self.rank_mask = 0
+        for card in card_ids(cards):
+            self.add(card)
+
+    def add(self, card):
+        """Adds a card id to the hand."""
+        rank = CARD_RANK[card]
+        self.cards.append(card)
+        self.product *= CARD_PRIME[card]
+        self.suit_key += CARD_SUIT_WEIGHT[card]
+        self.suit_masks[CARD_SUIT[card]] |= CARD_RANK_BIT[card]
+        self.rank_counts[rank] += 1
+        self.rank_mask |= CARD_RANK_BIT[card]
+
+    def remove(self, card):
+        """Removes a card id that was added to the hand."""
+        rank = CARD_RANK[card]
+        self.cards.remove(card)
+        self.product //= CARD_PRIME[card]
+        self.suit_key -= CARD_SUIT_WEIGHT[card]
+        self.suit_masks[CARD_SUIT[card]] &= ~CARD_RANK_BIT[card]
+        self.rank_counts[rank] -= 1
+        if not self.rank_counts[rank]:
+            self.rank_mask &= ~CARD_RANK_BIT[card]
+
+    def strength(self):
+        """Returns the strength of the hand, same as evaluator.evaluate() on its cards."""
+        suit = FLUSH_SUIT[self.suit_key]
+        if suit >= 0:
+            return FLUSH_STRENGTH[self.suit_masks[suit]]
+        return RANK_STRENGTH[self.product]
+
+    def strength_with(self, card):
+        """Returns the strength the hand would have with one more card, without adding it."""
+        suit = FLUSH_SUIT[self.suit_key + CARD_SUIT_WEIGHT[card]]
+        if suit >= 0:
+            mask = self.suit_masks[suit]
+            if CARD_SUIT[card] == suit:
+                mask |= CARD_RANK_BIT[card]
+            return FLUSH_STRENGTH[mask]
+        return RANK_STRENGTH[self.product * CARD_PRIME[card]]
+
+    def straight_high(self):
+        """Returns the rank index of the highest straight in the hand, or -1."""
+        return STRAIGHT_HIGH[self.rank_mask]
+
+    def straight_ranks(self):
+        """Returns the rank indexes that would complete a straight the hand doesn't have yet."""
+        current = STRAIGHT_HIGH[self.rank_mask]
+        return [rank for rank in range(13) if STRAIGHT_HIGH[self.rank_mask | 1 << rank] > current]
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __repr__(self):
+        return f"IncrementalHand({', '.join(str(CARDS[card]) for card in self.cards)})"
+
+def _unseen(known):
+    known = set(known)
+    return [card for card in range(52) if card not in known]
+
+def outs(hole_cards, board):
+    """Lists the cards that improve a hand to a better category on the next street.
+
+    Args:
+        hole_cards (list): The 2 hole cards, as Card objects or card ids.
+        board (list): The 3 or 4 community cards dealt so far.
+
+    Returns:
+        dict: Category name to the card ids that make it, best category first. Only
+        categories better than the current one are listed.
+    """
+    known = card_ids(hole_cards) + card_ids(board)
+    hand = IncrementalHand(known)
+    current = hand.strength() >> CATEGORY_SHIFT
+    by_category = {}
+    for card in _unseen(known):
+        category = hand.strength_with(card) >> CATEGORY_SHIFT
+        if category > current:
+            by_category.setdefault(category, []).append(card)
+    return {CATEGORIES[category]: by_category[category] for category in sorted(by_category, reverse=True)}
+
+def improvement_odds(hole_cards, board):
+    """Returns the probability of finishing each street in each better category.
+
+    Args:
+        hole_cards (list): The 2 hole cards, as Card objects or card ids.
+        board (list): The 3 (flop) or 4 (turn) community cards dealt so far.
+
+    Returns:
+        dict: 'turn' (on the flop only) and 'river' map every category better than the
+        current one to the probability that the hand is exactly that category after
+        the street. Their sum is the probability of improving.
+    """
+    known = card_ids(hole_cards) + card_ids(board)
+    if len(known) not in (5, 6):
+        raise ValueError("Give 2 hole cards and a flop or a turn")
+    hand = IncrementalHand(known)
+    current = hand.strength() >> CATEGORY_SHIFT
+    unseen = _unseen(known)
+    odds = {}
+
+    if len(known) == 5:
+        turn = [0] * len(CATEGORIES)
+        for card in unseen:
+            turn[hand.strength_with(card) >> CATEGORY_SHIFT] += 1
+        odds["turn"] = {CATEGORIES[category]: turn[category] / len(unseen)
+                        for category in range(current + 1, len(CATEGORIES))}
+        river = [0] * len(CATEGORIES)
+        for turn_card, river_card in combinations(unseen, 2):
+            hand.add(turn_card)
+            river[hand.strength_with(river_card) >> CATEGORY_SHIFT] += 1
+            hand.remove(turn_card)
+        runouts = len(unseen) * (len(unseen) - 1) // 2
+    else:
+        river = [0] * len(CATEGORIES)
+        for card in unseen:
+            river[hand.strength_with(card) >> CATEGORY_SHIFT] += 1
+        runouts = len(unseen)
+    odds["river"] = {CATEGORIES[category]: river[category] / runouts for category in range(current + 1, len(CATEGORIES))}
+    return odds
+
+if __name__ == "__main__":
+    hole = [Card('Ace', 'Hearts'), Card('King', 'Hearts')]
+    flop = [Card('Queen', 'Hearts'), Card('7', 'Hearts'), Card('Jack', 'Clubs')]
+    for category, cards in outs(hole, flop).items():
+        print(f"{category}: {', '.join(str(CARDS[card]) for card in cards)}")
+    print(improvement_odds(hole, flop))
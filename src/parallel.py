@@ -0,0 +1,129 @@
+import concurrent.futures
+import math
+import os
+import sys
+import time
+import numpy as np
+import metrics
+from batch import chunk_sizes
+from rng import replay_deal
+
+"""
+Parallel Monte Carlo runner
+---------------------------
+Splits a simulation into chunks, runs them on a process pool (or a thread pool
+on free-threaded builds of Python, where threads run on all cores) and merges
+the results. Every chunk gets its own seed derived from the master seed with
+numpy's SeedSequence, and results are merged in chunk order, so the same seed
+and chunking always give bit-identical results no matter how the chunks are
+scheduled.
+
+A simulation is any picklable function called as simulation(num_simulations, seed=seed)
+that returns (expected_payout, counts), like the simulators in golden_nugget_ultimate.py.
+"""
+
+def gil_disabled():
+    """Returns True when running on a free-threaded Python with the GIL turned off."""
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+def chunk_seeds(seed, num_chunks):
+    """Derives one independent 64-bit seed per chunk from a master seed.
+
+    Args:
+        seed (int): The master seed. None draws fresh entropy from the OS.
+        num_chunks (int): The number of seeds to derive.
+    """
+    children = np.random.SeedSequence(seed).spawn(num_chunks)
+    return [int(child.generate_state(1, np.uint64)[0]) for child in children]
+
+def replay_hand(seed, hand, cards_per_deal, chunk_size):
+    """Returns the cards of one hand of run_parallel() with a master seed and chunk size,
+    for a simulation that deals every hand with batch.draw_deals(), see rng.replay_deal().
+
+    Args:
+        seed (int): The master seed given to run_parallel().
+        hand (int): The number of the hand over all chunks, from 0.
+        cards_per_deal (int): The cards dealt per hand.
+        chunk_size (int): The chunk size given to run_parallel().
+    """
+    if seed is None:
+        raise ValueError("Only a seeded run can be replayed")
+    chunk, hand_in_chunk = divmod(hand, chunk_size)
+    return replay_deal(chunk_seeds(seed, chunk + 1)[chunk], hand_in_chunk, cards_per_deal)
+
+def _merge_counts(counts, chunk_counts):
+    for key, count in chunk_counts.items():
+        if isinstance(count, dict):
+            _merge_counts(counts.setdefault(key, {}), count)
+        else:
+            counts[key] = counts.get(key, 0) + count
+
+def _weighted_average(payouts, sizes, total):
+    if isinstance(payouts[0], dict):
+        return {key: _weighted_average([payout[key] for payout in payouts], sizes, total) for key in payouts[0]}
+    return sum(payout * size for payout, size in zip(payouts, sizes)) / total
+
+def merge_results(results):
+    """Merges (expected_payout, counts, num_simulations, ...) chunk results into one (expected_payout, counts).
+
+    The expected payout is the average of the chunk payouts weighted by chunk size.
+    Simulations that price several bets at once can return dicts of payouts and
+    nested dicts of counts, which are merged key by key.
+    """
+    sizes = [result[2] for result in results]
+    counts = {}
+    for result in results:
+        _merge_counts(counts, result[1])
+    expected_payout = _weighted_average([result[0] for result in results], sizes, sum(sizes))
+    return expected_payout, counts
+
+def _run_chunk(simulation, num_simulations, seed, collect_metrics=False):
+    # Worker processes have their own metrics, sent back with the result when collect_metrics
+    if collect_metrics:
+        metrics.enable()
+        # A forked worker starts with a copy of the parent's metrics, which are already counted there
+        metrics.collect()
+    started = time.perf_counter()
+    expected_payout, counts = simulation(num_simulations, seed=seed)
+    if metrics.ENABLED:
+        metrics.worker_done(num_simulations, time.perf_counter() - started)
+    return expected_payout, counts, num_simulations, metrics.collect() if collect_metrics else None
+
+def run_parallel(simulation, num_simulations, seed=None, workers=None, chunk_size=None, mp_context=None):
+    """Runs a simulation split into chunks over a pool of workers.
+
+    Args:
+        simulation (callable): The simulation to run, see the module docstring.
+        num_simulations (int): The total number of hands to simulate.
+        seed (int): The master seed. Defaults to None (not reproducible).
+        workers (int): The number of worker processes. Defaults to the number of CPUs.
+        chunk_size (int): Hands per chunk. Defaults to splitting the work into 4 chunks
+            per worker, which makes the result depend on the worker count. Pass it
+            explicitly to get the same result for any number of workers.
+        mp_context: The multiprocessing context of the worker processes. Defaults to the
+            platform's default. Pass a 'forkserver' or 'spawn' context when calling from
+            a process that runs other threads, which forking doesn't copy safely.
+
+    Returns:
+        tuple: (expected_payout, counts) merged over all chunks.
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(num_simulations / (workers * 4)))
+    sizes = chunk_sizes(num_simulations, chunk_size)
+    seeds = chunk_seeds(seed, len(sizes))
+
+    if gil_disabled():
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        collect_metrics = False  # Threads record straight into this process's metrics
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=mp_context)
+        collect_metrics = metrics.ENABLED
+    with executor:
+        results = list(executor.map(_run_chunk, [simulation] * len(sizes), sizes, seeds,
+                                    [collect_metrics] * len(sizes)))
+    for result in results:
+        if result[3] is not None:
+            metrics.merge(result[3])
+    return merge_results(results)
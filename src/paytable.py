@@ -0,0 +1,228 @@
+import json
+import os
+import numpy as np
+import metrics
+from poker import Card
+from evaluator import CATEGORIES, CATEGORY_SHIFT
+from batch import chunk_sizes, draw_deals, evaluate_batch, suit_counts_batch
+from rng import make_rng
+from rewards import ROYAL_FLUSH, diamonds_rewards, trips_rewards
+
+"""
+Paytable engine
+---------------
+Side bets are declared as data: a name, a kind that says which outcome of the
+round the bet looks at, and a paytable from outcome to payout. simulate_side_bets()
+deals every round once (player, dealer and board, 9 cards) in numpy batches and
+settles every registered bet against the same deals.
+
+Kinds of bets:
+- 'player_hand': the category of the player's best hand ('Flush', 'Full House',
+  ...). A 'Royal Flush' entry pays instead of 'Straight Flush' for an Ace-high one.
+- 'suit_count': the number of cards of one suit ('suit', Diamonds by default) out
+  of the 9 dealt cards.
+- 'bad_beat': the category of the player's hand when it loses to the dealer's.
+- 'three_card': Pair Plus, the three card poker hand made by the player's hole
+  cards and the first flop card: 'Straight Flush', 'Three of a Kind', 'Straight',
+  'Flush' or 'Pair'.
+
+Bets can be written in Python or loaded from JSON or YAML (with PyYAML installed):
+
+    {"side_bets": [{"name": "Trips", "kind": "player_hand",
+                    "payouts": {"Straight Flush": 40, "Four of a Kind": 30}}]}
+"""
+
+THREE_CARD_CATEGORIES = ["High Card", "Pair", "Flush", "Straight", "Three of a Kind", "Straight Flush"]
+KINDS = ["player_hand", "suit_count", "bad_beat", "three_card"]
+
+_RANK = np.arange(52, dtype=np.int8) >> 2
+_SUIT = np.arange(52, dtype=np.int8) & 3
+
+class SideBet:
+    def __init__(self, name, kind, payouts, suit='Diamonds'):
+        """A side bet with its paytable.
+
+        Args:
+            name (str): The name of the bet, used as its key in the results.
+            kind (str): What the bet pays on, one of KINDS (see the module docstring).
+            payouts (dict): Outcome to payout, multiplied by the bet.
+            suit (str): The suit counted by a 'suit_count' bet. Defaults to 'Diamonds'.
+
+        Raises:
+            ValueError: If the kind or a paytable entry is not valid.
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown side bet kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.suit = Card.SUIT_INDEX[suit]
+        if kind == 'suit_count':
+            payouts = {int(key): value for key, value in payouts.items()}  # JSON keys are strings
+        self.payouts = dict(payouts)
+        valid = self.outcome_codes()
+        for key in self.payouts:
+            if key not in valid:
+                raise ValueError(f"Side bet {name} has no outcome {key!r}")
+
+    def outcome_codes(self):
+        """Returns every outcome the bet can pay on, mapped to its code in outcomes()."""
+        if self.kind == 'suit_count':
+            return {count: count for count in range(10)}
+        if self.kind == 'three_card':
+            return {name: code for code, name in enumerate(THREE_CARD_CATEGORIES)}
+        codes = {name: code for code, name in enumerate(CATEGORIES)}
+        codes["Royal Flush"] = len(CATEGORIES)
+        return codes
+
+    def outcomes(self, round_data):
+        """Returns the outcome code of every round in a batch, -1 where the bet can't pay."""
+        if self.kind == 'suit_count':
+            return suit_counts_batch(round_data.deals, self.suit)
+        if self.kind == 'three_card':
+            return round_data.three_card_categories()
+        categories = round_data.player_strengths() >> CATEGORY_SHIFT
+        if "Royal Flush" in self.payouts:
+            categories = np.where(round_data.player_strengths() >= ROYAL_FLUSH, len(CATEGORIES), categories)
+        if self.kind == 'bad_beat':
+            categories = np.where(round_data.player_strengths() < round_data.dealer_strengths(), categories, -1)
+        return categories
+
+    def settle(self, round_data):
+        """Returns the number of rounds of a batch per paying outcome."""
+        codes = self.outcome_codes()
+        hits = np.bincount(self.outcomes(round_data) + 1, minlength=max(codes.values()) + 2)
+        return {key: int(hits[codes[key] + 1]) for key in self.payouts}
+
+    def round_payouts(self, round_data):
+        """Returns the payout of every round in a batch, 0 where the bet doesn't pay."""
+        codes = self.outcome_codes()
+        table = np.zeros(max(codes.values()) + 2)
+        for key, payout in self.payouts.items():
+            table[codes[key] + 1] = payout
+        return table[self.outcomes(round_data) + 1]
+
+    def expected_payout(self, counts, num_simulations):
+        if num_simulations < 1:
+            raise ValueError("num_simulations must be at least 1")
+        return sum(self.payouts[key] * count / num_simulations for key, count in counts.items())
+
+    def to_dict(self):
+        data = {"name": self.name, "kind": self.kind, "payouts": self.payouts}
+        if self.kind == 'suit_count':
+            data["suit"] = Card.SUITS[self.suit]
+        return data
+
+    def __repr__(self):
+        return f"SideBet({self.name!r}, {self.kind!r}, {self.payouts})"
+
+class RoundBatch:
+    def __init__(self, deals):
+        """A batch of dealt rounds: the player's 2 cards, the dealer's 2 cards and the
+        5 community cards, in that order. Hand strengths are computed once, on demand,
+        and shared by every bet.
+        """
+        self.deals = deals
+        self._player_strengths = None
+        self._dealer_strengths = None
+
+    def player_strengths(self):
+        if self._player_strengths is None:
+            self._player_strengths = evaluate_batch(self.deals[:, [0, 1, 4, 5, 6, 7, 8]])
+        return self._player_strengths
+
+    def dealer_strengths(self):
+        if self._dealer_strengths is None:
+            self._dealer_strengths = evaluate_batch(self.deals[:, 2:])
+        return self._dealer_strengths
+
+    def three_card_categories(self):
+        return three_card_categories(self.deals[:, [0, 1, 4]])
+
+def three_card_categories(cards):
+    """Returns the three card poker category (index in THREE_CARD_CATEGORIES) of each row of card ids."""
+    ranks = np.sort(_RANK[cards], axis=1)
+    suits = _SUIT[cards]
+    flush = (suits[:, 0] == suits[:, 1]) & (suits[:, 1] == suits[:, 2])
+    distinct = (ranks[:, 0] != ranks[:, 1]) & (ranks[:, 1] != ranks[:, 2])
+    wheel = (ranks[:, 0] == 0) & (ranks[:, 1] == 1) & (ranks[:, 2] == 12)  # A-2-3
+    straight = distinct & ((ranks[:, 2] - ranks[:, 0] == 2) | wheel)
+    trips = (ranks[:, 0] == ranks[:, 2])
+    pair = ~distinct & ~trips
+    return np.select([straight & flush, trips, straight, flush, pair], [5, 4, 3, 2, 1], 0)
+
+TRIPS = SideBet("Trips", "player_hand", trips_rewards)
+DIAMONDS = SideBet("Diamonds", "suit_count", diamonds_rewards)
+PAIR_PLUS = SideBet("Pair Plus", "three_card", {
+    "Straight Flush": 40,
+    "Three of a Kind": 30,
+    "Straight": 6,
+    "Flush": 3,
+    "Pair": 1,
+})
+BAD_BEAT = SideBet("Bad Beat", "bad_beat", {
+    "Straight Flush": 500,
+    "Four of a Kind": 100,
+    "Full House": 20,
+    "Flush": 10,
+    "Straight": 5,
+})
+
+def simulate_side_bets(bets, num_simulations=1000000, seed=None):
+    """Deals every round once and settles every bet against it.
+
+    Args:
+        bets (list): The SideBet objects to settle.
+        num_simulations (int): The number of rounds to simulate.
+        seed (int): Seed for the random generator. Defaults to None (unseeded).
+
+    Returns:
+        tuple: (expected_payouts, counts), both keyed by bet name. counts holds the
+        number of rounds per paying outcome of each bet. Works with run_parallel()
+        through functools.partial(simulate_side_bets, bets).
+
+    Raises:
+        ValueError: If num_simulations is less than 1.
+    """
+    if num_simulations < 1:
+        raise ValueError("num_simulations must be at least 1")
+    rng = make_rng(seed)
+    counts = {bet.name: {key: 0 for key in bet.payouts} for bet in bets}
+    for size in chunk_sizes(num_simulations):
+        watch = metrics.stopwatch()
+        round_data = RoundBatch(draw_deals(size, 9, rng))
+        watch.lap("deal")
+        if any(bet.kind in ('player_hand', 'bad_beat') for bet in bets):
+            round_data.player_strengths()
+        if any(bet.kind == 'bad_beat' for bet in bets):
+            round_data.dealer_strengths()
+        watch.lap("evaluate")
+        for bet in bets:
+            for key, count in bet.settle(round_data).items():
+                counts[bet.name][key] += count
+        watch.lap("settle")
+        if metrics.ENABLED:
+            metrics.add_hands(size)
+    expected_payouts = {bet.name: bet.expected_payout(counts[bet.name], num_simulations) for bet in bets}
+    return expected_payouts, counts
+
+def load_side_bets(path):
+    """Loads side bet definitions from a JSON or YAML file (see the module docstring).
+
+    Raises:
+        ImportError: If the file is YAML and PyYAML is not installed.
+    """
+    with open(path) as file:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is required to load YAML paytables: pip install pyyaml")
+            data = yaml.safe_load(file)
+        else:
+            data = json.load(file)
+    return [SideBet(**definition) for definition in data["side_bets"]]
+
+def save_side_bets(bets, path):
+    """Writes side bet definitions to a JSON file that load_side_bets() can read."""
+    with open(path, "w") as file:
+        json.dump({"side_bets": [bet.to_dict() for bet in bets]}, file, indent=2)
@@ -2,9 +2,15 @@ import random
 from collections import defaultdict, Counter
 
 class Card:
+    """A playing card. Cards are backed by a small integer id (see CARDS) so the
+    simulators can work on ints and only use Card objects for display.
+    """
     SUITS = ['Clubs', 'Diamonds', 'Hearts', 'Spades']
     RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'Jack', 'Queen', 'King', 'Ace']
+    RANK_INDEX = {rank: index for index, rank in enumerate(RANKS)}
+    SUIT_INDEX = {suit: index for index, suit in enumerate(SUITS)}
 
+    __slots__ = ('rank', 'suit', 'id', 'value')
 
     def __init__(self, rank, suit):
         """Initializes a new card with a rank and suit.
@@ -16,11 +22,22 @@ class Card:
         Raises:
             ValueError: If the rank or suit is not valid.
         """
-        if rank in Card.RANKS and suit in Card.SUITS:
+        if rank in Card.RANK_INDEX and suit in Card.SUIT_INDEX:
             self.rank = rank
             self.suit = suit
+            self.id = card_id(Card.RANK_INDEX[rank], Card.SUIT_INDEX[suit])
+            self.value = Card.RANK_INDEX[rank] + 2
         else:
             raise ValueError("Invalid card rank or suit")
+
+    @staticmethod
+    def from_id(card_id):
+        """Returns the shared Card object for an integer card id.
+
+        Args:
+            card_id (int): The id of the card, from 0 to 51.
+        """
+        return CARDS[card_id]
         
     def __repr__(self):
         """Returns a string representation of the card."""
@@ -55,11 +72,28 @@ class Card:
         if not isinstance(other, Card):
             return NotImplemented
         # Compare only by rank, ignoring suits
-        return Card.RANKS.index(self.rank) < Card.RANKS.index(other.rank)
+        return self.value < other.value
     
     def rank_value(self):
         """Returns the numerical value of the card's rank."""
-        return Card.RANKS.index(self.rank) + 2  # +2 because '2' is the lowest rank and should have
+        return self.value  # 2 for '2' up to 14 for 'Ace'
+
+# Integer card core: a card id is rank_index * 4 + suit_index, so ids 0-3 are the
+# four 2s and ids 48-51 are the four Aces. The tables below are indexed by id.
+def card_id(rank_index, suit_index):
+    """Returns the integer id of a card from its rank index and suit index.
+
+    Args:
+        rank_index (int): Index of the rank in Card.RANKS (0 for '2', 12 for 'Ace').
+        suit_index (int): Index of the suit in Card.SUITS.
+    """
+    return rank_index * 4 + suit_index
+
+CARD_RANK = tuple(card >> 2 for card in range(52))  # rank index of each card id
+CARD_SUIT = tuple(card & 3 for card in range(52))   # suit index of each card id
+CARDS = tuple(Card(Card.RANKS[card >> 2], Card.SUITS[card & 3]) for card in range(52))
+CLUBS, DIAMONDS, HEARTS, SPADES = range(4)
+
 def test_card():
     # Creating some cards
     card1 = Card('Ace', 'Hearts')
@@ -78,23 +112,80 @@ def test_card():
 #test_card()
 
 class Deck:
-    def __init__(self):
+    """A deck of cards that can be reused for many rounds without allocating.
+
+    The deck keeps the ids of its live cards in one list and deals by moving a
+    cursor through it: reset() puts the dealt cards back and reshuffles in place.
+    Cards removed with remove_cards() are dead, tracked in a bitmask of card ids,
+    and stay out of the deck across resets.
+    """
+    rng = None
+    dead = 0
+
+    def __init__(self, rng=None):
         """Initializes a new deck of cards. (52 cards in total; 13 ranks in each of the 4 suits)
+
+        Args:
+            rng (random.Random): The random generator used to shuffle. Defaults to the
+                global one in the random module.
         """
-        self.cards = [Card(rank, suit) for suit in Card.SUITS for rank in Card.RANKS]
+        self.rng = rng
+        self.dead = 0  # Bitmask of the card ids removed from the deck
+        self._ids = list(range(52))  # Live card ids, the ones before the cursor have been dealt
+        self._cursor = 0
         self.shuffle()
 
+    @property
+    def cards(self):
+        """The cards left in the deck, as a new list of Card objects."""
+        return [CARDS[card] for card in self._ids[self._cursor:]]
+
+    @cards.setter
+    def cards(self, cards):
+        self._ids = [card.id for card in cards]
+        self._cursor = 0
+
+    def card_ids(self):
+        """Returns the ids of the cards left in the deck."""
+        return self._ids[self._cursor:]
+
     def shuffle(self):
-        """Shuffles the deck of cards."""
-        random.shuffle(self.cards)
+        """Shuffles the cards left in the deck."""
+        rng = self.rng or random
+        if self._cursor == 0:
+            rng.shuffle(self._ids)
+        else:
+            remaining = self._ids[self._cursor:]
+            rng.shuffle(remaining)
+            self._ids[self._cursor:] = remaining
+
+    def reset(self):
+        """Puts the dealt cards back and shuffles, keeping the dead cards out."""
+        self._cursor = 0
+        self.shuffle()
 
     def remove_cards(self, cards_to_remove):
-        """Removes a list of cards from the deck.
+        """Removes a list of cards from the deck. Cards are matched on rank and suit.
 
         Args:
             cards_to_remove (list): The cards to remove from the deck.
         """
-        self.cards = [card for card in self.cards if card not in cards_to_remove]
+        for card in cards_to_remove:
+            self.remove_card_id(card.id)
+
+    def remove_card_id(self, card_id):
+        """Removes a card from the deck by id. It stays out until the deck is rebuilt.
+
+        Args:
+            card_id (int): The id of the card to remove.
+        """
+        if self.dead >> card_id & 1:
+            return
+        self.dead |= 1 << card_id
+        index = self._ids.index(card_id)
+        if index < self._cursor:
+            self._cursor -= 1
+        del self._ids[index]
 
     def remove_specific_card(self, rank, suit):
         """Removes a specific card from the deck.
@@ -103,7 +194,7 @@ class Deck:
             rank (str): The rank of the card to remove.
             suit (str): The suit of the card to remove
         """
-        self.cards = [card for card in self.cards if not (card.rank == rank and card.suit == suit)]
+        self.remove_card_id(card_id(Card.RANK_INDEX[rank], Card.SUIT_INDEX[suit]))
 
     def deal(self, count=1):
         """Deals 'count' number of cards from the deck. Returns a list of cards.
@@ -114,15 +205,25 @@ class Deck:
         Returns:
             list: A list of dealt cards.
         """
-        if count > len(self.cards):
+        if count > len(self._ids) - self._cursor:
+            raise ValueError("Not enough cards in the deck to deal")
+        start = self._cursor
+        self._cursor += count
+        return [CARDS[card] for card in self._ids[start:self._cursor]]
+
+    def draw_id(self):
+        """Deals a single card and returns its id, without allocating anything."""
+        if self._cursor >= len(self._ids):
             raise ValueError("Not enough cards in the deck to deal")
-        dealt_cards = self.cards[:count]
-        self.cards = self.cards[count:]
-        return dealt_cards
+        self._cursor += 1
+        return self._ids[self._cursor - 1]
+
+    def __len__(self):
+        return len(self._ids) - self._cursor
 
     def __repr__(self):
         """Returns a string representation of the deck."""
-        return f"Deck of {len(self.cards)} cards"
+        return f"Deck of {len(self)} cards"
 def test_deck():
     deck = Deck()  # Creates and shuffles a new deck
     print(deck)    # Prints the representation of the deck
@@ -139,7 +240,7 @@ def rank_counts(cards): #obsolete function due to rank_counts_advanced
     """Returns a dictionary of the count of each rank in the hand, sorted by frequency and then by rank value."""
     count = Counter(card.rank for card in cards)
     # Sorting by frequency first, then by the rank value if frequencies are the same
-    return dict(sorted(count.items(), key=lambda item: (-item[1], -Card.RANKS.index(item[0]))))
+    return dict(sorted(count.items(), key=lambda item: (-item[1], -Card.RANK_INDEX[item[0]])))
 #print(rank_counts([Card('6', 'Spades'), Card('Ace', 'Hearts'), Card('2', 'Spades'), Card('2', 'Hearts'), Card('5', 'Spades'), Card('4', 'Hearts'), Card('5', 'Hearts')]))
 
 def rank_counts_advanced(cards):
@@ -158,7 +259,7 @@ def rank_counts_advanced(cards):
             for lower_count in range(count - 1, 1, -1):
                 organized_counts[lower_count].append(rank)
     for count in organized_counts:
-        organized_counts[count].sort(key=lambda rank: -Card.RANKS.index(rank))
+        organized_counts[count].sort(key=lambda rank: -Card.RANK_INDEX[rank])
     return dict(organized_counts)
 def test_rank_counts_advanced():
     cards = [[Card('6', 'Spades'), Card('Ace', 'Hearts'), Card('2', 'Spades'), Card('2', 'Hearts'), Card('5', 'Spades'), Card('4', 'Hearts'), Card('5', 'Hearts')],
@@ -355,6 +456,13 @@ class Hand(Deck):
         """Returns all the cards in the hand in a sorted list
         """
         return sorted(self.cards, key=lambda card: card.rank_value(), reverse=True)
+
+    def strength(self):
+        """Returns the strength of the best hand as a single int from the table
+        evaluator (see evaluator.py). Bigger is better.
+        """
+        from evaluator import evaluate  # evaluator imports this module
+        return evaluate(self.card_ids())
     
     def evaluate_hand(self):
         """Evaluates the hand and returns the best possible hand.
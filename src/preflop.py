@@ -0,0 +1,126 @@
+import argparse
+import concurrent.futures
+import os
+import numpy as np
+from poker import card_id
+from equity import card_ids, sample_outcomes
+from parallel import chunk_seeds
+from rng import make_rng
+
+"""
+Preflop equity table
+--------------------
+Preflop equities of the 169 canonical starting hands against 1 to 9 random
+opponents never change, so they are computed once by a build step and stored in
+a small .npy file that is memory-mapped on first use.
+
+The 169 hands are laid out like the usual 13x13 starting hand chart, with rank
+indexes from Card.RANKS: pairs on the diagonal, suited hands at [high][low] and
+offsuit hands at [low][high]. A hand's index in the table is row * 13 + column.
+
+Build the table with:
+    python preflop.py --build
+"""
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "preflop_equity.npy")
+MAX_OPPONENTS = 9
+WIN, TIE, EQUITY = range(3)  # Last axis of the table
+RANK_LETTERS = "23456789TJQKA"
+
+_table = None
+
+def hand_index(hole_cards):
+    """Returns the index (0 to 168) of the canonical starting hand of two hole cards.
+
+    Args:
+        hole_cards (list): Two Card objects or card ids.
+    """
+    first, second = card_ids(hole_cards)
+    high, low = max(first >> 2, second >> 2), min(first >> 2, second >> 2)
+    if (first & 3) == (second & 3):
+        return high * 13 + low
+    return low * 13 + high
+
+def hand_name(index):
+    """Returns the short name of a canonical starting hand, e.g. 'AKs', 'T9o' or '77'."""
+    row, column = divmod(index, 13)
+    if row == column:
+        return RANK_LETTERS[row] * 2
+    if row > column:
+        return RANK_LETTERS[row] + RANK_LETTERS[column] + "s"
+    return RANK_LETTERS[column] + RANK_LETTERS[row] + "o"
+
+def representative_hand(index):
+    """Returns two card ids of a starting hand that maps to 'index'."""
+    row, column = divmod(index, 13)
+    if row == column:
+        return [card_id(row, 0), card_id(row, 1)]
+    if row > column:
+        return [card_id(row, 0), card_id(column, 0)]
+    return [card_id(column, 0), card_id(row, 1)]
+
+def _build_hand(index, trials, seed):
+    rng = make_rng(seed)
+    hero = representative_hand(index)
+    remaining = [card for card in range(52) if card not in hero]
+    row = np.zeros((MAX_OPPONENTS, 3), dtype=np.float32)
+    for opponents in range(1, MAX_OPPONENTS + 1):
+        wins, ties, _, share = sample_outcomes(hero, [], [None] * opponents, remaining, trials, rng)
+        row[opponents - 1] = (wins / trials, ties / trials, share / trials)
+    return row
+
+def build_table(trials=20000, seed=0, workers=None, path=TABLE_PATH):
+    """Computes the preflop table by sampling and saves it to 'path'.
+
+    Args:
+        trials (int): Sampled deals per hand and opponent count. Defaults to 20,000.
+        seed (int): Master seed, one derived seed per hand. Defaults to 0.
+        workers (int): The number of worker processes. Defaults to the number of CPUs.
+        path (str): Where to save the table. Defaults to TABLE_PATH.
+
+    Returns:
+        numpy.ndarray: The (169, 9, 3) float32 table of win, tie and equity.
+    """
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        rows = list(executor.map(_build_hand, range(169), [trials] * 169, chunk_seeds(seed, 169)))
+    table = np.stack(rows)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.save(path, table)
+    return table
+
+def load_table(path=TABLE_PATH):
+    """Returns the preflop table, memory-mapping it from disk on first use.
+
+    Raises:
+        FileNotFoundError: If the table has not been built yet.
+    """
+    global _table
+    if _table is None:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No preflop table at {path}, build it with: python preflop.py --build")
+        _table = np.load(path, mmap_mode="r")
+    return _table
+
+def preflop_odds(hole_cards, opponents=1):
+    """Returns (win, tie, equity) of two hole cards against random opponents before the flop.
+
+    Args:
+        hole_cards (list): Two Card objects or card ids.
+        opponents (int): The number of random opponents, from 1 to 9. Defaults to 1.
+    """
+    if not 1 <= opponents <= MAX_OPPONENTS:
+        raise ValueError(f"Opponents must be between 1 and {MAX_OPPONENTS}")
+    win, tie, equity = load_table()[hand_index(hole_cards), opponents - 1]
+    return float(win), float(tie), float(equity)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the preflop equity table.")
+    parser.add_argument("--build", action="store_true", help="compute the table and save it")
+    parser.add_argument("--trials", type=int, default=20000, help="sampled deals per hand and opponent count")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.build:
+        build_table(args.trials, args.seed)
+    table = load_table()
+    for index in sorted(range(169), key=lambda i: -table[i, 0, EQUITY])[:10]:
+        print(hand_name(index), [f"{equity:.3f}" for equity in table[index, :, EQUITY]])
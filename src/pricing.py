@@ -0,0 +1,404 @@
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import socketserver
+import sys
+import threading
+import time
+from functools import partial
+from statistics import NormalDist
+from golden_nugget_ultimate import basic_strategy, simulate_ultimate
+from parallel import chunk_seeds, replay_hand, run_parallel
+from paytable import SideBet, simulate_side_bets
+from poker import CARDS
+from rng import bit_generator_name
+from streaming import summarize
+from sweep import BUILT_IN_BETS
+
+"""
+Pricing service
+---------------
+Prices jobs from files or from a local socket. A job is a JSON object:
+
+    {"game": "side_bets", "bets": ["Trips", {"name": ..., "kind": ..., "payouts": ...}],
+     "hands": 10000000, "seed": 0}
+    {"game": "ultimate", "policy": "basic", "precision": 0.002, "seed": 1}
+
+'bets' are built-in names (see sweep.BUILT_IN_BETS) or side bet definitions as
+in paytable.load_side_bets(). A job gives either 'hands' (a fixed number of
+rounds) or 'precision' (simulate in batches until the confidence interval of
+every expected payout is within +/- precision, up to 'max_hands'). The seed
+defaults to 0 and the work is split in chunks of a fixed 'chunk_size', so a job
+always gives the same result on any machine. The seed, chunk size and bit
+generator (see rng.py) are part of the job in every response, which is enough
+to replay any single hand of it, see replay_job_hand().
+
+A job is normalized (built-in bets expanded, defaults filled in) and its
+canonical JSON hashed with SHA-256. Finished results are stored under that hash,
+so the same job asked again is answered from disk. Identical jobs submitted
+while one is running share its result.
+
+    python pricing.py run jobs.json            # a job, a list of jobs or JSON lines
+    python pricing.py serve --socket /tmp/pricing.sock
+    python pricing.py submit --socket /tmp/pricing.sock jobs.json
+    python pricing.py replay job.json --hand 123456
+"""
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pricing_cache")
+SOCKET_PATH = "/tmp/poker-pricing.sock"
+GAMES = ("side_bets", "ultimate")
+POLICIES = {"basic": basic_strategy}
+DEFAULTS = {"seed": 0, "confidence": 0.95, "chunk_size": 250000, "batch_size": 1000000, "max_hands": 100000000}
+CARDS_PER_HAND = 9  # Both games deal the player, the dealer and the board, see paytable.RoundBatch
+
+def normalize_job(job):
+    """Returns the canonical form of a job: built-in bets expanded and defaults filled in.
+
+    Raises:
+        ValueError: If the job is not valid.
+    """
+    if not isinstance(job, dict):
+        raise ValueError(f"A job is a JSON object, not {job!r}")
+    game = job.get("game")
+    if game not in GAMES:
+        raise ValueError(f"Unknown game: {game!r}, expected one of {GAMES}")
+    if ("hands" in job) == ("precision" in job):
+        raise ValueError("A job needs either 'hands' or 'precision'")
+    normalized = {key: job.get(key, default) for key, default in DEFAULTS.items()}
+    normalized["game"] = game
+    # Workers pick their bit generator from POKER_RNG, so a job can only ask for this process's one
+    normalized["rng"] = bit_generator_name()
+    if job.get("rng", normalized["rng"]) != normalized["rng"]:
+        raise ValueError(f"This service draws with {normalized['rng']!r}, not {job['rng']!r}")
+    try:
+        if "hands" in job:
+            normalized["hands"] = int(job["hands"])
+            del normalized["batch_size"], normalized["max_hands"]
+        else:
+            normalized["precision"] = float(job["precision"])
+        for key in ("seed", "chunk_size", "batch_size", "max_hands"):
+            if key in normalized:
+                normalized[key] = int(normalized[key])
+        normalized["confidence"] = float(normalized["confidence"])
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"Invalid job parameter: {error}") from error
+    for key in ("hands", "chunk_size", "batch_size", "max_hands"):
+        if key in normalized and normalized[key] <= 0:
+            raise ValueError(f"'{key}' must be positive")
+    if not 0 < normalized["confidence"] < 1 or normalized.get("precision", 1) <= 0:
+        raise ValueError("'confidence' must be between 0 and 1 and 'precision' positive")
+    if game == "side_bets":
+        if not job.get("bets"):
+            raise ValueError("A side_bets job needs 'bets'")
+        bets = [_side_bet(bet) for bet in job["bets"]]
+        # Round trip through JSON so the keys are the same as in a job read from a file
+        normalized["bets"] = json.loads(json.dumps([bet.to_dict() for bet in bets]))
+    else:
+        policy = job.get("policy", "basic")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy: {policy!r}")
+        normalized["policy"] = policy
+    return normalized
+
+def _side_bet(bet):
+    # A built-in bet name or a side bet definition, see paytable.load_side_bets()
+    if isinstance(bet, str):
+        if bet not in BUILT_IN_BETS:
+            raise ValueError(f"Unknown side bet: {bet!r}, expected one of {tuple(BUILT_IN_BETS)} or a definition")
+        return BUILT_IN_BETS[bet]
+    if not isinstance(bet, dict):
+        raise ValueError(f"A side bet is a name or a definition, not {bet!r}")
+    try:
+        return SideBet(**bet)
+    except (TypeError, KeyError) as error:
+        raise ValueError(f"Invalid side bet {bet!r}: {error!r}") from error
+
+def job_key(job):
+    """Returns the SHA-256 of the canonical JSON of a normalized job."""
+    return hashlib.sha256(json.dumps(job, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+class ResultCache:
+    def __init__(self, directory=CACHE_DIR):
+        """Finished job results on disk, one JSON file per job key.
+
+        Args:
+            directory (str): Where to keep the results. Defaults to CACHE_DIR.
+        """
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """Returns the stored result for 'key', or None."""
+        try:
+            with open(self._path(key)) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, result):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so a reader never sees half a file
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(result, file)
+        os.replace(temporary, path)
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+def _side_bet_result(bets, counts, hands, confidence):
+    result = {}
+    for bet in bets:
+        summary = summarize(counts[bet.name], hands, bet.payouts, confidence)
+        # Outcomes missing from the paytable lose the bet, see sweep.payout_matrix()
+        listed = sum(counts[bet.name].values()) / hands
+        summary["house_edge"] = (1 - listed) - summary["expected_payout"]
+        result[bet.name] = summary
+    return {"hands": hands, "bets": result}
+
+def _ultimate_result(total, counts, hands, confidence):
+    mean = total / hands
+    variance = max(counts["sum_squares"] / hands - mean * mean, 0.0)
+    std_error = math.sqrt(variance / hands)
+    half_width = NormalDist().inv_cdf(0.5 + confidence / 2) * std_error
+    return {"hands": hands, "expected_payout": mean, "house_edge": -mean, "variance": variance,
+            "std_error": std_error, "half_width": half_width, "counts": counts}
+
+def _batches(job):
+    if "hands" in job:
+        return [(job["hands"], job["seed"])]
+    # Batches get their own seeds, so a precision job is as reproducible as a fixed one
+    num_batches = math.ceil(job["max_hands"] / job["batch_size"])
+    return [(min(job["batch_size"], job["max_hands"] - index * job["batch_size"]), seed)
+            for index, seed in enumerate(chunk_seeds(job["seed"], num_batches))]
+
+def replay_job_hand(job, hand):
+    """Returns the card ids dealt in one hand of a job: player, dealer, then the board.
+
+    Args:
+        job (dict): The job, as given or as recorded in a response.
+        hand (int): The number of the hand in the job, from 0.
+    """
+    job = normalize_job(job)
+    for size, seed in _batches(job):
+        if hand < size:
+            return replay_hand(seed, hand, CARDS_PER_HAND, job["chunk_size"]).tolist()
+        hand -= size
+    raise ValueError("The job has fewer hands")
+
+def price(job, workers=None, mp_context=None):
+    """Runs a normalized job (see normalize_job()) and returns its result as a dict.
+
+    Args:
+        job (dict): The normalized job.
+        workers (int): Worker processes. Defaults to the number of CPUs.
+        mp_context: The multiprocessing context of the workers, see parallel.run_parallel().
+    """
+    if job["game"] == "side_bets":
+        bets = [SideBet(**bet) for bet in job["bets"]]
+        simulation = partial(simulate_side_bets, bets)
+    else:
+        simulation = partial(simulate_ultimate, policy=POLICIES[job["policy"]])
+
+    hands = 0
+    counts = {}
+    total = 0.0
+    for size, seed in _batches(job):
+        expected_payout, batch_counts = run_parallel(simulation, size, seed=seed, workers=workers,
+                                                     chunk_size=job["chunk_size"], mp_context=mp_context)
+        hands += size
+        for key, value in batch_counts.items():
+            if isinstance(value, dict):
+                merged = counts.setdefault(key, {})
+                for outcome, count in value.items():
+                    merged[outcome] = merged.get(outcome, 0) + count
+            else:
+                counts[key] = counts.get(key, 0) + value
+        if job["game"] == "side_bets":
+            result = _side_bet_result(bets, counts, hands, job["confidence"])
+            half_width = max(summary["half_width"] for summary in result["bets"].values())
+        else:
+            total += expected_payout * size
+            result = _ultimate_result(total, dict(counts), hands, job["confidence"])
+            half_width = result["half_width"]
+        if "precision" in job and half_width <= job["precision"]:
+            break
+    return result
+
+class PricingService:
+    def __init__(self, cache_dir=CACHE_DIR, max_jobs=2, workers=None):
+        """Prices jobs on a pool of threads, each running its simulation with run_parallel().
+
+        Args:
+            cache_dir (str): Where finished results are kept. Defaults to CACHE_DIR.
+            max_jobs (int): Jobs priced at the same time. Defaults to 2.
+            workers (int): Worker processes per job. Defaults to the number of CPUs.
+        """
+        self.cache = ResultCache(cache_dir)
+        self.workers = workers
+        # Jobs run on threads, and forking a multi-threaded process can copy a held lock into the child
+        methods = multiprocessing.get_all_start_methods()
+        self._mp_context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="pricing")
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job):
+        """Schedules a job and returns a Future of its response.
+
+        The response is a dict with the job 'key', the normalized 'job', its 'result',
+        whether it came from the 'cached' results and the 'seconds' it took.
+
+        Raises:
+            ValueError: If the job is not valid.
+        """
+        job = normalize_job(job)
+        key = job_key(job)
+        with self._lock:
+            if key in self._in_flight:
+                return self._in_flight[key]
+            cached = self.cache.get(key)
+            if cached is not None:
+                future = concurrent.futures.Future()
+                future.set_result({"key": key, "job": job, "result": cached, "cached": True, "seconds": 0.0})
+                return future
+            future = self._executor.submit(self._run, key, job)
+            self._in_flight[key] = future
+        return future
+
+    def _run(self, key, job):
+        try:
+            started = time.perf_counter()
+            # Round trip through JSON so a fresh result looks exactly like a cached one
+            result = json.loads(json.dumps(price(job, self.workers, self._mp_context)))
+            self.cache.put(key, result)
+            return {"key": key, "job": job, "result": result, "cached": False,
+                    "seconds": time.perf_counter() - started}
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def price(self, job):
+        """Prices a job and waits for its response, see submit()."""
+        return self.submit(job).result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+def read_jobs(path):
+    """Reads jobs from a JSON file holding a job, a list of jobs, or one job per line."""
+    with open(path) as file:
+        text = file.read()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    return data if isinstance(data, list) else [data]
+
+def _error_response(job, error):
+    return {"job": job, "error": str(error)}
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    # One JSON job per line in, one JSON response per line out
+    def handle(self):
+        futures = []
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                futures.append(self.server.service.submit(json.loads(line)))
+            except ValueError as error:
+                self._send(_error_response(line.decode().strip(), error))
+        for future in futures:
+            try:
+                self._send(future.result())
+            except Exception as error:
+                self._send({"error": str(error)})
+
+    def _send(self, response):
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+        self.wfile.flush()
+
+class PricingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, service):
+        """Serves a PricingService on a Unix socket at 'path'."""
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, _JobHandler)
+        self.service = service
+
+def submit_to_socket(path, jobs):
+    """Sends jobs to a running server and returns its responses."""
+    import socket
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(path)
+        connection.sendall(b"".join(json.dumps(job).encode() + b"\n" for job in jobs))
+        connection.shutdown(socket.SHUT_WR)
+        with connection.makefile("rb") as responses:
+            return [json.loads(line) for line in responses]
+
+def main():
+    parser = argparse.ArgumentParser(description="Price side bets and the base game, with a persistent result cache.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="price the jobs in one or more files")
+    run.add_argument("files", nargs="+")
+    serve = commands.add_parser("serve", help="price jobs sent to a local socket")
+    serve.add_argument("--socket", default=SOCKET_PATH)
+    submit = commands.add_parser("submit", help="send the jobs in files to a running server")
+    submit.add_argument("files", nargs="+")
+    submit.add_argument("--socket", default=SOCKET_PATH)
+    replay = commands.add_parser("replay", help="print the cards of one hand of a job")
+    replay.add_argument("file")
+    replay.add_argument("--hand", type=int, required=True)
+    for command in (run, serve):
+        command.add_argument("--cache-dir", default=CACHE_DIR)
+        command.add_argument("--max-jobs", type=int, default=2, help="jobs priced at the same time")
+        command.add_argument("--workers", type=int, help="worker processes per job")
+    args = parser.parse_args()
+
+    if args.command == "replay":
+        for job in read_jobs(args.file):
+            # A response file holds the job under "job"
+            cards = replay_job_hand(job.get("job", job), args.hand)
+            print(", ".join(str(CARDS[card]) for card in cards))
+        return 0
+
+    if args.command == "submit":
+        for response in submit_to_socket(args.socket, [job for path in args.files for job in read_jobs(path)]):
+            print(json.dumps(response))
+        return 0
+
+    service = PricingService(args.cache_dir, args.max_jobs, args.workers)
+    if args.command == "serve":
+        with PricingServer(args.socket, service) as server:
+            print(f"Serving on {args.socket}", file=sys.stderr)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+        service.shutdown()
+        return 0
+
+    futures = []
+    for path in args.files:
+        for job in read_jobs(path):
+            try:
+                futures.append(service.submit(job))
+            except ValueError as error:
+                print(json.dumps(_error_response(job, error)))
+    for future in futures:
+        print(json.dumps(future.result()))
+    service.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+import re
+from itertools import combinations
+from math import comb
+import numpy as np
+from poker import Card, card_id
+from batch import evaluate_batch
+from rng import deal_batch, make_rng
+import metrics
+from canonical import EvaluationCache
+from equity import EquityResult, card_ids
+from preflop import EQUITY, RANK_LETTERS, hand_index, hand_name, load_table
+
+"""
+Hand ranges and range-vs-range equity
+-------------------------------------
+A Range gives a weight from 0 to 1 to each of the 1326 two-card combos (COMBOS),
+so it can be a plain list of hands ("22+, A2s+, KTo+"), the best hands by
+preflop equity ("top 15%") or a weighted mix ("AKs, AQs:0.5").
+
+range_equity() enumerates every runout of the board (sampling them preflop) and,
+for each runout, evaluates all 1326 combos once in a numpy batch. Both ranges
+read their strengths from that one vector, and the matrices of runout strengths
+are cached per board. A hero combo's outcome against the villain range is then
+three weight sums over the villain combos sorted by strength: weaker, equal
+and all. Villain combos that share a card with the hero combo are subtracted,
+per card, from the 51 combos that hold it. A pair of combos that share a card
+never counts, and there's no need to build the 1326 x 1326 matrix.
+"""
+
+COMBOS = np.array(list(combinations(range(52), 2)), dtype=np.int8)
+NUM_COMBOS = len(COMBOS)  # 1326
+COMBO_INDEX = {(int(a), int(b)): index for index, (a, b) in enumerate(COMBOS)}
+COMBO_HAND = np.array([hand_index(combo) for combo in COMBOS.tolist()])  # Starting hand (0 to 168) per combo
+COMBO_MASK = (np.int64(1) << COMBOS[:, 0].astype(np.int64)) | (np.int64(1) << COMBOS[:, 1].astype(np.int64))
+# The 51 combos holding each card
+CARD_COMBOS = np.array([np.flatnonzero((COMBOS == card).any(axis=1)) for card in range(52)])
+
+MAX_EXACT_RUNOUTS = 2000  # Enumerate the runouts when there are at most this many (flop and later)
+DEFAULT_SAMPLES = 2000  # Runouts sampled otherwise
+
+SUIT_LETTERS = "cdhs"  # In the order of Card.SUITS
+_RANK = "[2-9TJQKA]"
+_TOKEN_PATTERNS = [
+    ("combo", re.compile(rf"^({_RANK})([cdhs])({_RANK})([cdhs])$")),
+    ("pair", re.compile(rf"^({_RANK})\1(\+)?$")),
+    ("pair_span", re.compile(rf"^({_RANK})\1-({_RANK})\2$")),
+    ("hand", re.compile(rf"^({_RANK})({_RANK})([so]?)(\+)?$")),
+    ("hand_span", re.compile(rf"^({_RANK})({_RANK})([so]?)-\1({_RANK})\3$")),
+    ("top", re.compile(r"^(?:top\s*)?(\d+(?:\.\d+)?)%$")),
+]
+
+# Runout strengths per exact board: 1,176 x 1,326 int32 on the flop, about 6 MB each, so 50 MB when full
+board_cache = EvaluationCache(maxsize=8)
+metrics.register_cache("board", board_cache)
+
+def _hand_indexes(high, low, suitedness):
+    """Starting hand indexes for two ranks, suited ('s'), offsuit ('o') or both ('')."""
+    if high == low:
+        return [high * 13 + high]
+    high, low = max(high, low), min(high, low)
+    indexes = []
+    if suitedness in ("s", ""):
+        indexes.append(high * 13 + low)
+    if suitedness in ("o", ""):
+        indexes.append(low * 13 + high)
+    return indexes
+
+class Range:
+    def __init__(self, weights=None):
+        """A weighted range of two-card hands.
+
+        Args:
+            weights (numpy.ndarray): One weight from 0 to 1 per combo in COMBOS. Defaults
+                to an empty range.
+        """
+        self.weights = np.zeros(NUM_COMBOS) if weights is None else np.asarray(weights, dtype=float)
+
+    @classmethod
+    def parse(cls, text):
+        """Parses a comma separated range.
+
+        Tokens: pairs ('77', '22+', '77-TT'), hands with 's' (suited), 'o' (offsuit)
+        or neither (both) ('AKs', 'A2s+', 'KTo+', 'K9s-K6s', 'AK'), single combos
+        ('AsKh'), the best hands by preflop equity ('top 15%'), and any of them can
+        end with ':weight' ('AQs:0.5'). Later tokens override earlier ones.
+
+        Raises:
+            ValueError: If a token can't be parsed.
+        """
+        weights = np.zeros(NUM_COMBOS)
+        for token in text.split(","):
+            token = token.strip()
+            if not token:
+                continue
+            token, _, weight = token.partition(":")
+            weight = float(weight) if weight else 1.0
+            combos = cls._parse_token(token.strip())
+            weights[combos] = weight
+        return cls(weights)
+
+    @staticmethod
+    def _parse_token(token):
+        for kind, pattern in _TOKEN_PATTERNS:
+            match = pattern.match(token)
+            if match:
+                break
+        else:
+            raise ValueError(f"Invalid range token: {token!r}")
+        groups = match.groups()
+        if kind == "combo":
+            first = card_id(RANK_LETTERS.index(groups[0]), SUIT_LETTERS.index(groups[1]))
+            second = card_id(RANK_LETTERS.index(groups[2]), SUIT_LETTERS.index(groups[3]))
+            if first == second:
+                raise ValueError(f"Invalid range token: {token!r}")
+            return [COMBO_INDEX[min(first, second), max(first, second)]]
+        if kind == "top":
+            return np.flatnonzero(Range.top(float(groups[0])).weights)
+
+        ranks = [RANK_LETTERS.index(letter) for letter in groups if letter and letter in RANK_LETTERS]
+        if kind == "pair":
+            pairs = range(ranks[0], 13) if groups[1] else [ranks[0]]
+            hands = [index for rank in pairs for index in _hand_indexes(rank, rank, "")]
+        elif kind == "pair_span":
+            low, high = sorted(ranks)
+            hands = [index for rank in range(low, high + 1) for index in _hand_indexes(rank, rank, "")]
+        elif kind == "hand":
+            high, low = ranks
+            if high == low:
+                raise ValueError(f"Invalid range token: {token!r}")
+            high, low = max(high, low), min(high, low)
+            # 'A2s+' raises the kicker up to just below the top card
+            kickers = range(low, high) if groups[3] else [low]
+            hands = [index for kicker in kickers for index in _hand_indexes(high, kicker, groups[2])]
+        else:
+            high, first, second = ranks
+            low, top = sorted((first, second))
+            if top >= high:
+                raise ValueError(f"Invalid range token: {token!r}")
+            hands = [index for kicker in range(low, top + 1) for index in _hand_indexes(high, kicker, groups[2])]
+        return np.flatnonzero(np.isin(COMBO_HAND, hands))
+
+    @classmethod
+    def top(cls, percent):
+        """The best starting hands by preflop equity against one random hand, whole hands
+        at a time, until they hold at least 'percent' % of all combos.
+        """
+        equities = np.asarray(load_table()[:, 0, EQUITY])
+        hand_combos = np.bincount(COMBO_HAND, minlength=169)
+        chosen = []
+        total = 0
+        for index in np.argsort(-equities, kind="stable"):
+            if total >= percent / 100 * NUM_COMBOS:
+                break
+            chosen.append(index)
+            total += hand_combos[index]
+        return cls(np.isin(COMBO_HAND, chosen).astype(float))
+
+    def without(self, dead_cards):
+        """Returns a copy of the range without the combos holding any of 'dead_cards'."""
+        dead = 0
+        for card in card_ids(dead_cards):
+            dead |= 1 << card
+        return Range(np.where(COMBO_MASK & dead, 0.0, self.weights))
+
+    @property
+    def num_combos(self):
+        """The weighted number of combos in the range."""
+        return float(self.weights.sum())
+
+    @property
+    def fraction(self):
+        """The share of all 1326 combos held by the range."""
+        return self.num_combos / NUM_COMBOS
+
+    def hands(self):
+        """Returns the starting hands in the range with their average weight, e.g. {'AKs': 1.0}."""
+        totals = np.bincount(COMBO_HAND, weights=self.weights, minlength=169)
+        counts = np.bincount(COMBO_HAND, minlength=169)
+        return {hand_name(index): float(totals[index] / counts[index]) for index in np.flatnonzero(totals)}
+
+    def __repr__(self):
+        return f"Range({self.num_combos:g} combos, {self.fraction:.1%})"
+
+def _runouts(board, samples, rng):
+    remaining = [card for card in range(52) if card not in board]
+    missing = 5 - len(board)
+    if comb(len(remaining), missing) <= MAX_EXACT_RUNOUTS:
+        count = comb(len(remaining), missing)
+        return np.array(list(combinations(remaining, missing)), dtype=np.int8).reshape(count, missing), True
+    return deal_batch(samples, missing, rng, remaining), False
+
+def runout_strengths(board, runouts):
+    """Evaluates every combo on every runout of a board.
+
+    Args:
+        board (list): The known community card ids.
+        runouts (numpy.ndarray): (R, 5 - len(board)) card ids completing the board.
+
+    Returns:
+        numpy.ndarray: (R, 1326) strengths, -1 for the combos holding a board card.
+    """
+    full_boards = np.hstack([np.tile(np.array(board, dtype=np.int8), (len(runouts), 1)), runouts])
+    strengths = np.full((len(runouts), NUM_COMBOS), -1, dtype=np.int32)  # Strengths fit in 24 bits
+    for row, full_board in enumerate(full_boards):
+        live = (COMBO_MASK & sum(1 << int(card) for card in full_board)) == 0
+        deals = np.hstack([COMBOS[live], np.tile(full_board, (int(live.sum()), 1))])
+        strengths[row, live] = evaluate_batch(deals)
+    return strengths
+
+def _settle_runout(strengths, hero_weights, villain_weights):
+    # Villain weights below, equal to and in total for every hero combo, ignoring card conflicts
+    villain_weights = np.where(strengths >= 0, villain_weights, 0.0)
+    order = np.argsort(strengths, kind="stable")
+    sorted_strengths = strengths[order]
+    cumulative = np.concatenate([[0.0], np.cumsum(villain_weights[order])])
+    heroes = np.flatnonzero((hero_weights > 0) & (strengths >= 0))
+    hero_strengths = strengths[heroes]
+    below = cumulative[np.searchsorted(sorted_strengths, hero_strengths, "left")]
+    equal = cumulative[np.searchsorted(sorted_strengths, hero_strengths, "right")] - below
+    total = np.full(len(heroes), cumulative[-1])
+
+    # Take out the villain combos sharing a card with the hero combo. The hero combo
+    # itself holds both cards, so it is taken out twice and added back once.
+    for side in (0, 1):
+        shared = CARD_COMBOS[COMBOS[heroes, side]]
+        shared_strengths = strengths[shared]
+        shared_weights = villain_weights[shared]
+        below -= (shared_weights * (shared_strengths < hero_strengths[:, None])).sum(axis=1)
+        equal -= (shared_weights * (shared_strengths == hero_strengths[:, None])).sum(axis=1)
+        total -= shared_weights.sum(axis=1)
+    equal += villain_weights[heroes]
+    total += villain_weights[heroes]
+    return heroes, below, equal, total - below - equal
+
+def range_equity(hero_range, villain_range, board=(), samples=DEFAULT_SAMPLES, seed=None, per_combo=False):
+    """Equity of one range against another, heads-up.
+
+    Args:
+        hero_range (Range): The hero's range, or a string for Range.parse().
+        villain_range (Range): The villain's range, or a string for Range.parse().
+        board (list): 0 to 5 known community cards, as Card objects or card ids.
+        samples (int): Runouts sampled when there are too many to enumerate (fewer than
+            3 board cards). Defaults to 2000.
+        seed (int): Seed for the sampled runouts. Defaults to None (unseeded).
+        per_combo (bool): Also return the equity of every hero combo. Defaults to False.
+
+    Returns:
+        EquityResult: wins, ties and losses are weighted counts of (hero combo, villain
+        combo, runout) outcomes. With per_combo, (result, equities) where equities has
+        the equity of each of the 1326 combos, NaN for the ones not in the range.
+    """
+    if isinstance(hero_range, str):
+        hero_range = Range.parse(hero_range)
+    if isinstance(villain_range, str):
+        villain_range = Range.parse(villain_range)
+    board = card_ids(board)
+    if len(board) > 5 or len(set(board)) != len(board):
+        raise ValueError("The board must have at most 5 different cards")
+
+    runouts, exact = _runouts(board, samples, make_rng(seed))
+    if exact:
+        strengths = board_cache.get_or_compute(tuple(sorted(board)), lambda: runout_strengths(board, runouts))
+    else:
+        strengths = runout_strengths(board, runouts)
+
+    result = EquityResult(exact=exact)
+    combo_share = np.zeros(NUM_COMBOS)
+    combo_total = np.zeros(NUM_COMBOS)
+    for row in strengths:
+        heroes, below, equal, above = _settle_runout(row, hero_range.weights, villain_range.weights)
+        weights = hero_range.weights[heroes]
+        result.wins += float(weights @ below)
+        result.ties += float(weights @ equal)
+        result.losses += float(weights @ above)
+        result.share += float(weights @ (below + equal / 2))
+        if per_combo:
+            combo_share[heroes] += below + equal / 2
+            combo_total[heroes] += below + equal + above
+    if not per_combo:
+        return result
+    with np.errstate(invalid="ignore", divide="ignore"):
+        equities = np.where((hero_range.weights > 0) & (combo_total > 0), combo_share / combo_total, np.nan)
+    return result, equities
+
+if __name__ == "__main__":
+    hero = Range.parse("22+, A2s+, KTo+")
+    villain = Range.parse("top 15%")
+    print(hero, villain)
+    flop = [Card('Ace', 'Spades'), Card('King', 'Hearts'), Card('7', 'Clubs')]
+    print(range_equity(hero, villain, flop))
+    print(range_equity(hero, villain, samples=1000, seed=0))
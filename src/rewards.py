@@ -0,0 +1,32 @@
+from evaluator import CATEGORY_SHIFT, STRAIGHT_FLUSH
+
+"""
+Side bet paytables
+------------------
+The Golden Nugget paytables of the Diamonds and Trips side bets, multiplied by
+the bet, and the strength of the lowest royal flush. They live apart from the
+simulators so that both golden_nugget_ultimate.py and paytable.py can import them.
+
+- Diamonds: the number of diamonds out of the 9 dealt cards.
+- Trips: the category of the player's best hand.
+"""
+
+diamonds_rewards = {
+    4:3,
+    5:10,
+    6:30,
+    7:100,
+    8:300,
+    9:1000,
+}
+
+trips_rewards = {
+    "Straight Flush": 40,
+    "Four of a Kind": 30,
+    "Full House": 8,
+    "Flush": 7,
+    "Straight": 4,
+    "Three of a Kind": 3,
+}
+
+ROYAL_FLUSH = (STRAIGHT_FLUSH << CATEGORY_SHIFT) | (12 << 16)  # Ace-high straight flush
@@ -0,0 +1,119 @@
+import os
+import numpy as np
+
+"""
+Random number layer
+-------------------
+All the simulators draw their cards through this module. Generators are numpy
+Generators on a PCG64 or Philox bit generator, chosen with the POKER_RNG
+environment variable (or set_bit_generator(), which also sets it so worker
+processes pick it up).
+
+Deals are drawn with a batched partial Fisher-Yates shuffle: only the k cards a
+round needs are swapped into place, from k uniform doubles per deal. A deal
+always takes exactly k doubles from the stream, so hand number h of a simulation
+started from a seed uses doubles h*k to h*k+k-1 and can be replayed on its own
+by advancing the bit generator, see replay_deal().
+
+Independent streams come either from the SeedSequence seeds of
+parallel.chunk_seeds() or from jumping one seed's stream, see make_rng() and
+jumped_rngs().
+"""
+
+BIT_GENERATORS = {"pcg64": np.random.PCG64, "philox": np.random.Philox}
+# Philox advances its counter in blocks of 4 outputs, PCG64 one output at a time
+_ADVANCE_BLOCK = {"pcg64": 1, "philox": 4}
+_DECK = np.arange(52, dtype=np.int8)
+
+def bit_generator_name(name=None):
+    """Returns the bit generator to use: 'name', else POKER_RNG, else 'pcg64'.
+
+    Raises:
+        ValueError: If the bit generator is unknown.
+    """
+    name = (name or os.environ.get("POKER_RNG") or "pcg64").lower()
+    if name not in BIT_GENERATORS:
+        raise ValueError(f"Unknown bit generator: {name!r}, expected one of {tuple(BIT_GENERATORS)}")
+    return name
+
+def set_bit_generator(name):
+    """Makes 'name' the default bit generator, here and in worker processes started after."""
+    os.environ["POKER_RNG"] = bit_generator_name(name)
+
+def make_rng(seed=None, stream=0, bit_generator=None):
+    """Returns a numpy Generator.
+
+    Args:
+        seed (int): The seed. A Generator is returned as is. Defaults to None (unseeded).
+        stream (int): Jumps the stream this many times, each jump giving a stream that
+            won't overlap the others (2^127 draws apart for PCG64). Defaults to 0.
+        bit_generator (str): 'pcg64' or 'philox'. Defaults to bit_generator_name().
+    """
+    if isinstance(seed, np.random.Generator):
+        return seed
+    bits = BIT_GENERATORS[bit_generator_name(bit_generator)](seed)
+    if stream:
+        bits = bits.jumped(stream)
+    return np.random.Generator(bits)
+
+def jumped_rngs(seed, count, bit_generator=None):
+    """Returns 'count' independent Generators, one per worker, by jumping the stream of one seed."""
+    return [make_rng(seed, stream, bit_generator) for stream in range(count)]
+
+def deal_batch(num_deals, cards_per_deal, rng, deck=None):
+    """Draws 'num_deals' independent deals of 'cards_per_deal' cards each.
+
+    Runs the first 'cards_per_deal' steps of a Fisher-Yates shuffle on every row at
+    once, so the cost grows with the cards dealt rather than the size of the deck.
+
+    Args:
+        num_deals (int): The number of deals (rows) to draw.
+        cards_per_deal (int): The number of cards in each deal.
+        rng (numpy.random.Generator): The random generator to use.
+        deck (list): The card ids to deal from. Defaults to a full deck.
+
+    Returns:
+        numpy.ndarray: An (num_deals, cards_per_deal) int8 array of card ids.
+    """
+    deck = _DECK if deck is None else np.asarray(deck, dtype=np.int8)
+    if cards_per_deal > len(deck):
+        raise ValueError("Not enough cards in the deck to deal")
+    uniforms = rng.random((num_deals, cards_per_deal))
+    decks = np.tile(deck, (num_deals, 1))
+    rows = np.arange(num_deals)
+    for position in range(cards_per_deal):
+        # Swap a card picked from the rest of the deck into this position
+        picks = position + (uniforms[:, position] * (len(deck) - position)).astype(np.intp)
+        picked = decks[rows, picks]
+        decks[rows, picks] = decks[:, position]
+        decks[:, position] = picked
+    return decks[:, :cards_per_deal]
+
+def replay_deal(seed, hand, cards_per_deal, stream=0, bit_generator=None, deck=None):
+    """Returns the cards of one hand of a simulation that dealt every hand with deal_batch()
+    from make_rng(seed, stream, bit_generator), without dealing the hands before it.
+
+    Args:
+        seed (int): The seed the simulation was given.
+        hand (int): The number of the hand in the simulation, from 0.
+        cards_per_deal (int): The cards dealt per hand.
+        deck (list): The card ids the hands were dealt from. Defaults to a full deck.
+
+    Returns:
+        numpy.ndarray: The card ids of the hand.
+    """
+    name = bit_generator_name(bit_generator)
+    bits = BIT_GENERATORS[name](seed)
+    if stream:
+        bits = bits.jumped(stream)
+    block, skip = divmod(hand * cards_per_deal, _ADVANCE_BLOCK[name])
+    bits.advance(block)
+    rng = np.random.Generator(bits)
+    rng.random(skip)
+    return deal_batch(1, cards_per_deal, rng, deck)[0]
+
+if __name__ == "__main__":
+    from poker import CARDS
+    deals = deal_batch(100000, 9, make_rng(7))
+    replayed = replay_deal(7, 12345, 9)
+    print([str(CARDS[card]) for card in replayed], (deals[12345] == replayed).all())
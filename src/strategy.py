@@ -0,0 +1,251 @@
+import argparse
+import concurrent.futures
+import json
+import math
+import os
+from itertools import combinations
+import numpy as np
+from batch import chunk_sizes, evaluate_batch
+from canonical import canonicalize, shared_cache
+from evaluator import evaluate
+from golden_nugget_ultimate import basic_strategy, settle_ultimate, settle_ultimate_batch
+from parallel import chunk_seeds
+from preflop import hand_index, hand_name, representative_hand
+from rng import deal_batch, make_rng
+
+"""
+Ultimate Texas Hold'em strategy solver
+--------------------------------------
+Computes the EV of every action at each decision point, in units of the Ante:
+
+- River (1x or fold): exact, over the 990 possible dealer hands.
+- Flop (2x or check): exact, over the 1,081 turn and river cards times the 990
+  dealer hands, playing the river optimally after a check. About half a second.
+- Preflop (4x, 3x or check): sampled, with 'samples' deals per starting hand. The
+  check EV plays the flop and river with a postflop policy (basic_strategy() by
+  default), so it is a lower bound of the optimal check EV. solve_preflop() keeps
+  dealing the close hands until their decision is clear of the sampling error.
+
+Flop and river results are memoized in canonical.shared_cache on the suit-canonical
+form of the cards, since hands that only differ by a permutation of suits have
+the same EVs. solve_preflop() writes the preflop decisions for the 169 starting
+hands to a JSON strategy table that StrategyTable turns back into a policy for
+simulate_ultimate().
+
+Build the strategy table with:
+    python strategy.py --build
+"""
+
+STRATEGY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "strategy.json")
+PREFLOP_BETS = {'4x': 4, '3x': 3, 'check': 0}
+DEFAULT_MAX_SAMPLES = 2560000  # Deals per hand at most, enough to split gaps of about 0.005
+MIN_GAP_ERRORS = 3  # A preflop decision is settled once its two best EVs are this many standard errors apart
+
+def _unseen(cards):
+    seen = set(cards)
+    return [card for card in range(52) if card not in seen]
+
+def river_evs(hole, board):
+    """Returns the exact EV of raising 1x and of folding on the river.
+
+    Args:
+        hole (list): The player's 2 hole card ids.
+        board (list): The 5 community card ids.
+
+    Returns:
+        dict: {'1x': ev, 'fold': ev}
+    """
+    key = canonicalize(hole, board)
+    return shared_cache.get_or_compute(("river_evs",) + key, lambda: _river_evs(list(key[0]), list(key[1])))
+
+def _river_evs(hole, board):
+    dealers = np.array(list(combinations(_unseen(hole + board), 2)), dtype=np.int8)
+    dealer_strengths = evaluate_batch(np.hstack([dealers, np.tile(np.array(board, dtype=np.int8), (len(dealers), 1))]))
+    raise_ev = settle_ultimate_batch(evaluate(hole + board), dealer_strengths, 1).mean()
+    return {'1x': float(raise_ev), 'fold': -2.0}
+
+def flop_evs(hole, flop):
+    """Returns the exact EV of raising 2x and of checking on the flop. After a check,
+    the river is played optimally (see river_evs()).
+
+    Args:
+        hole (list): The player's 2 hole card ids.
+        flop (list): The 3 flop card ids.
+
+    Returns:
+        dict: {'2x': ev, 'check': ev}
+    """
+    key = canonicalize(hole, flop)
+    return shared_cache.get_or_compute(("flop_evs",) + key, lambda: _flop_evs(list(key[0]), list(key[1])))
+
+def _flop_evs(hole, flop):
+    pairs = np.array(list(combinations(_unseen(hole + flop), 2)), dtype=np.int8)
+    # Every turn and river pair against every dealer hand that doesn't share a card with it
+    shares_card = ((pairs[:, None, 0] == pairs[None, :, 0]) | (pairs[:, None, 0] == pairs[None, :, 1])
+                   | (pairs[:, None, 1] == pairs[None, :, 0]) | (pairs[:, None, 1] == pairs[None, :, 1]))
+    runout_index, dealer_index = np.nonzero(~shares_card)
+    boards = np.hstack([np.tile(np.array(flop, dtype=np.int8), (len(pairs), 1)), pairs])
+    player_strengths = evaluate_batch(np.hstack([np.tile(np.array(hole, dtype=np.int8), (len(pairs), 1)), boards]))[runout_index]
+    dealer_strengths = evaluate_batch(np.hstack([pairs[dealer_index], boards[runout_index]]))
+
+    raise_ev = settle_ultimate_batch(player_strengths, dealer_strengths, 2).mean()
+    dealers_per_runout = np.bincount(runout_index)
+    river_raise_evs = np.bincount(runout_index, settle_ultimate_batch(player_strengths, dealer_strengths, 1)) / dealers_per_runout
+    check_ev = np.maximum(river_raise_evs, -2.0).mean()
+    return {'2x': float(raise_ev), 'check': float(check_ev)}
+
+def _preflop_payouts(hole, samples, postflop_policy, rng):
+    # The net win of every preflop action on the same sampled deals, one column per PREFLOP_BETS entry.
+    # Each deal is 5 community cards then the dealer's 2 cards.
+    deals = deal_batch(samples, 7, rng, _unseen(hole))
+    hole_cards = np.tile(np.array(hole, dtype=np.int8), (samples, 1))
+    player_strengths = evaluate_batch(np.hstack([hole_cards, deals[:, :5]]))
+    dealer_strengths = evaluate_batch(deals)
+    plays = [postflop_policy(hole, board[:3], 'flop') or postflop_policy(hole, board, 'river')
+             for board in deals[:, :5].tolist()]
+    check = [settle_ultimate(player_strength, dealer_strength, play) for player_strength, dealer_strength, play
+             in zip(player_strengths.tolist(), dealer_strengths.tolist(), plays)]
+    return np.column_stack([settle_ultimate_batch(player_strengths, dealer_strengths, PREFLOP_BETS[bet])
+                            for bet in ('4x', '3x')] + [np.array(check, dtype=float)])
+
+def preflop_evs(hole, samples=20000, postflop_policy=basic_strategy, seed=None):
+    """Returns the sampled EV of raising 4x, raising 3x and checking before the flop.
+
+    Every action is settled on the same deals, so the differences between the EVs
+    are much less noisy than the EVs themselves.
+
+    Args:
+        hole (list): The player's 2 hole card ids.
+        samples (int): The number of sampled deals. Defaults to 20,000.
+        postflop_policy (callable): Plays the flop and river after a check. Defaults to basic_strategy().
+        seed (int): Seed for the sampler. Defaults to None (unseeded).
+
+    Returns:
+        dict: {'4x': ev, '3x': ev, 'check': ev}
+    """
+    payouts = _preflop_payouts(hole, samples, postflop_policy, make_rng(seed))
+    return dict(zip(PREFLOP_BETS, payouts.mean(axis=0).tolist()))
+
+def best_action(hole, board=(), samples=20000):
+    """Returns the EV-maximizing action and the EVs of every action at a decision point.
+
+    Args:
+        hole (list): The player's 2 hole card ids.
+        board (list): The community card ids seen so far (0, 3 or 5 cards).
+        samples (int): Sampled deals for the preflop decision. Defaults to 20,000.
+
+    Returns:
+        tuple: (action, evs) where action is a key of evs such as '4x', '2x' or 'fold'.
+    """
+    board = list(board)
+    if len(board) == 0:
+        evs = preflop_evs(list(hole), samples)
+    elif len(board) == 3:
+        evs = flop_evs(list(hole), board)
+    elif len(board) == 5:
+        evs = river_evs(list(hole), board)
+    else:
+        raise ValueError("Decisions are made with 0, 3 or 5 community cards")
+    return max(evs, key=evs.get), evs
+
+def _solve_hand(index, samples, max_samples, seed):
+    # Doubles the deals of a hand until its two best actions are MIN_GAP_ERRORS
+    # standard errors apart, or max_samples is reached
+    hole = representative_hand(index)
+    rng = make_rng(seed)
+    hands = 0
+    totals = np.zeros(len(PREFLOP_BETS))
+    products = np.zeros((len(PREFLOP_BETS), len(PREFLOP_BETS)))
+    batch = samples
+    while True:
+        for size in chunk_sizes(batch):
+            payouts = _preflop_payouts(hole, size, basic_strategy, rng)
+            totals += payouts.sum(axis=0)
+            products += payouts.T @ payouts
+        hands += batch
+        means = totals / hands
+        covariance = (products / hands - np.outer(means, means)) / (hands - 1)  # Of the means
+        best, second = np.argsort(means)[::-1][:2]
+        gap_error = math.sqrt(max(covariance[best, best] + covariance[second, second]
+                                  - 2 * covariance[best, second], 0.0))
+        resolved = means[best] - means[second] >= MIN_GAP_ERRORS * gap_error
+        if resolved or hands >= max_samples:
+            break
+        batch = min(hands, max_samples - hands)
+    actions = list(PREFLOP_BETS)
+    entry = dict(zip(actions, means.tolist()))
+    entry.update(action=actions[best], samples=hands,
+                 std_error=dict(zip(actions, np.sqrt(np.diag(covariance)).tolist())),
+                 gap_std_error=gap_error, resolved=bool(resolved))
+    return hand_name(index), entry
+
+def solve_preflop(samples=20000, max_samples=DEFAULT_MAX_SAMPLES, seed=0, workers=None, path=STRATEGY_PATH):
+    """Solves the preflop decision of the 169 starting hands and writes the strategy table.
+
+    Every hand starts with 'samples' deals, and hands whose two best EVs are closer
+    than MIN_GAP_ERRORS standard errors of their difference are dealt again, doubling
+    their deals each time, up to 'max_samples'. The table keeps the standard error of
+    every EV, the one of the gap between the two best actions, the deals used and
+    whether the gap was resolved.
+
+    Args:
+        samples (int): Sampled deals per starting hand to start from. Defaults to 20,000.
+        max_samples (int): The most deals per hand. Defaults to DEFAULT_MAX_SAMPLES.
+        seed (int): Master seed, one derived seed per hand. Defaults to 0.
+        workers (int): The number of worker processes. Defaults to the number of CPUs.
+        path (str): Where to write the JSON table. Defaults to STRATEGY_PATH.
+
+    Returns:
+        dict: The strategy table.
+    """
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        solved = list(executor.map(_solve_hand, range(169), [samples] * 169, [max_samples] * 169,
+                                   chunk_seeds(seed, 169)))
+    table = {
+        "samples": samples,
+        "max_samples": max_samples,
+        "seed": seed,
+        "preflop": dict(solved),
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(table, file, indent=1)
+    return table
+
+class StrategyTable:
+    def __init__(self, path=STRATEGY_PATH, postflop_policy=basic_strategy, solve_river=False):
+        """A policy for simulate_ultimate() that reads its preflop decisions from a
+        strategy table written by solve_preflop().
+
+        Args:
+            path (str): The JSON strategy table. Defaults to STRATEGY_PATH.
+            postflop_policy (callable): Plays the flop and river. Defaults to basic_strategy().
+            solve_river (bool): Play the river optimally with river_evs() instead. Slower.
+        """
+        with open(path) as file:
+            preflop = json.load(file)["preflop"]
+        self.preflop_bets = [PREFLOP_BETS[preflop[hand_name(index)]["action"]] for index in range(169)]
+        self.postflop_policy = postflop_policy
+        self.solve_river = solve_river
+
+    def __call__(self, hole, board, street):
+        if street == 'preflop':
+            return self.preflop_bets[hand_index(hole)]
+        if street == 'river' and self.solve_river:
+            evs = river_evs(hole, board)
+            return 1 if evs['1x'] > evs['fold'] else 0
+        return self.postflop_policy(hole, board, street)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve the preflop strategy table.")
+    parser.add_argument("--build", action="store_true", help="solve the 169 starting hands and write the table")
+    parser.add_argument("--samples", type=int, default=20000, help="sampled deals per starting hand to start from")
+    parser.add_argument("--max-samples", type=int, default=DEFAULT_MAX_SAMPLES, help="most sampled deals per hand")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.build:
+        solve_preflop(args.samples, args.max_samples, args.seed)
+    with open(STRATEGY_PATH) as file:
+        table = json.load(file)["preflop"]
+    for action in PREFLOP_BETS:
+        print(action, " ".join(name for name in table if table[name]["action"] == action))
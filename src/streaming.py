@@ -0,0 +1,102 @@
+import math
+from statistics import NormalDist
+import numpy as np
+from golden_nugget_ultimate import simulate_diamonds_batch, simulate_trips_batch
+from rewards import diamonds_rewards, trips_rewards
+
+"""
+Streaming simulation results
+----------------------------
+Runs a side-bet simulation in batches of K hands and yields the running counts,
+expected payout, standard error and confidence interval after every batch, so a
+caller can stop as soon as the expected payout is known precisely enough (or show
+a live, tightening estimate).
+
+The per-hand payout only depends on the hand's category, so its variance follows
+from the category counts and the paytable: no per-hand data is kept.
+
+A paying outcome that hasn't come up yet has a sample variance of 0, which would
+make a rare payout look known exactly. Its probability is bounded instead with the
+rule of three (below 3 / hands at 95%), and the interval is widened by its payout
+times that bound, so the interval only closes once every rare payout has shown up
+or is too unlikely to matter.
+"""
+
+def summarize(counts, hands, rewards, confidence=0.95):
+    """Returns the running estimate for category counts of a side bet.
+
+    Args:
+        counts (dict): Number of hands per paying category.
+        hands (int): Total number of hands simulated, paying or not.
+        rewards (dict): Category to payout, e.g. trips_rewards.
+        confidence (float): Level of the confidence interval. Defaults to 0.95.
+
+    Returns:
+        dict: 'hands', 'counts', 'expected_payout', 'std_error', 'half_width', 'ci_low' and 'ci_high'.
+        'half_width' includes the bound on the payouts not seen yet, see the module docstring.
+    """
+    mean = sum(rewards[key] * count for key, count in counts.items()) / hands
+    mean_square = sum(rewards[key] ** 2 * count for key, count in counts.items()) / hands
+    # Sample variance of the per-hand payout
+    variance = max(mean_square - mean * mean, 0.0) * hands / (hands - 1) if hands > 1 else float("inf")
+    std_error = math.sqrt(variance / hands)
+    half_width = NormalDist().inv_cdf(0.5 + confidence / 2) * std_error
+    # Upper bound on the probability of an outcome with no hits in 'hands' tries
+    unseen_probability = -math.log(1 - confidence) / hands
+    half_width += sum(payout for key, payout in rewards.items() if payout > 0 and not counts.get(key)) * unseen_probability
+    return {
+        "hands": hands,
+        "counts": dict(counts),
+        "expected_payout": mean,
+        "std_error": std_error,
+        "half_width": half_width,
+        "ci_low": mean - half_width,
+        "ci_high": mean + half_width,
+    }
+
+def iter_simulation(simulation, rewards, batch_size=100000, seed=None, max_hands=None, confidence=0.95):
+    """Runs 'simulation' in batches and yields the running estimate after every batch.
+
+    Args:
+        simulation (callable): Called as simulation(batch_size, seed=seed) and returns
+            (expected_payout, counts), e.g. simulate_trips_batch.
+        rewards (dict): The paytable the counts are keyed on, e.g. trips_rewards.
+        batch_size (int): Hands per batch. Defaults to 100,000.
+        seed (int): Master seed, each batch gets its own derived seed. Defaults to None.
+        max_hands (int): Stop after this many hands. Defaults to no limit.
+        confidence (float): Level of the confidence interval. Defaults to 0.95.
+
+    Yields:
+        dict: The running estimate, see summarize().
+    """
+    seed_sequence = np.random.SeedSequence(seed)
+    counts = {key: 0 for key in rewards}
+    hands = 0
+    while max_hands is None or hands < max_hands:
+        size = batch_size if max_hands is None else min(batch_size, max_hands - hands)
+        batch_seed = int(seed_sequence.spawn(1)[0].generate_state(1, np.uint64)[0])
+        _, batch_counts = simulation(size, seed=batch_seed)
+        for key in counts:
+            counts[key] += batch_counts.get(key, 0)
+        hands += size
+        yield summarize(counts, hands, rewards, confidence)
+
+def simulate_until(simulation, rewards, precision=0.001, confidence=0.95, batch_size=100000,
+                   seed=None, max_hands=10**9):
+    """Simulates until the confidence interval of the expected payout is within
+    +/- 'precision' of the estimate (or 'max_hands' is reached).
+
+    Returns:
+        dict: The final estimate, see summarize().
+    """
+    for estimate in iter_simulation(simulation, rewards, batch_size, seed, max_hands, confidence):
+        if estimate["half_width"] <= precision:
+            break
+    return estimate
+
+if __name__ == "__main__":
+    for name, simulation, rewards in [("Trips", simulate_trips_batch, trips_rewards),
+                                      ("Diamonds", simulate_diamonds_batch, diamonds_rewards)]:
+        estimate = simulate_until(simulation, rewards, precision=0.01, seed=0)
+        print(f"{name}: {estimate['expected_payout']:.4f} +/- {estimate['half_width']:.4f} "
+              f"after {estimate['hands']:,} hands")
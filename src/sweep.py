@@ -0,0 +1,194 @@
+import argparse
+import itertools
+import json
+import os
+from math import comb
+import numpy as np
+import pandas as pd
+from poker import Card
+from exact import diamonds_count_distribution, seven_card_category_counts
+from paytable import BAD_BEAT, DIAMONDS, PAIR_PLUS, TRIPS, SideBet, load_side_bets, simulate_side_bets, three_card_categories
+
+"""
+Paytable sweep
+--------------
+How often each outcome of a side bet happens doesn't depend on what it pays, so
+the outcome distribution is computed once (exactly where there is a closed form,
+by simulation otherwise), saved to JSON, and any number of candidate paytables are
+priced against it at once: with P the matrix of net payouts (one row per paytable,
+one column per outcome, -1 where the bet loses) and p the outcome probabilities,
+the expected returns are P @ p and the variances (P ** 2) @ p - (P @ p) ** 2.
+
+    python sweep.py Trips --vary Flush=5,6,7 --vary Straight=3,4,5 --top 10
+"""
+
+DISTRIBUTION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "distributions")
+BUILT_IN_BETS = {bet.name: bet for bet in [TRIPS, DIAMONDS, PAIR_PLUS, BAD_BEAT]}
+
+# 4 suits times the other 2 cards of a 7-card board: a board can't hold two royals
+ROYAL_FLUSH_BOARDS = 4 * comb(47, 2)
+
+def _exact_counts(bet):
+    if bet.kind == 'suit_count':
+        return diamonds_count_distribution(9), comb(52, 9)
+    if bet.kind == 'player_hand':
+        counts = dict(seven_card_category_counts())
+        counts["Straight Flush"] -= ROYAL_FLUSH_BOARDS
+        counts["Royal Flush"] = ROYAL_FLUSH_BOARDS
+        return counts, comb(52, 7)
+    if bet.kind == 'three_card':
+        hands = np.array(list(itertools.combinations(range(52), 3)), dtype=np.int8)
+        codes = np.bincount(three_card_categories(hands), minlength=len(bet.outcome_codes()))
+        return {name: int(codes[code]) for name, code in bet.outcome_codes().items()}, len(hands)
+    return None
+
+def outcome_distribution(bet, num_simulations=None, seed=None):
+    """Returns the probability of every outcome of a side bet.
+
+    Args:
+        bet (SideBet): The bet, only its kind (and suit) matter.
+        num_simulations (int): Simulate this many rounds. Defaults to None, which uses
+            the exact distribution when the kind has one and 10,000,000 rounds otherwise.
+        seed (int): Seed for the simulation. Defaults to None (unseeded).
+
+    Returns:
+        dict: 'outcomes' (list), 'probabilities' (list, in the same order), 'rounds'
+        (number of rounds counted) and 'exact' (bool). Probabilities sum to less than 1
+        when some rounds have no outcome, like a Bad Beat bet when the player wins.
+    """
+    exact = _exact_counts(bet) if num_simulations is None else None
+    if exact is not None:
+        counts, rounds = exact
+    else:
+        rounds = num_simulations or 10000000
+        every_outcome = SideBet(bet.name, bet.kind, {key: 0 for key in bet.outcome_codes()}, Card.SUITS[bet.suit])
+        counts = simulate_side_bets([every_outcome], rounds, seed=seed)[1][bet.name]
+    outcomes = [key for key in bet.outcome_codes() if key in counts]
+    return {
+        "outcomes": outcomes,
+        "probabilities": [counts[key] / rounds for key in outcomes],
+        "rounds": rounds,
+        "exact": exact is not None,
+    }
+
+def save_distribution(distribution, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(distribution, file, indent=2)
+
+def load_distribution(path):
+    with open(path) as file:
+        return json.load(file)
+
+def cached_distribution(bet, num_simulations=None, seed=None, directory=DISTRIBUTION_DIR):
+    """Returns the outcome distribution of a bet, computing and saving it on first use."""
+    path = os.path.join(directory, f"{bet.kind}_{bet.suit}_{'exact' if num_simulations is None else num_simulations}.json")
+    if os.path.exists(path):
+        return load_distribution(path)
+    distribution = outcome_distribution(bet, num_simulations, seed)
+    save_distribution(distribution, path)
+    return distribution
+
+def paytable_grid(base, variations):
+    """Returns every paytable obtained by replacing entries of 'base' with candidate values.
+
+    Args:
+        base (dict): The paytable to start from, e.g. trips_rewards.
+        variations (dict): Outcome to the list of payouts to try for it.
+
+    Returns:
+        list: One paytable dict per combination of candidate payouts.
+    """
+    keys = list(variations)
+    paytables = []
+    for values in itertools.product(*(variations[key] for key in keys)):
+        paytable = dict(base)
+        paytable.update(zip(keys, values))
+        paytables.append(paytable)
+    return paytables
+
+def payout_matrix(paytables, outcomes):
+    """Returns the net result of a 1 unit bet per paytable (rows) and outcome (columns).
+
+    Outcomes a paytable doesn't list lose the bet (-1). A Royal Flush pays the
+    Straight Flush entry when the paytable has no Royal Flush entry of its own.
+    """
+    matrix = np.full((len(paytables), len(outcomes)), -1.0)
+    for row, paytable in enumerate(paytables):
+        for column, outcome in enumerate(outcomes):
+            if outcome == "Royal Flush" and outcome not in paytable:
+                outcome = "Straight Flush"
+            if outcome in paytable:
+                matrix[row, column] = paytable[outcome]
+    return matrix
+
+def sweep(distribution, paytables, target_edge=None):
+    """Prices many paytables of one side bet at once.
+
+    Args:
+        distribution (dict): The bet's outcome distribution, see outcome_distribution().
+        paytables (list): Paytable dicts, e.g. from paytable_grid().
+        target_edge (float): Rank by distance to this house edge. Defaults to None,
+            which ranks from the lowest house edge to the highest.
+
+    Returns:
+        pandas.DataFrame: One row per paytable with its payouts, 'expected_payout' (the
+        repo's convention: paid winnings per unit, stake not included), 'hit_rate',
+        'house_edge', 'variance' and 'std_dev' of the net result, ranked.
+    """
+    outcomes = distribution["outcomes"]
+    probabilities = np.array(distribution["probabilities"])
+    # Rounds without any listed outcome lose the bet
+    outcomes = outcomes + [None]
+    probabilities = np.append(probabilities, max(0.0, 1 - probabilities.sum()))
+
+    net = payout_matrix(paytables, outcomes)
+    paying = net > 0
+    expected_return = net @ probabilities
+    variance = (net * net) @ probabilities - expected_return ** 2
+
+    table = pd.DataFrame(paytables)
+    table["expected_payout"] = np.where(paying, net, 0.0) @ probabilities
+    table["hit_rate"] = paying.astype(float) @ probabilities
+    table["house_edge"] = -expected_return
+    table["variance"] = variance
+    table["std_dev"] = np.sqrt(variance)
+    if target_edge is None:
+        table = table.sort_values("house_edge", kind="stable")
+    else:
+        table = table.iloc[np.argsort(np.abs(table["house_edge"].to_numpy() - target_edge), kind="stable")]
+    return table.reset_index(drop=True)
+
+def _parse_variation(text):
+    key, values = text.split("=")
+    return key, [float(value) for value in values.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(description="Price many paytables of a side bet against one outcome distribution.")
+    parser.add_argument("bet", help=f"built-in bet ({', '.join(BUILT_IN_BETS)}) or a name from --bets")
+    parser.add_argument("--bets", help="JSON/YAML file of side bet definitions")
+    parser.add_argument("--vary", action="append", default=[], metavar="OUTCOME=V1,V2,...",
+                        help="candidate payouts for one outcome, repeatable")
+    parser.add_argument("--simulate", type=int, help="simulate this many rounds instead of using exact odds")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--target-edge", type=float, help="rank by distance to this house edge")
+    parser.add_argument("--top", type=int, default=20, help="rows to print")
+    args = parser.parse_args()
+
+    bets = dict(BUILT_IN_BETS)
+    if args.bets:
+        bets.update((bet.name, bet) for bet in load_side_bets(args.bets))
+    if args.bet not in bets:
+        parser.error(f"unknown bet: {args.bet}")
+    bet = bets[args.bet]
+    variations = dict(_parse_variation(text) for text in args.vary)
+    if bet.kind == 'suit_count':
+        variations = {int(key): values for key, values in variations.items()}
+
+    distribution = cached_distribution(bet, args.simulate, args.seed)
+    table = sweep(distribution, paytable_grid(bet.payouts, variations), args.target_edge)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(table.head(args.top))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+from math import comb
+import numpy as np
+import pytest
+from batch import evaluate_batch
+from evaluator import CATEGORIES, CATEGORY_SHIFT
+from exact import exact_diamonds, exact_trips, seven_card_category_counts
+from estimators import (_deal_hand_stratum, _hand_strata, control_estimate, importance_estimate,
+                        plain_estimate, stratified_estimate)
+from paytable import BAD_BEAT, DIAMONDS, TRIPS
+from rng import make_rng
+
+EXACT = {"Trips": float(exact_trips(TRIPS.payouts)[0]), "Diamonds": float(exact_diamonds(DIAMONDS.payouts)[0])}
+
+def covers(result, exact):
+    return result["ci_low"] - 1e-9 <= exact <= result["ci_high"] + 1e-9
+
+@pytest.mark.parametrize("estimator", [plain_estimate, stratified_estimate, control_estimate])
+@pytest.mark.parametrize("bet", [TRIPS, DIAMONDS], ids=lambda bet: bet.name)
+def test_interval_covers_exact_payout(estimator, bet):
+    assert covers(estimator(bet, 100000, seed=1), EXACT[bet.name])
+
+def test_importance_sampling_covers_exact_diamonds():
+    result = importance_estimate(DIAMONDS, 100000, seed=1)
+    assert covers(result, EXACT["Diamonds"])
+    assert result["variance_reduction"] > 10
+
+def test_stratified_diamonds_is_exact():
+    result = stratified_estimate(DIAMONDS, 20000, seed=0)
+    assert result["expected_payout"] == pytest.approx(EXACT["Diamonds"])
+    assert result["std_error"] == 0
+
+def test_stratified_trips_reduces_variance_a_lot():
+    result = stratified_estimate(TRIPS, 100000, seed=2)
+    assert result["variance_reduction"] > 100
+
+def test_stratified_and_plain_bad_beat_agree():
+    stratified = stratified_estimate(BAD_BEAT, 100000, seed=3)
+    plain = plain_estimate(BAD_BEAT, 200000, seed=4)
+    assert stratified["variance_reduction"] > 5
+    gap = abs(stratified["expected_payout"] - plain["expected_payout"])
+    assert gap <= 3 * np.hypot(stratified["std_error"], plain["std_error"])
+
+def test_control_interval_covers_outcomes_it_never_saw():
+    # 9 diamonds (1 in 5 million) doesn't come up in 20,000 hands
+    result = control_estimate(DIAMONDS, 20000, seed=0)
+    assert result["unobserved"] > 0
+    assert result["half_width"] >= max(DIAMONDS.payouts.values()) * result["unobserved"]
+    assert covers(result, EXACT["Diamonds"])
+
+def test_hand_strata_cover_every_board_with_the_exact_categories():
+    strata = _hand_strata()
+    assert sum(boards for _, boards, _ in strata) == comb(52, 7)
+    rng = make_rng(0)
+    frequencies = np.zeros(len(CATEGORIES))
+    for key, boards, items in strata:
+        deals = _deal_hand_stratum(key, items, 5000, rng)
+        assert all(len(set(deal)) == 9 for deal in deals)
+        categories = evaluate_batch(deals[:, [0, 1, 4, 5, 6, 7, 8]]) >> CATEGORY_SHIFT
+        frequencies += np.bincount(categories, minlength=len(CATEGORIES)) / len(deals) * boards / comb(52, 7)
+    exact = seven_card_category_counts()
+    # Only flush against straight flush is left to chance within a stratum
+    for index, name in enumerate(CATEGORIES):
+        assert frequencies[index] == pytest.approx(exact[name] / comb(52, 7), abs=2e-5)
@@ -0,0 +1,122 @@
+import random
+from collections import Counter
+from itertools import combinations
+from math import comb
+import numpy as np
+import pytest
+from batch import category_counts, compare_batch, evaluate_batch, showdown_batch
+from evaluator import CATEGORIES, compare, evaluate, hand_category, legacy_strengths, showdown
+from exact import seven_card_category_counts
+from rng import deal_batch, make_rng
+
+# Known 7-card category counts out of C(52, 7) = 133,784,560
+SEVEN_CARD_COUNTS = {
+    "High Card": 23294460,
+    "One Pair": 58627800,
+    "Two Pair": 31433400,
+    "Three of a Kind": 6461620,
+    "Straight": 6180020,
+    "Flush": 4047644,
+    "Full House": 3473184,
+    "Four of a Kind": 224848,
+    "Straight Flush": 41584,
+}
+
+def five_card_key(cards):
+    # Brute force ranking of exactly 5 cards: (category, ranks to break ties)
+    ranks = sorted((card >> 2 for card in cards), reverse=True)
+    flush = len({card & 3 for card in cards}) == 1
+    distinct = sorted(set(ranks), reverse=True)
+    straight_high = None
+    if len(distinct) == 5 and distinct[0] - distinct[4] == 4:
+        straight_high = distinct[0]
+    elif distinct == [12, 3, 2, 1, 0]:
+        straight_high = 3  # A-2-3-4-5
+    groups = sorted(Counter(ranks).items(), key=lambda item: (item[1], item[0]), reverse=True)
+    shape = [count for _, count in groups]
+    by_group = [rank for rank, _ in groups]
+    if straight_high is not None:
+        return (8 if flush else 4, [straight_high])
+    if flush:
+        return (5, ranks)
+    category = {(4, 1): 7, (3, 2): 6, (3, 1, 1): 3, (2, 2, 1): 2, (2, 1, 1, 1): 1}.get(tuple(shape), 0)
+    return (category, by_group)
+
+def brute_force(card_ids):
+    return max(five_card_key(hand) for hand in combinations(card_ids, 5))
+
+def random_hands(count, size, seed):
+    rng = random.Random(seed)
+    return [rng.sample(range(52), size) for _ in range(count)]
+
+def test_evaluate_orders_hands_like_brute_force():
+    hands = random_hands(400, 7, seed=0)
+    keys = [brute_force(hand) for hand in hands]
+    strengths = [evaluate(hand) for hand in hands]
+    for (key_a, strength_a), (key_b, strength_b) in zip(zip(keys, strengths), zip(keys[1:], strengths[1:])):
+        assert (key_a > key_b) - (key_a < key_b) == (strength_a > strength_b) - (strength_a < strength_b)
+    assert [key[0] for key in keys] == [hand_category(strength) for strength in strengths]
+
+def test_evaluate_agrees_with_legacy_categories():
+    for hand in random_hands(2000, 7, seed=1):
+        flags = legacy_strengths(hand)[0]  # Straight Flush first, High Card last
+        assert CATEGORIES[len(flags) - 1 - flags.index(1)] == CATEGORIES[hand_category(evaluate(hand))]
+
+@pytest.mark.parametrize("hand, category", [
+    ([48, 44, 40, 36, 32], "Straight Flush"),         # Royal flush in clubs
+    ([51, 3, 7, 11, 15], "Straight Flush"),           # A-2-3-4-5 of spades
+    ([0, 1, 2, 3, 51, 47, 43], "Four of a Kind"),
+    ([8, 9, 10, 20, 21, 30, 40], "Full House"),
+    ([0, 4, 8, 16, 49, 1, 5], "Two Pair"),            # A-2-3-4-6 with twos and threes paired, no straight
+    ([48, 45, 42, 39, 32, 1, 6], "Straight"),          # A-K-Q-J-10 offsuit
+])
+def test_evaluate_known_hands(hand, category):
+    assert CATEGORIES[hand_category(evaluate(hand))] == category
+
+def test_wheel_loses_to_six_high_straight():
+    wheel = [51, 1, 6, 11, 12]
+    six_high = [1, 6, 11, 12, 17]
+    assert compare(six_high, wheel) == 1
+    assert compare(wheel, six_high) == -1
+
+def test_compare_uses_kickers_and_ties():
+    board = [48, 45, 22, 15, 2]  # A K 7 5 2, no flush
+    assert compare([49, 4], [50, 8], board) == 0     # Same pair of aces, same kickers from the board
+    assert compare([49, 43], [50, 39], board) == 1   # Ace with queen kicker beats ace with jack kicker
+    assert compare(evaluate([49, 43] + board), [50, 39], board) == 1
+
+def test_showdown_splits_ties():
+    board = [48, 44, 40, 36, 33]  # A K Q J 10, every player plays the board
+    winners, shares = showdown([[1, 5], [9, 14], [18, 23]], board)
+    assert winners == [0, 1, 2]
+    assert shares == pytest.approx([1 / 3] * 3)
+    winners, shares = showdown([[1, 5], [32, 14]], [48, 44, 40, 36, 29])  # Royal flush
+    assert winners == [1] and shares == [0.0, 1.0]
+
+def test_evaluate_batch_matches_evaluate():
+    for size in (5, 6, 7):
+        deals = deal_batch(3000, size, make_rng(size))
+        assert evaluate_batch(deals).tolist() == [evaluate(deal.tolist()) for deal in deals]
+
+def test_compare_and_showdown_batch_match_scalar_versions():
+    deals = deal_batch(500, 9, make_rng(3))
+    strengths = np.stack([evaluate_batch(deals[:, [0, 1, 4, 5, 6, 7, 8]]),
+                          evaluate_batch(deals[:, 2:])], axis=1)
+    assert compare_batch(strengths[:, 0], strengths[:, 1]).tolist() == [compare(a, b) for a, b in strengths.tolist()]
+    winners, shares = showdown_batch(strengths)
+    for row, deal in enumerate(deals.tolist()):
+        expected_winners, expected_shares = showdown([deal[:2], deal[2:4]], deal[4:])
+        assert np.flatnonzero(winners[row]).tolist() == expected_winners
+        assert shares[row].tolist() == expected_shares
+
+def test_exact_seven_card_category_counts():
+    counts = seven_card_category_counts()
+    assert counts == SEVEN_CARD_COUNTS
+    assert sum(counts.values()) == comb(52, 7)
+
+def test_batch_category_frequencies_match_exact():
+    num_deals = 400000
+    counts = category_counts(evaluate_batch(deal_batch(num_deals, 7, make_rng(4))))
+    for name, exact in SEVEN_CARD_COUNTS.items():
+        p = exact / comb(52, 7)
+        assert abs(counts[name] / num_deals - p) <= 4 * np.sqrt(p * (1 - p) / num_deals)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from batch import draw_deals
+from history import HistoryReader, HistoryWriter, record_simulation
+from paytable import DIAMONDS, TRIPS, RoundBatch, SideBet
+from rng import make_rng
+from sweep import outcome_distribution
+
+ROYAL_TRIPS = SideBet("Royal Trips", "player_hand", dict(TRIPS.payouts, **{"Royal Flush": 100}))
+
+def test_write_append_and_reopen_round_trip(tmp_path):
+    path = str(tmp_path / "hands.pkh")
+    deals = draw_deals(1500, 9, make_rng(0))
+    with HistoryWriter(path, [TRIPS, DIAMONDS], buffer_size=300) as writer:
+        writer.append_rounds(RoundBatch(deals[:1000]))
+    with HistoryWriter(path, [TRIPS, DIAMONDS]) as writer:
+        writer.append_rounds(RoundBatch(deals[1000:]))
+
+    history = HistoryReader(path)
+    round_data = RoundBatch(deals)
+    assert len(history) == 1500
+    assert [bet.name for bet in history.bets] == ["Trips", "Diamonds"]
+    assert (history["cards"] == deals).all()
+    assert (history["player_strength"] == round_data.player_strengths()).all()
+    assert (history["dealer_strength"] == round_data.dealer_strengths()).all()
+    assert (history.outcomes("Diamonds") == DIAMONDS.outcomes(round_data)).all()
+
+def test_partly_written_record_is_dropped_on_append(tmp_path):
+    path = str(tmp_path / "hands.pkh")
+    with HistoryWriter(path, [TRIPS]) as writer:
+        record_simulation(writer, 100, seed=0)
+    with open(path, "ab") as file:
+        file.write(b"\0" * 5)
+    assert len(HistoryReader(path)) == 100
+    with HistoryWriter(path, [TRIPS]) as writer:
+        record_simulation(writer, 10, seed=1)
+    assert len(HistoryReader(path)) == 110
+
+def test_appending_different_bets_is_rejected(tmp_path):
+    path = str(tmp_path / "hands.pkh")
+    with HistoryWriter(path, [TRIPS]) as writer:
+        record_simulation(writer, 10, seed=0)
+    with pytest.raises(ValueError):
+        HistoryWriter(path, [DIAMONDS])
+
+@pytest.mark.parametrize("bet", [ROYAL_TRIPS, DIAMONDS], ids=lambda bet: bet.name)
+def test_distribution_matches_sweep_on_the_same_seed(tmp_path, bet):
+    path = str(tmp_path / "hands.pkh")
+    with HistoryWriter(path, [bet]) as writer:
+        record_simulation(writer, 20000, seed=3)
+    recorded = HistoryReader(path).distribution(bet.name)
+    simulated = outcome_distribution(bet, 20000, seed=3)
+    assert recorded["outcomes"] == simulated["outcomes"]
+    assert recorded["probabilities"] == simulated["probabilities"]
+    assert recorded["rounds"] == 20000
+
+def test_royal_flushes_stay_straight_flushes_when_the_bet_does_not_pay_them(tmp_path):
+    path = str(tmp_path / "hands.pkh")
+    with HistoryWriter(path, [TRIPS]) as writer:
+        record_simulation(writer, 20000, seed=3)
+    recorded = HistoryReader(path).distribution("Trips")
+    simulated = outcome_distribution(TRIPS, 20000, seed=3)
+    assert "Royal Flush" not in recorded["outcomes"]
+    probabilities = dict(zip(simulated["outcomes"], simulated["probabilities"]))
+    straight_flushes = recorded["probabilities"][recorded["outcomes"].index("Straight Flush")]
+    assert np.isclose(straight_flushes, probabilities["Straight Flush"] + probabilities["Royal Flush"])
+
+def test_distribution_of_empty_history_raises(tmp_path):
+    path = str(tmp_path / "hands.pkh")
+    HistoryWriter(path, [TRIPS]).close()
+    history = HistoryReader(path)
+    assert len(history) == 0
+    with pytest.raises(ValueError):
+        history.distribution("Trips")
@@ -0,0 +1,27 @@
+import pytest
+import metrics
+from golden_nugget_ultimate import simulate_trips_batch
+from parallel import run_parallel
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.enable()
+    metrics.reset()
+    yield
+    metrics.disable()
+    metrics.reset()
+
+def test_parallel_totals_match_hands_simulated(enabled_metrics):
+    # Metrics recorded before the pool starts must not come back again from forked workers
+    simulate_trips_batch(100000, seed=0)
+    run_parallel(simulate_trips_batch, 100000, seed=0, workers=4)
+    data = metrics.snapshot()
+    assert data["hands"] == 200000
+    assert data["counters"]["evaluations"] == 200000
+    assert sum(worker["hands"] for worker in data["workers"].values()) == 100000
+
+def test_disabled_metrics_record_nothing():
+    metrics.disable()
+    metrics.reset()
+    simulate_trips_batch(1000, seed=0)
+    assert metrics.snapshot()["hands"] == 0
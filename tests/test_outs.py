@@ -0,0 +1,52 @@
+import random
+from collections import Counter
+from itertools import combinations
+import pytest
+from evaluator import CATEGORIES, evaluate, hand_category
+from outs import IncrementalHand, outs, improvement_odds
+
+def random_spots(count, board_size, seed):
+    rng = random.Random(seed)
+    for _ in range(count):
+        cards = rng.sample(range(52), 2 + board_size)
+        yield cards[:2], cards[2:]
+
+def category(cards):
+    return hand_category(evaluate(cards))
+
+@pytest.mark.parametrize("board_size", [3, 4])
+def test_outs_match_enumeration(board_size):
+    for hole, board in random_spots(50, board_size, seed=board_size):
+        known = hole + board
+        current = category(known)
+        expected = {}
+        for card in range(52):
+            if card not in known and category(known + [card]) > current:
+                expected.setdefault(CATEGORIES[category(known + [card])], []).append(card)
+        assert outs(hole, board) == expected
+
+def test_improvement_odds_match_enumeration():
+    for hole, board in random_spots(10, 3, seed=7):
+        known = hole + board
+        current = category(known)
+        unseen = [card for card in range(52) if card not in known]
+        turn = Counter(category(known + [card]) for card in unseen)
+        river = Counter(category(known + list(cards)) for cards in combinations(unseen, 2))
+        odds = improvement_odds(hole, board)
+        for name, street, total in (("turn", turn, len(unseen)), ("river", river, len(unseen) * (len(unseen) - 1) // 2)):
+            assert odds[name] == pytest.approx({CATEGORIES[index]: street[index] / total
+                                               for index in range(current + 1, len(CATEGORIES))})
+
+def test_improvement_odds_on_the_turn_has_only_the_river():
+    odds = improvement_odds([48, 49], [0, 5, 22, 30])
+    assert set(odds) == {"river"}
+    with pytest.raises(ValueError):
+        improvement_odds([48, 49], [0, 5])
+
+def test_incremental_hand_tracks_adds_and_removes():
+    hand = IncrementalHand([48, 49, 0])
+    hand.add(50)
+    assert hand.strength() == evaluate([48, 49, 0, 50])
+    assert hand.strength_with(51) == evaluate([48, 49, 0, 50, 51])
+    hand.remove(0)
+    assert hand.strength() == evaluate([48, 49, 50]) and len(hand) == 3
@@ -0,0 +1,17 @@
+import pytest
+from batch import draw_deals
+from paytable import DIAMONDS, TRIPS, RoundBatch, simulate_side_bets
+from rng import make_rng
+
+def test_zero_rounds_is_rejected():
+    with pytest.raises(ValueError):
+        simulate_side_bets([TRIPS], 0)
+    with pytest.raises(ValueError):
+        TRIPS.expected_payout({}, 0)
+
+def test_expected_payout_matches_round_payouts():
+    expected_payouts, counts = simulate_side_bets([TRIPS, DIAMONDS], 5000, seed=0)
+    round_data = RoundBatch(draw_deals(5000, 9, make_rng(0)))
+    for bet in (TRIPS, DIAMONDS):
+        assert counts[bet.name] == bet.settle(round_data)
+        assert expected_payouts[bet.name] == pytest.approx(bet.round_payouts(round_data).mean())
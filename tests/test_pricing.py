@@ -0,0 +1,59 @@
+from collections import Counter
+import numpy as np
+import pytest
+import paytable
+from batch import chunk_sizes, draw_deals
+from parallel import chunk_seeds
+from paytable import TRIPS, simulate_side_bets
+from pricing import PricingService, job_key, normalize_job, price, replay_job_hand
+
+@pytest.mark.parametrize("job", [
+    {"game": "side_bets", "bets": ["Nope"], "hands": 10},
+    {"game": "side_bets", "bets": [{"name": "X", "kind": "player_hand"}], "hands": 10},
+    {"game": "side_bets", "bets": [{"name": "X", "kind": "suit_count", "payouts": {"9": 5}, "suit": "Stars"}],
+     "hands": 10},
+    {"game": "side_bets", "bets": [42], "hands": 10},
+    {"game": "side_bets", "bets": ["Trips"], "hands": "many"},
+    {"game": "side_bets", "bets": ["Trips"], "hands": 0},
+    {"game": "ultimate", "precision": 0.01, "policy": "random"},
+    {"game": "poker", "hands": 10},
+    ["not", "a", "job"],
+])
+def test_invalid_jobs_raise_value_error(job):
+    with pytest.raises(ValueError):
+        normalize_job(job)
+
+def test_built_in_names_and_definitions_share_a_key():
+    by_name = normalize_job({"game": "side_bets", "bets": ["Diamonds"], "hands": 1000})
+    by_definition = normalize_job({"game": "side_bets", "hands": 1000, "bets": [
+        {"name": "Diamonds", "kind": "suit_count", "payouts": {"4": 3, "5": 10, "6": 30, "7": 100, "8": 300, "9": 1000}}]})
+    assert job_key(by_name) == job_key(by_definition)
+
+def test_cached_result_matches_fresh_one(tmp_path):
+    service = PricingService(str(tmp_path), workers=1)
+    job = {"game": "side_bets", "bets": ["Trips"], "hands": 20000}
+    fresh = service.price(job)
+    cached = service.price(job)
+    service.shutdown()
+    assert not fresh["cached"] and cached["cached"]
+    assert fresh["result"] == cached["result"]
+
+def test_replayed_hand_is_the_deal_the_job_used(monkeypatch):
+    job = normalize_job({"game": "side_bets", "bets": ["Trips"], "hands": 2500, "chunk_size": 1000})
+    # Deal the job's chunks the way run_parallel() does, in this process, keeping every deal
+    dealt = []
+    def recording_draw_deals(*args):
+        deals = draw_deals(*args)
+        dealt.append(deals)
+        return deals
+    monkeypatch.setattr(paytable, "draw_deals", recording_draw_deals)
+    sizes = chunk_sizes(job["hands"], job["chunk_size"])
+    counts = Counter()
+    for size, seed in zip(sizes, chunk_seeds(job["seed"], len(sizes))):
+        counts.update(simulate_side_bets([TRIPS], size, seed=seed)[1]["Trips"])
+    deals = np.vstack(dealt)
+    monkeypatch.undo()
+
+    assert price(job, workers=1)["bets"]["Trips"]["counts"] == dict(counts)
+    for hand in (0, 999, 1000, 1777, 2499):
+        assert replay_job_hand(job, hand) == deals[hand].tolist()
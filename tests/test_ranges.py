@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from evaluator import evaluate
+from preflop import hand_name
+from ranges import COMBO_HAND, COMBOS, NUM_COMBOS, Range, range_equity
+
+def hand_counts(text):
+    # Combos per starting hand name of a parsed range
+    weights = Range.parse(text).weights
+    return {hand_name(hand): int(weights[COMBO_HAND == hand].sum()) for hand in np.unique(COMBO_HAND[weights > 0])}
+
+@pytest.mark.parametrize("text, expected", [
+    ("QQ+", {"QQ": 6, "KK": 6, "AA": 6}),
+    ("77-99", {"77": 6, "88": 6, "99": 6}),
+    ("AK", {"AKs": 4, "AKo": 12}),
+    ("KTo+", {"KTo": 12, "KJo": 12, "KQo": 12}),
+    ("K9s-K7s", {"K9s": 4, "K8s": 4, "K7s": 4}),
+    ("AsKh", {"AKo": 1}),
+])
+def test_parse_tokens(text, expected):
+    assert hand_counts(text) == expected
+
+def test_parse_counts_and_weights():
+    assert Range.parse("22+").num_combos == 78
+    assert Range.parse("A2s+").num_combos == 48
+    assert Range.parse("AKs, AQs:0.5").num_combos == 6
+    assert Range.parse("AK, AKo:0").num_combos == 4  # Later tokens override earlier ones
+    for token in ("AA-", "AsAs", "ZZ", "T9s-T9s+"):
+        with pytest.raises(ValueError):
+            Range.parse(token)
+
+def test_top_percent_ranges():
+    assert Range.parse("top 100%").num_combos == NUM_COMBOS
+    top = Range.top(15)
+    assert top.fraction >= 0.15
+    assert (Range.parse("top 15%").weights == top.weights).all()
+    assert "AA" in Range.top(1).hands() and "72o" not in top.hands()
+    # Whole hands at a time: each smaller range is part of the bigger one
+    assert ((Range.top(5).weights <= top.weights)).all()
+
+def test_range_equity_matches_brute_force_on_the_turn():
+    board = [48, 41, 22, 5]  # Ac Jd 7h 3d
+    hero, villain = Range.parse("AA, KK, JTs"), Range.parse("QQ+, AKs, 76s")
+    result = range_equity(hero, villain, board)
+    assert result.exact
+
+    wins = ties = losses = 0.0
+    river_cards = [card for card in range(52) if card not in board]
+    for hero_index in np.flatnonzero(hero.weights):
+        for villain_index in np.flatnonzero(villain.weights):
+            cards = set(COMBOS[hero_index].tolist()) | set(COMBOS[villain_index].tolist())
+            if len(cards) < 4 or cards & set(board):
+                continue
+            weight = hero.weights[hero_index] * villain.weights[villain_index]
+            for river in river_cards:
+                if river in cards:
+                    continue
+                hero_strength = evaluate(COMBOS[hero_index].tolist() + board + [river])
+                villain_strength = evaluate(COMBOS[villain_index].tolist() + board + [river])
+                wins += weight * (hero_strength > villain_strength)
+                ties += weight * (hero_strength == villain_strength)
+                losses += weight * (hero_strength < villain_strength)
+    assert (result.wins, result.ties, result.losses) == pytest.approx((wins, ties, losses))
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+from rng import deal_batch, make_rng, replay_deal
+
+@pytest.mark.parametrize("bit_generator", ["pcg64", "philox"])
+@pytest.mark.parametrize("cards_per_deal", [5, 7, 9])
+@pytest.mark.parametrize("stream", [0, 2])
+def test_replay_deal_matches_chunked_stream(bit_generator, cards_per_deal, stream):
+    rng = make_rng(11, stream, bit_generator)
+    # Uneven chunks, so hands start at every offset of Philox's 4-output blocks
+    deals = np.vstack([deal_batch(size, cards_per_deal, rng) for size in (301, 699, 3)])
+    for hand in (0, 1, 300, 301, 302, 777, 1002):
+        replayed = replay_deal(11, hand, cards_per_deal, stream=stream, bit_generator=bit_generator)
+        assert (replayed == deals[hand]).all()
+
+def test_deal_batch_draws_distinct_cards_from_the_deck():
+    deck = list(range(0, 52, 4))
+    deals = deal_batch(2000, 9, make_rng(0), deck)
+    assert all(len(set(deal)) == 9 and set(deal) <= set(deck) for deal in deals.tolist())
+    with pytest.raises(ValueError):
+        deal_batch(1, 14, make_rng(0), deck)
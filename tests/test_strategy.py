@@ -0,0 +1,37 @@
+import json
+import pytest
+from golden_nugget_ultimate import basic_strategy
+from preflop import hand_name, representative_hand
+from strategy import MIN_GAP_ERRORS, STRATEGY_PATH, StrategyTable
+
+with open(STRATEGY_PATH) as file:
+    PREFLOP = json.load(file)["preflop"]
+
+def is_clear_cut(entry):
+    # Raising and checking are apart by more than MIN_GAP_ERRORS standard errors,
+    # taking the errors as adding up (the most they can)
+    raise_bet = max(("4x", "3x"), key=entry.get)
+    gap = abs(entry[raise_bet] - entry["check"])
+    return gap >= MIN_GAP_ERRORS * (entry["std_error"][raise_bet] + entry["std_error"]["check"])
+
+def test_every_hand_is_solved_within_its_sampling_error():
+    assert len(PREFLOP) == 169
+    for name, entry in PREFLOP.items():
+        assert entry["resolved"], name
+        assert entry["action"] == max(("4x", "3x", "check"), key=entry.get)
+
+def test_solved_chart_agrees_with_basic_strategy_on_clear_cut_hands():
+    clear_cut = [index for index in range(169) if is_clear_cut(PREFLOP[hand_name(index)])]
+    assert len(clear_cut) > 100
+    for index in clear_cut:
+        raises = PREFLOP[hand_name(index)]["action"] != "check"
+        assert raises == (basic_strategy(representative_hand(index), [], 'preflop') > 0), hand_name(index)
+
+@pytest.mark.parametrize("name", ["K2s", "Q6s", "J8s"])
+def test_marginal_suited_hands_raise(name):
+    assert PREFLOP[name]["action"] == "4x"
+
+def test_strategy_table_plays_the_chart():
+    policy = StrategyTable()
+    assert policy([48, 49], [], 'preflop') == 4
+    assert policy([0, 21], [], 'preflop') == 0  # 2c 7d
@@ -0,0 +1,20 @@
+from golden_nugget_ultimate import simulate_trips_batch
+from streaming import simulate_until, summarize
+
+def test_unseen_payout_keeps_interval_open():
+    estimate = summarize({"Straight Flush": 0}, 2000, {"Straight Flush": 40})
+    assert estimate["expected_payout"] == 0
+    assert estimate["half_width"] > 0.05
+
+def test_simulate_until_does_not_stop_before_rare_payout_shows_up():
+    estimate = simulate_until(simulate_trips_batch, {"Straight Flush": 40}, precision=0.005,
+                              batch_size=2000, seed=0)
+    assert estimate["counts"]["Straight Flush"] > 0
+    assert estimate["half_width"] <= 0.005
+    # Exact value is 40 * 0.000311
+    assert abs(estimate["expected_payout"] - 0.01243) <= 3 * estimate["half_width"]
+
+def test_summarize_matches_hand_computed_moments():
+    estimate = summarize({"A": 1, "B": 3}, 10, {"A": 10, "B": 1})
+    assert estimate["expected_payout"] == 1.3
+    assert estimate["ci_low"] < 1.3 < estimate["ci_high"]